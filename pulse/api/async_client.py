@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+MdsClientApi / OesClientApi 的 asyncio 封装：可等待的启动 / 连接 / 下单，异步迭代行情与回报
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from vendor.quote_api import MdsClientApi, MdsClientSpi
+from vendor.trade_api import OesClientApi, OesClientSpi, OesOrdReqT
+
+from pulse.api.quote.snapshot_bridge import SnapshotBridge
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("AsyncClient")
+
+# 行情流转发的 SPI 回调（未订阅的数据类型不会触发，转发没有额外开销）
+MDS_MARKET_DATA_CALLBACKS = (
+    "on_market_data_snapshot_full_refresh",
+    "on_l2_market_data_snapshot",
+    "on_market_index_snapshot_full_refresh",
+    "on_market_option_snapshot_full_refresh",
+    "on_l2_best_orders_snapshot",
+    "on_l2_market_overview",
+    "on_l2_tick_trade",
+    "on_l2_tick_order",
+)
+_OES_ORDER_CALLBACKS = ("on_order_insert", "on_order_report", "on_order_reject")
+_OES_TRADE_CALLBACKS = ("on_trade_report",)
+
+# 批量委托每次调用的最大笔数（SDK 内部再按 500 笔原子拆分）
+_BATCH_LIMIT = 10000
+
+_ACK_INSERT = 0
+_ACK_REJECT = 1
+
+# submit_order 的 timeout 缺省值（None 表示一直等待）
+_DEFAULT = object()
+
+
+def _channel_tag(channel: Any) -> str:
+    """通道对象或通道标签 → 通道标签"""
+    if isinstance(channel, str):
+        return channel
+    return channel.pChannelCfg.contents.channelTag.decode()
+
+
+class OrderRejectedError(Exception):
+    """委托被 OES 拒绝（on_order_reject），body 为 OesOrdRejectT"""
+
+    def __init__(self, body: Any):
+        self.body = body
+        self.reason = getattr(body, "ordRejReason", 0)
+        super().__init__(f"委托被拒绝 clSeqNo={body.clSeqNo} 原因代码={self.reason}")
+
+
+class AsyncStream:
+    """
+    SnapshotBridge 之上的异步迭代器，元素为 (msgId, 消息体)
+
+    - async for 逐条取；async for batch in stream.batches() 按批取（回调线程一批写入多少取多少）；
+    - 同一个流只应有一个消费者，客户端关闭后迭代结束。
+    """
+
+    def __init__(self, bridge: SnapshotBridge, max_batch: Optional[int] = None):
+        self.bridge = bridge
+        self.max_batch = max_batch
+        self._pending: Deque[Any] = deque()
+
+    def __aiter__(self) -> "AsyncStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if not self._pending:
+            batch = await self.bridge.get_batch(self.max_batch)
+            if not batch:
+                raise StopAsyncIteration
+            self._pending.extend(batch)
+        return self._pending.popleft()
+
+    async def batches(self) -> AsyncIterator[List[Any]]:
+        if self._pending:
+            batch = list(self._pending)
+            self._pending.clear()
+            yield batch
+        while True:
+            batch = await self.bridge.get_batch(self.max_batch)
+            if not batch:
+                return
+            yield batch
+
+
+class _AsyncClientBase:
+    """连接状态跟踪、SPI 回调转发与数据流（MDS / OES 共用）"""
+
+    def __init__(self, api: Any, spi: Any, capacity: int):
+        self.api = api
+        self.spi = spi
+        self.capacity = capacity
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tls = threading.local()
+        self._taps: Dict[str, List[Callable[..., None]]] = {}
+        self._streams: Dict[str, AsyncStream] = {}
+        self._bridges: Dict[str, SnapshotBridge] = {}
+
+        # 连接状态只在事件循环线程中修改
+        self._connected: Set[str] = set()
+        self._conn_waiters: List[asyncio.Future] = []
+
+    # —— SPI 回调转发（C 回调线程） ——
+    def _tap(self, name: str, tap: Callable[..., None]) -> None:
+        """登记回调转发，同一回调可登记多个 tap（由 _install_taps 一次性包装）"""
+        self._taps.setdefault(name, []).append(tap)
+
+    def _install_taps(self) -> None:
+        """
+        在 spi 实例上包装回调：先执行原回调，再依次调用 tap；
+        必须在添加通道之前执行（派发表在添加通道时按 spi 的回调编译）。
+        原回调内部再调用其它被包装的回调时（如 L2 快照转交 L1 快照处理），内层不再转发。
+        """
+        tls = self._tls
+        for name, taps in self._taps.items():
+            original = getattr(self.spi, name)
+
+            def hooked(*args, _name=name, _original=original, _taps=tuple(taps)):
+                if getattr(tls, "busy", False):
+                    return _original(*args)
+                tls.busy = True
+                try:
+                    ret = _original(*args)
+                finally:
+                    tls.busy = False
+                for tap in _taps:
+                    try:
+                        tap(*args)
+                    except Exception:
+                        _LOG.exception("❌ 转发 %s 失败", _name)
+                return ret
+
+            hooked.__name__ = name
+            setattr(self.spi, name, hooked)
+
+    def _tap_stream(self, stream: str, names: Iterable[str]) -> None:
+        def tap(channel, msg_head, *rest):
+            bridge = self._bridges.get(stream)
+            if bridge is not None:
+                # 最后一个参数是 user_info，倒数第二个是消息体
+                bridge.put((msg_head.msgId, rest[-2]))
+
+        for name in names:
+            self._tap(name, tap)
+
+    def _tap_connection(self, up: Sequence[str], down: Sequence[str]) -> None:
+        def on_up(channel, *_):
+            self._call_in_loop(self._set_connected, _channel_tag(channel), True)
+
+        def on_down(channel, *_):
+            self._call_in_loop(self._set_connected, _channel_tag(channel), False)
+
+        for name in up:
+            self._tap(name, on_up)
+        for name in down:
+            self._tap(name, on_down)
+
+    def _call_in_loop(self, fn: Callable, *args: Any) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(fn, *args)
+
+    # —— 连接状态（事件循环线程） ——
+    def _set_connected(self, tag: str, up: bool) -> None:
+        if up:
+            self._connected.add(tag)
+        else:
+            self._connected.discard(tag)
+        waiters, self._conn_waiters = self._conn_waiters, []
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+    def _channel_count(self) -> int:
+        return self.api.get_channel_count()
+
+    def is_connected(self, channel: Any = None) -> bool:
+        """指定通道（通道对象或标签）是否已连接；channel 为空时判断全部通道"""
+        if channel is None:
+            return len(self._connected) >= max(1, self._channel_count())
+        return _channel_tag(channel) in self._connected
+
+    async def wait_connected(self, channel: Any = None, timeout: Optional[float] = None) -> None:
+        """等待指定通道（默认全部通道）连接成功，超时抛出 asyncio.TimeoutError"""
+        async def _wait():
+            while not self.is_connected(channel):
+                fut = asyncio.get_running_loop().create_future()
+                self._conn_waiters.append(fut)
+                await fut
+
+        await asyncio.wait_for(_wait(), timeout)
+
+    # —— 启动 / 关闭 ——
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        for bridge in self._bridges.values():
+            bridge.bind_loop(loop)
+
+    async def start(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        启动异步 API 并等待全部通道连接；timeout 为 None 时一直等待，为 0 时不等待连接
+        """
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        if not await loop.run_in_executor(None, self.api.start):
+            raise RuntimeError(f"{type(self.api).__name__} 启动失败")
+        if timeout != 0:
+            await self.wait_connected(timeout=timeout)
+
+    async def close(self) -> None:
+        """释放异步 API（等待回调线程退出），结束所有数据流"""
+        await asyncio.get_running_loop().run_in_executor(None, self.api.release)
+        for bridge in self._bridges.values():
+            bridge.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # —— 数据流 ——
+    def _stream(self, name: str, max_batch: Optional[int]) -> AsyncStream:
+        """数据流在首次调用时才开始缓存（应在 start 之前取得，避免漏掉最早的数据）"""
+        stream = self._streams.get(name)
+        if stream is None:
+            bridge = SnapshotBridge(capacity=self.capacity, loop=self._loop)
+            stream = self._streams[name] = AsyncStream(bridge, max_batch)
+            self._bridges[name] = bridge
+        return stream
+
+
+class AsyncMdsClient(_AsyncClientBase):
+    """
+    行情 API 的 asyncio 封装
+
+        client = AsyncMdsClient(api, spi)            # api 已创建运行时环境，spi 尚未注册
+        quotes = client.market_data()
+        async with client:
+            async for msg_id, body in quotes:
+                ...
+
+    spi 的原有处理（如 MdsSpiLite 写入桥接缓冲）不受影响，行情流是额外转发的一份。
+    """
+
+    def __init__(
+        self,
+        api: MdsClientApi,
+        spi: MdsClientSpi,
+        add_default_channel: bool = True,
+        capacity: int = 65536,
+        market_data_callbacks: Sequence[str] = MDS_MARKET_DATA_CALLBACKS,
+    ):
+        """
+        api: 已创建运行时环境、尚未启动的 MdsClientApi
+        spi: 尚未注册的 SPI 实例（由本类注册）
+        add_default_channel: 注册时是否按配置文件添加默认行情通道；其余通道在本类构造之后、start 之前添加
+        capacity: 每个数据流的缓冲条数
+        market_data_callbacks: 转发到行情流的 SPI 回调
+        """
+        super().__init__(api, spi, capacity)
+        self._tap_connection(up=("on_connect",), down=("on_disconnect",))
+        self._tap_stream("market_data", market_data_callbacks)
+        self._install_taps()
+        if not api.register_spi(spi, add_default_channel=add_default_channel):
+            raise RuntimeError("注册 MDS SPI 失败")
+
+    def market_data(self, max_batch: Optional[int] = None) -> AsyncStream:
+        """行情流（快照 / 逐笔），元素为 (msgId, 消息体)；声明了字段投影的消息体为投影结果"""
+        return self._stream("market_data", max_batch)
+
+
+class AsyncOesClient(_AsyncClientBase):
+    """
+    交易 API 的 asyncio 封装
+
+        client = AsyncOesClient(api, spi)            # api 已创建运行时环境，spi 尚未注册
+        async with client:
+            cnfm = await client.submit_order(req)    # on_order_insert 时返回 OesOrdCnfmT
+            results = await client.submit_orders(reqs)
+
+    - 委托确认 / 拒绝由回调线程批量送入事件循环，按 (clEnvId, clSeqNo) 匹配等待中的委托，
+      同一事件循环中可同时等待任意多笔委托；
+    - order_reports() / trade_reports() 为委托回报、成交回报的异步流。
+    """
+
+    def __init__(
+        self,
+        api: OesClientApi,
+        spi: OesClientSpi,
+        add_default_channel: bool = True,
+        capacity: int = 65536,
+        order_timeout: Optional[float] = 5.0,
+    ):
+        """
+        api: 已创建运行时环境、尚未启动的 OesClientApi
+        spi: 尚未注册的 SPI 实例（由本类注册）
+        add_default_channel: 注册时是否按配置文件添加默认委托 / 回报通道
+        capacity: 每个数据流（及委托确认队列）的缓冲条数
+        order_timeout: submit_order 等待确认的默认超时（秒），None 表示一直等待
+        """
+        super().__init__(api, spi, capacity)
+        self.order_timeout = order_timeout
+        self._pending: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._acks = SnapshotBridge(capacity=capacity)
+        self._ack_task: Optional[asyncio.Task] = None
+
+        self._tap_connection(up=("on_ord_connect", "on_rpt_connect"),
+                             down=("on_ord_disconnect", "on_rpt_disconnect"))
+        self._tap("on_order_insert", lambda ch, head, rpt_head, body, ui: self._acks.put((_ACK_INSERT, body)))
+        self._tap("on_order_reject", lambda ch, head, rpt_head, body, ui: self._acks.put((_ACK_REJECT, body)))
+        self._tap_stream("orders", _OES_ORDER_CALLBACKS)
+        self._tap_stream("trades", _OES_TRADE_CALLBACKS)
+        self._install_taps()
+        if not api.register_spi(spi, add_default_channel=add_default_channel):
+            raise RuntimeError("注册 OES SPI 失败")
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        super()._bind(loop)
+        self._acks.bind_loop(loop)
+        if self._ack_task is None:
+            self._ack_task = loop.create_task(self._dispatch_acks())
+
+    async def close(self) -> None:
+        await super().close()
+        self._acks.close()
+        if self._ack_task is not None:
+            await self._ack_task
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("OES 客户端已关闭"))
+        self._pending.clear()
+
+    # —— 委托确认 ——
+    async def _dispatch_acks(self) -> None:
+        while True:
+            batch = await self._acks.get_batch()
+            if not batch:
+                return
+            for kind, body in batch:
+                fut = self._pending.pop((body.clEnvId, body.clSeqNo), None)
+                if fut is None or fut.done():
+                    continue
+                if kind == _ACK_INSERT:
+                    fut.set_result(body)
+                else:
+                    fut.set_exception(OrderRejectedError(body))
+
+    def _register(self, req: OesOrdReqT, env_id: int) -> Tuple[Tuple[int, int], asyncio.Future]:
+        """补齐 clSeqNo 并登记等待确认的 Future（事件循环线程）"""
+        if req.clSeqNo <= 0:
+            req.clSeqNo = self.api.get_next_cl_seq_no(env_id)
+
+        key = (env_id, req.clSeqNo)
+        if key in self._pending:
+            raise ValueError(f"clSeqNo 重复: {key}")
+        fut = self._pending[key] = asyncio.get_running_loop().create_future()
+        return key, fut
+
+    def _env_id(self, channel: Any) -> int:
+        """委托通道的客户端环境号（回报中的 clEnvId）"""
+        ch = channel or self.api.get_default_ord_channel()
+        return ch.pChannelCfg.contents.remoteCfg.clEnvId
+
+    async def _wait_ack(self, key: Tuple[int, int], fut: asyncio.Future, timeout: Optional[float]) -> Any:
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(key, None)
+
+    async def submit_order(self, req: OesOrdReqT, channel: Any = None,
+                           timeout: Any = _DEFAULT) -> Any:
+        """
+        发送委托并等待 OES 确认：on_order_insert 时返回 OesOrdCnfmT，
+        on_order_reject 时抛出 OrderRejectedError，超时抛出 asyncio.TimeoutError
+        req.clSeqNo 未设置时按 api.get_next_cl_seq_no 分配
+        """
+        key, fut = self._register(req, self._env_id(channel))
+        ret = self.api.send_order(channel, req)
+        if ret is None or ret < 0:
+            self._pending.pop(key, None)
+            raise RuntimeError(f"发送委托失败: {ret}")
+        return await self._wait_ack(key, fut, self.order_timeout if timeout is _DEFAULT else timeout)
+
+    async def submit_orders(self, reqs: Sequence[OesOrdReqT], channel: Any = None,
+                            timeout: Any = _DEFAULT) -> List[Any]:
+        """
+        批量发送委托并等待全部确认，返回与 reqs 一一对应的 OesOrdCnfmT 或异常（不抛出）
+        """
+        env_id = self._env_id(channel)
+        waits = [self._register(req, env_id) for req in reqs]
+        for start in range(0, len(reqs), _BATCH_LIMIT):
+            chunk = list(reqs[start:start + _BATCH_LIMIT])
+            ret = self.api.send_batch_orders(channel, chunk)
+            if ret is None or ret < 0:
+                for key, fut in waits[start:]:
+                    self._pending.pop(key, None)
+                    fut.set_exception(RuntimeError(f"批量发送委托失败: {ret}"))
+                break
+
+        timeout = self.order_timeout if timeout is _DEFAULT else timeout
+        return await asyncio.gather(*(self._wait_ack(key, fut, timeout) for key, fut in waits),
+                                    return_exceptions=True)
+
+    # —— 回报流 ——
+    def order_reports(self, max_batch: Optional[int] = None) -> AsyncStream:
+        """委托回报流（委托确认 / 状态变化 / 拒绝），元素为 (msgId, 回报体)"""
+        return self._stream("orders", max_batch)
+
+    def trade_reports(self, max_batch: Optional[int] = None) -> AsyncStream:
+        """成交回报流，元素为 (msgId, OesTrdCnfmT)"""
+        return self._stream("trades", max_batch)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+派发耗时统计（按 msgId / SPI 回调）与 C 异步队列积压采样（MDS / OES 通用）
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("DispatchMonitor")
+
+# msgId 为 uint8
+_MSG_ID_SPACE = 256
+
+
+class DispatchProfiler:
+    """
+    派发耗时统计器，挂在 MdsMsgDispatcher / OesMsgDispatcher 上（api.set_dispatch_profiler）
+
+    - 每条消息只做几次列表下标运算：次数 / 总耗时 / 最大耗时 / 异常次数按 msgId 存放；
+    - 同一个统计器可同时挂在多个通道、甚至 MDS 和 OES 上（name 区分时请各用一个实例）；
+    - snapshot() 按 SPI 回调名汇总，top() 给出上次调用以来耗时最多的回调。
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.counts: List[int] = [0] * _MSG_ID_SPACE
+        self.total_ns: List[int] = [0] * _MSG_ID_SPACE
+        self.max_ns: List[int] = [0] * _MSG_ID_SPACE
+        self.errors: List[int] = [0] * _MSG_ID_SPACE
+        self.last_error: Dict[int, str] = {}
+        self.callback_names: Dict[int, str] = {}
+        self._top_base: List[int] = [0] * _MSG_ID_SPACE
+        self._top_counts: List[int] = [0] * _MSG_ID_SPACE
+        self.started_at = time.time()
+
+    # —— 派发器接口（回调线程） ——
+    def register_callbacks(self, names: Dict[int, str]) -> None:
+        self.callback_names.update(names)
+
+    def on_dispatch(self, msg_id: int, elapsed_ns: int) -> None:
+        self.counts[msg_id] += 1
+        self.total_ns[msg_id] += elapsed_ns
+        if elapsed_ns > self.max_ns[msg_id]:
+            self.max_ns[msg_id] = elapsed_ns
+
+    def on_error(self, msg_id: int, err: Exception) -> None:
+        self.errors[msg_id] += 1
+        self.last_error[msg_id] = f"{type(err).__name__}: {err}"
+
+    # —— 查询 ——
+    def _name(self, msg_id: int) -> str:
+        return self.callback_names.get(msg_id) or f"msgId 0x{msg_id:02x}"
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        {SPI 回调名: {count, total_ms, mean_us, max_us, errors, msg_ids[, last_error]}}，
+        按总耗时降序；多个 msgId 对应同一回调时合并
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        for msg_id in range(_MSG_ID_SPACE):
+            count = self.counts[msg_id]
+            if not count and not self.errors[msg_id]:
+                continue
+            item = out.setdefault(self._name(msg_id), {
+                "count": 0, "total_ns": 0, "max_ns": 0, "errors": 0, "msg_ids": []})
+            item["count"] += count
+            item["total_ns"] += self.total_ns[msg_id]
+            item["max_ns"] = max(item["max_ns"], self.max_ns[msg_id])
+            item["errors"] += self.errors[msg_id]
+            item["msg_ids"].append(msg_id)
+            if msg_id in self.last_error:
+                item["last_error"] = self.last_error[msg_id]
+
+        for item in out.values():
+            total, mx = item.pop("total_ns"), item.pop("max_ns")
+            item["total_ms"] = round(total / 1e6, 3)
+            item["mean_us"] = round(total / item["count"] / 1e3, 3) if item["count"] else 0.0
+            item["max_us"] = round(mx / 1e3, 3)
+        if reset:
+            self.reset()
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+    def top(self, n: int = 3) -> List[Tuple[str, float, int]]:
+        """上次调用 top() 以来耗时最多的 n 个回调 [(回调名, 耗时毫秒, 次数)]"""
+        totals: Dict[str, List[float]] = {}
+        for msg_id in range(_MSG_ID_SPACE):
+            delta = self.total_ns[msg_id] - self._top_base[msg_id]
+            if delta > 0:
+                item = totals.setdefault(self._name(msg_id), [0.0, 0])
+                item[0] += delta / 1e6
+                item[1] += self.counts[msg_id] - self._top_counts[msg_id]
+        self._top_base = list(self.total_ns)
+        self._top_counts = list(self.counts)
+        ranked = sorted(totals.items(), key=lambda kv: -kv[1][0])[:n]
+        return [(name, round(ms, 3), count) for name, (ms, count) in ranked]
+
+    def reset(self) -> None:
+        self.counts = [0] * _MSG_ID_SPACE
+        self.total_ns = [0] * _MSG_ID_SPACE
+        self.max_ns = [0] * _MSG_ID_SPACE
+        self.errors = [0] * _MSG_ID_SPACE
+        self._top_base = [0] * _MSG_ID_SPACE
+        self._top_counts = [0] * _MSG_ID_SPACE
+        self.last_error.clear()
+        self.started_at = time.time()
+
+
+class BacklogSampler:
+    """
+    后台线程定期采样 C 异步 API 的队列积压与处理进度
+
+        profiler = DispatchProfiler("mds")
+        mds_api.set_dispatch_profiler(profiler)
+        sampler = BacklogSampler({"mds": mds_api, "oes": oes_api}, alert_backlog=10000,
+                                 profilers={"mds": profiler})
+        sampler.start()
+        sampler.snapshot()      # 最新采样、速率、告警次数及各回调耗时
+
+    - 每个 api 采样 get_async_queue_remaining_count / get_total_picked / get_total_io_picked，
+      保留最近 history 个采样点；
+    - 积压达到 alert_backlog 时调用 on_alert(api 名, 采样, 耗时最多的回调)（默认写日志），
+      回落到一半以下后才会再次告警。
+    """
+
+    def __init__(
+        self,
+        apis: Dict[str, Any],
+        interval: float = 1.0,
+        history: int = 600,
+        alert_backlog: Optional[int] = None,
+        on_alert: Optional[Callable[[str, Dict[str, Any], Optional[List[Tuple[str, float, int]]]], Any]] = None,
+        profilers: Optional[Dict[str, DispatchProfiler]] = None,
+    ):
+        """
+        apis: {名称: MdsClientApi / OesClientApi}（已启动）
+        interval: 采样间隔（秒）
+        history: 每个 api 保留的采样点数
+        alert_backlog: 积压告警阈值（条），None 表示不告警
+        on_alert: 告警回调，在采样线程中调用；未挂载统计器时第三个参数为 None
+        profilers: {名称: DispatchProfiler}，告警时给出对应 api 耗时最多的回调
+        """
+        if interval <= 0:
+            raise ValueError(f"interval 必须大于 0: {interval}")
+        self.apis = dict(apis)
+        self.interval = interval
+        self.alert_backlog = alert_backlog
+        self.on_alert = on_alert or self._log_alert
+        self.profilers = dict(profilers or {})
+        self.samples: Dict[str, Deque[Dict[str, Any]]] = {name: deque(maxlen=history) for name in self.apis}
+        self.alert_count: Dict[str, int] = {name: 0 for name in self.apis}
+        self._alerting: Dict[str, bool] = {name: False for name in self.apis}
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # —— 采样 ——
+    def sample_once(self) -> None:
+        now = time.time()
+        for name, api in self.apis.items():
+            try:
+                sample = {
+                    "time": now,
+                    "backlog": api.get_async_queue_remaining_count(),
+                    "queued": api.get_async_queue_total_count(),
+                    "picked": api.get_total_picked(),
+                    "io_picked": api.get_total_io_picked(),
+                }
+            except Exception:
+                _LOG.exception("❌ 采样 %s 队列状态失败", name)
+                continue
+
+            history = self.samples[name]
+            if history:
+                prev = history[-1]
+                dt = max(now - prev["time"], 1e-9)
+                sample["picked_rate"] = round((sample["picked"] - prev["picked"]) / dt, 1)
+                sample["io_picked_rate"] = round((sample["io_picked"] - prev["io_picked"]) / dt, 1)
+            history.append(sample)
+            self._check_alert(name, sample)
+
+    def _check_alert(self, name: str, sample: Dict[str, Any]) -> None:
+        if self.alert_backlog is None:
+            return
+        backlog = sample["backlog"]
+        if self._alerting[name]:
+            if backlog < self.alert_backlog // 2:
+                self._alerting[name] = False
+            return
+        if backlog >= self.alert_backlog:
+            self._alerting[name] = True
+            self.alert_count[name] += 1
+            profiler = self.profilers.get(name)
+            culprits = profiler.top() if profiler is not None else None
+            try:
+                self.on_alert(name, sample, culprits)
+            except Exception:
+                _LOG.exception("❌ 积压告警回调失败")
+
+    @staticmethod
+    def _log_alert(name: str, sample: Dict[str, Any], culprits: Optional[List[Tuple[str, float, int]]]) -> None:
+        if culprits is None:
+            detail = "未挂载统计器"
+        else:
+            detail = ", ".join(f"{cb} {ms:.1f}ms/{n}次" for cb, ms, n in culprits) or "无"
+        _LOG.warning("⚠️ %s 异步队列积压 %d 条（处理速率 %s/s），耗时最多的回调: %s",
+                     name, sample["backlog"], sample.get("picked_rate", "-"), detail)
+
+    # —— 线程 ——
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("采样线程已启动")
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                self.sample_once()
+
+        self._thread = threading.Thread(target=run, name="backlog-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # —— 查询 ——
+    def history(self, name: str) -> List[Dict[str, Any]]:
+        return list(self.samples[name])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{api 名: {最新采样..., max_backlog, alerts[, callbacks]}}"""
+        out: Dict[str, Any] = {}
+        for name, history in self.samples.items():
+            item: Dict[str, Any] = dict(history[-1]) if history else {}
+            item["max_backlog"] = max((s["backlog"] for s in history), default=0)
+            item["alerts"] = self.alert_count[name]
+            profiler = self.profilers.get(name)
+            if profiler is not None:
+                item["callbacks"] = profiler.snapshot()
+            out[name] = item
+        return out
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+由快照 / 逐笔成交增量合成多周期 OHLCV / VWAP K 线（按交易所时间收线）
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pulse.api.quote.subscription_manager import classify_code
+from pulse.core.data.types import MarketSnapshot
+
+_EXEC_TRADE = b"F"
+
+# 每个周期、每个标的的 K 线状态列
+_FLOAT_COLS = ("open", "high", "low", "close", "turnover")
+_INT_COLS = ("bar", "volume", "count")
+
+
+def exchange_time_to_ms(t: int) -> int:
+    """HHMMSSsss → 当日毫秒数"""
+    return ((t // 10000000) * 3600 + (t // 100000 % 100) * 60 + t // 1000 % 100) * 1000 + t % 1000
+
+
+def ms_to_hhmmss(ms: np.ndarray) -> np.ndarray:
+    """当日毫秒数 → HHMMSS"""
+    sec = ms // 1000
+    return sec // 3600 * 10000 + sec // 60 % 60 * 100 + sec % 60
+
+
+class BarAggregator:
+    """
+    全市场多周期 K 线合成
+
+    - 每个周期的状态存放在预分配的 NumPy 数组中（按标的槽位索引），每个标的两个槽位
+      轮流使用（bar 序号的奇偶），新 K 线开始时不必等上一根先被收线；
+    - 收线只由交易所时间驱动：收到的最大行情时间减去 grace_ms 越过 K 线结束时间后，
+      该周期所有未收的 K 线一次性（向量化）收线，以列式数据块 sink(周期秒数, {列名: 数组}) 输出；
+    - 早于已收线时间的迟到数据丢弃并计入 late_count；
+    - 快照的成交量 / 成交额取累计值的增量，逐笔成交直接累加；同一个实例只接一种数据源
+      （source，两种同时喂入会重复计量）。
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        intervals: Sequence[int] = (1, 60, 300),
+        sink: Optional[Callable[[int, Dict[str, np.ndarray]], Any]] = None,
+        grace_ms: int = 300,
+        source: str = "snapshot",
+    ):
+        """
+        symbols: 标的代码（写法同 classify_code，预分配槽位，不在其中的行情忽略）
+        intervals: K 线周期（秒）
+        sink: 收线回调 sink(周期秒数, 列式数据块)，在喂数据的线程中调用
+        grace_ms: 收线前等待迟到数据的时间（毫秒，不超过最小周期）
+        source: 数据源 'snapshot'（快照）或 'trade'（逐笔成交），供 MdsSpiLite 决定喂入哪种数据
+        """
+        if source not in ("snapshot", "trade"):
+            raise ValueError(f"source 只能是 'snapshot' 或 'trade': {source}")
+        if not intervals:
+            raise ValueError("intervals 不能为空")
+        self.source = source
+
+        codes = list(dict.fromkeys(symbols))
+        n = len(codes)
+        self.symbols = np.array(codes, dtype=object)
+        # 按 (exchId, instrId) 定位槽位，沪深同号的代码各占一个槽位
+        self._slots: Dict[Tuple[int, int], int] = {}
+        for i, c in enumerate(codes):
+            exch_id, _, instr_id = classify_code(c)
+            if self._slots.setdefault((exch_id, instr_id), i) != i:
+                raise ValueError(f"存在指向同一证券的重复代码: {c}")
+
+        self.intervals = tuple(int(i) for i in intervals)
+        self._interval_ms = np.array([i * 1000 for i in self.intervals], dtype=np.int64)
+        k = len(self.intervals)
+        self.sink = sink
+        self.grace_ms = min(grace_ms, int(self._interval_ms.min()) - 1)
+
+        # [周期, 槽位(奇偶), 标的]
+        shape = (k, 2, n)
+        self._f = {name: np.zeros(shape, dtype=np.float64) for name in _FLOAT_COLS}
+        self._i = {name: np.zeros(shape, dtype=np.int64) for name in _INT_COLS}
+        self._has = np.zeros(shape, dtype=np.bool_)
+        self._closed_through = np.zeros(k, dtype=np.int64)   # 序号小于该值的 K 线均已收线
+
+        # 快照累计量的上一次取值（-1 表示尚未收到）
+        self._cum_volume = np.full(n, -1, dtype=np.int64)
+        self._cum_turnover = np.zeros(n, dtype=np.float64)
+
+        self.clock_ms = 0
+        self.late_count = 0
+        self.bar_count = 0
+
+    # —— 输入 ——
+    def on_snapshot(self, snap: MarketSnapshot, exch_id: Optional[int] = None, instr_id: Optional[int] = None) -> None:
+        """
+        喂入一条快照（MdsSpiLite 的 MarketSnapshot）
+        exch_id / instr_id: 行情消息头中的交易所和证券编号；不提供时按 snap.symbol 识别
+        """
+        if exch_id is None or instr_id is None:
+            exch_id, _, instr_id = classify_code(snap.symbol)
+        s = self._slots.get((exch_id, instr_id))
+        if s is None or snap.last_price <= 0:
+            return
+
+        volume, turnover = 0, 0.0
+        last_volume = self._cum_volume[s]
+        if last_volume >= 0:
+            volume = snap.volume - last_volume
+            turnover = snap.turnover - self._cum_turnover[s]
+        if volume < 0:
+            # 累计量回退（如重连后收到旧快照），只更新价格
+            volume, turnover = 0, 0.0
+        else:
+            self._cum_volume[s] = snap.volume
+            self._cum_turnover[s] = snap.turnover
+
+        self._update(s, exchange_time_to_ms(snap.update_time), snap.last_price, volume, turnover)
+
+    def on_trade(self, tick: Any) -> None:
+        """喂入一条逐笔成交（MdsL2TradeT 或 L2_TRADE_FIELDS 投影），深交所撤单记录忽略"""
+        if tick.ExecType != _EXEC_TRADE:
+            return
+        s = self._slots.get((tick.exchId, tick.instrId))
+        if s is None:
+            return
+        price = tick.TradePrice / 10000.0
+        qty = tick.TradeQty
+        self._update(s, exchange_time_to_ms(tick.TransactTime), price, qty, price * qty)
+
+    def on_tick(self, msg_id: int, tick: Any) -> None:
+        """只处理逐笔成交（便于与 L2OrderBookEngine.on_tick 并列使用）"""
+        if hasattr(tick, "TradePrice"):
+            self.on_trade(tick)
+
+    def _update(self, s: int, t_ms: int, price: float, volume: int, turnover: float) -> None:
+        if t_ms > self.clock_ms:
+            self.advance(t_ms)
+
+        f, i, has = self._f, self._i, self._has
+        for k, iv in enumerate(self._interval_ms.tolist()):
+            b = t_ms // iv
+            if b < self._closed_through[k]:
+                self.late_count += 1
+                continue
+
+            p = b & 1
+            if not has[k, p, s] or i["bar"][k, p, s] != b:
+                has[k, p, s] = True
+                i["bar"][k, p, s] = b
+                f["open"][k, p, s] = f["high"][k, p, s] = f["low"][k, p, s] = price
+                f["turnover"][k, p, s] = turnover
+                i["volume"][k, p, s] = volume
+                i["count"][k, p, s] = 1
+            else:
+                if price > f["high"][k, p, s]:
+                    f["high"][k, p, s] = price
+                elif price < f["low"][k, p, s]:
+                    f["low"][k, p, s] = price
+                f["turnover"][k, p, s] += turnover
+                i["volume"][k, p, s] += volume
+                i["count"][k, p, s] += 1
+            f["close"][k, p, s] = price
+
+    # —— 收线 ——
+    def advance(self, t_ms: int) -> None:
+        """推进交易所时钟（毫秒），收掉已经结束的 K 线；没有行情的时段也可由外部调用推进"""
+        self.clock_ms = max(self.clock_ms, t_ms)
+        cutoff = self.clock_ms - self.grace_ms
+        for k, iv in enumerate(self._interval_ms.tolist()):
+            through = cutoff // iv
+            if through > self._closed_through[k]:
+                self._closed_through[k] = through
+                self._close(k, through)
+
+    def flush(self) -> None:
+        """收掉所有未收的 K 线（如收盘后）"""
+        for k in range(len(self.intervals)):
+            self._close(k, np.iinfo(np.int64).max)
+
+    def _close(self, k: int, through: int) -> None:
+        has, bar = self._has[k], self._i["bar"][k]
+        mask = has & (bar < through)
+        if not mask.any():
+            return
+
+        p_idx, s_idx = np.nonzero(mask)
+        order = np.lexsort((s_idx, bar[p_idx, s_idx]))
+        p_idx, s_idx = p_idx[order], s_idx[order]
+
+        block: Dict[str, np.ndarray] = {
+            "symbol": self.symbols[s_idx],
+            "bar_time": ms_to_hhmmss(bar[p_idx, s_idx] * self._interval_ms[k]),
+        }
+        for name in _FLOAT_COLS:
+            block[name] = self._f[name][k][p_idx, s_idx]
+        block["volume"] = self._i["volume"][k][p_idx, s_idx]
+        block["count"] = self._i["count"][k][p_idx, s_idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block["vwap"] = np.where(block["volume"] > 0,
+                                     block["turnover"] / block["volume"], block["close"])
+
+        has[mask] = False
+        self.bar_count += len(s_idx)
+        if self.sink is not None:
+            self.sink(self.intervals[k], block)
+
+    def current(self, interval: int) -> Dict[str, np.ndarray]:
+        """某个周期当前未收线的 K 线（每个标的取最新的一根，尚无数据的标的不含在内）"""
+        k = self.intervals.index(interval)
+        bar = np.where(self._has[k], self._i["bar"][k], -1)
+        p = np.argmax(bar, axis=0)
+        s_idx = np.flatnonzero(bar[p, np.arange(bar.shape[1])] >= 0)
+        p = p[s_idx]
+        out = {"symbol": self.symbols[s_idx],
+               "bar_time": ms_to_hhmmss(self._i["bar"][k][p, s_idx] * self._interval_ms[k])}
+        for name in _FLOAT_COLS:
+            out[name] = self._f[name][k][p, s_idx]
+        out["volume"] = self._i["volume"][k][p, s_idx]
+        out["count"] = self._i["count"][k][p, s_idx]
+        return out
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+基于逐笔委托 / 逐笔成交重建的本地 L2 全档位委托簿
+"""
+import time
+from array import array
+from math import gcd
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from vendor.quote_api import eMdsExchangeIdT, eMdsMsgTypeT
+
+from pulse.api.quote.subscription_manager import classify_code
+
+# 买卖方向
+SIDE_BID = 0
+SIDE_ASK = 1
+
+# 逐笔委托 / 逐笔成交需要的字段（属性名与 SDK 字段名一致，
+# 既可以直接处理 ctypes 结构体，也可以处理 MdsFieldProjection 投影后的 namedtuple；
+# exchId / ChannelNo / ApplSeqNum 供 TickGapTracker 检查序号连续性）
+L2_ORDER_FIELDS: Dict[str, str] = {
+    name: name for name in (
+        "exchId", "instrId", "ChannelNo", "SecurityID", "TransactTime", "ApplSeqNum",
+        "Side", "OrderType", "SseOrderNo", "Price", "OrderQty",
+    )
+}
+L2_TRADE_FIELDS: Dict[str, str] = {
+    name: name for name in (
+        "exchId", "instrId", "ChannelNo", "SecurityID", "TransactTime", "ApplSeqNum",
+        "ExecType", "TradeBSFlag", "TradePrice", "TradeQty", "BidApplSeqNum", "OfferApplSeqNum",
+    )
+}
+
+_SIDE_BUY = b"1"
+_SIDE_SELL = b"2"
+_SZSE_ORDER_MARKET = b"1"
+_SZSE_ORDER_SAMEPARTY_BEST = b"U"
+_SSE_ORDER_ADD = b"A"
+_SSE_ORDER_DELETE = b"D"
+_EXEC_CANCELED = b"4"
+
+_MSG_SSE_ORDER = eMdsMsgTypeT.MDS_MSGTYPE_L2_SSE_ORDER
+_MSG_TRADE = eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE
+_EXCH_SZSE = eMdsExchangeIdT.MDS_EXCH_SZSE
+
+
+def _book_key(code: str) -> Tuple[int, int]:
+    """证券代码 → 委托簿的键 (exchId, instrId)"""
+    exch_id, _, instr_id = classify_code(code)
+    return exch_id, instr_id
+
+
+class L2BookSnapshot(NamedTuple):
+    """委托簿前 N 档（价格单位与 SDK 一致: 1元=10000，不足 N 档的部分为 0）"""
+    exch_id: int
+    instr_id: int
+    symbol: str
+    transact_time: int      # 最后一条逐笔的时间 HHMMSSsss
+    bid_px: np.ndarray
+    bid_qty: np.ndarray
+    bid_cnt: np.ndarray
+    ask_px: np.ndarray
+    ask_qty: np.ndarray
+    ask_cnt: np.ndarray
+
+
+class L2OrderBook:
+    """
+    单个标的的全档位委托簿
+
+    - 价位按 price // tick 映射到连续数组下标，每档只存委托量和委托笔数（array 紧凑存储）；
+      数组按需扩容，遇到不在当前最小价位上的价格时自动按最大公约数细分价位；
+    - 订单号索引 {订单号: 剩余量 << 33 | 价格 << 1 | 方向}，一个订单只占一个整数；
+    - 最优价下标随增删单维护，档位清空时用 NumPy 在数组视图上查找下一个非空档。
+    """
+
+    __slots__ = (
+        "exch_id", "instr_id", "symbol", "tick", "base", "capacity",
+        "qty", "cnt", "best_bid", "best_ask", "orders",
+        "transact_time", "dirty", "update_count",
+    )
+
+    def __init__(self, instr_id: int, symbol: str = "", price_tick: int = 100, capacity: int = 256,
+                 exch_id: int = 0):
+        """
+        price_tick: 初始最小价位（SDK 价格单位，100 即 0.01 元）
+        capacity: 初始价位数量，不够时自动扩容
+        exch_id: 交易所代码 @see eMdsExchangeIdT
+        """
+        self.exch_id = exch_id
+        self.instr_id = instr_id
+        self.symbol = symbol
+        self.tick = price_tick
+        self.base: Optional[int] = None     # 下标 0 对应的价格 / tick
+        self.capacity = capacity
+        self.qty = (array("q", bytes(8 * capacity)), array("q", bytes(8 * capacity)))
+        self.cnt = (array("i", bytes(4 * capacity)), array("i", bytes(4 * capacity)))
+        self.best_bid = -1                  # 最优档下标，-1 表示该方向为空
+        self.best_ask = -1
+        self.orders: Dict[int, int] = {}
+        self.transact_time = 0
+        self.dirty = False
+        self.update_count = 0
+
+    # —— 价位数组 ——
+    def _index(self, price: int) -> int:
+        if price % self.tick:
+            self._regrid(gcd(self.tick, price))
+        if self.base is None:
+            self.base = price // self.tick - self.capacity // 2
+        i = price // self.tick - self.base
+        if i < 0 or i >= self.capacity:
+            self._grow(i)
+            i = price // self.tick - self.base
+        return i
+
+    def _rebuild(self, tick: int, base: int, capacity: int) -> None:
+        """按新的价位和范围重新排列档位数据"""
+        qty = (array("q", bytes(8 * capacity)), array("q", bytes(8 * capacity)))
+        cnt = (array("i", bytes(4 * capacity)), array("i", bytes(4 * capacity)))
+        for side in (SIDE_BID, SIDE_ASK):
+            old_qty, old_cnt = self.qty[side], self.cnt[side]
+            for i in np.flatnonzero(np.frombuffer(old_qty, dtype=np.int64)).tolist():
+                j = (self.base + i) * self.tick // tick - base
+                qty[side][j] += old_qty[i]
+                cnt[side][j] += old_cnt[i]
+        self.tick, self.base, self.capacity = tick, base, capacity
+        self.qty, self.cnt = qty, cnt
+        self.best_bid = self._scan_best(SIDE_BID)
+        self.best_ask = self._scan_best(SIDE_ASK)
+
+    def _grow(self, i: int) -> None:
+        lo, hi = min(i, 0), max(i + 1, self.capacity)
+        capacity = self.capacity
+        while capacity < (hi - lo) + capacity // 4:
+            capacity *= 2
+        # 新增空间两端平分，减少再次扩容
+        base = self.base + lo - (capacity - (hi - lo)) // 2
+        self._rebuild(self.tick, base, capacity)
+
+    def _regrid(self, tick: int) -> None:
+        if self.base is None:
+            self.tick = tick
+            return
+        ratio = self.tick // tick
+        self._rebuild(tick, self.base * ratio, self.capacity * ratio)
+
+    def _scan_best(self, side: int, end: Optional[int] = None) -> int:
+        levels = np.frombuffer(self.qty[side], dtype=np.int64)
+        if side == SIDE_BID:
+            nz = np.flatnonzero(levels[:end] if end is not None else levels)
+            return int(nz[-1]) if nz.size else -1
+        start = end if end is not None else 0
+        nz = np.flatnonzero(levels[start:])
+        return int(nz[0]) + start if nz.size else -1
+
+    def _price(self, i: int) -> int:
+        return (self.base + i) * self.tick
+
+    # —— 订单操作 ——
+    def add_order(self, order_id: int, side: int, price: int, qty: int) -> None:
+        """新增委托（已存在的订单号先撤销旧委托）"""
+        if qty <= 0 or price <= 0:
+            return
+        if order_id in self.orders:
+            self.reduce_order(order_id)
+
+        i = self._index(price)
+        self.qty[side][i] += qty
+        self.cnt[side][i] += 1
+        if side == SIDE_BID:
+            if i > self.best_bid:
+                self.best_bid = i
+        elif self.best_ask < 0 or i < self.best_ask:
+            self.best_ask = i
+        self.orders[order_id] = (qty << 33) | (price << 1) | side
+        self.dirty = True
+
+    def reduce_order(self, order_id: int, qty: Optional[int] = None) -> bool:
+        """
+        成交或撤单减少委托量，qty 为 None 时撤销全部剩余量；
+        订单号不在簿中（市价单、上交所主动单等）时返回 False
+        """
+        packed = self.orders.get(order_id)
+        if packed is None:
+            return False
+
+        side, price, remain = packed & 1, (packed >> 1) & 0xFFFFFFFF, packed >> 33
+        done = remain if qty is None or qty >= remain else qty
+        remain -= done
+        i = price // self.tick - self.base
+
+        level_qty = self.qty[side]
+        level_qty[i] -= done
+        if remain > 0:
+            self.orders[order_id] = (remain << 33) | (price << 1) | side
+        else:
+            del self.orders[order_id]
+            self.cnt[side][i] -= 1
+
+        if level_qty[i] <= 0 or self.cnt[side][i] <= 0:
+            level_qty[i] = 0
+            self.cnt[side][i] = 0
+            if side == SIDE_BID and i == self.best_bid:
+                self.best_bid = self._scan_best(SIDE_BID, i)
+            elif side == SIDE_ASK and i == self.best_ask:
+                self.best_ask = self._scan_best(SIDE_ASK, i)
+        self.dirty = True
+        return True
+
+    def best_price(self, side: int) -> int:
+        """最优价，该方向为空时返回 0"""
+        i = self.best_bid if side == SIDE_BID else self.best_ask
+        return self._price(i) if i >= 0 else 0
+
+    def top(self, depth: int = 10) -> L2BookSnapshot:
+        """取前 depth 档"""
+        out: List[np.ndarray] = []
+        for side in (SIDE_BID, SIDE_ASK):
+            px = np.zeros(depth, dtype=np.int64)
+            qty = np.zeros(depth, dtype=np.int64)
+            cnt = np.zeros(depth, dtype=np.int32)
+            best = self.best_bid if side == SIDE_BID else self.best_ask
+            if best >= 0:
+                levels = np.frombuffer(self.qty[side], dtype=np.int64)
+                if side == SIDE_BID:
+                    idx = np.flatnonzero(levels[:best + 1])[-depth:][::-1]
+                else:
+                    idx = np.flatnonzero(levels[best:])[:depth] + best
+                n = idx.size
+                px[:n] = (self.base + idx) * self.tick
+                qty[:n] = levels[idx]
+                cnt[:n] = np.frombuffer(self.cnt[side], dtype=np.int32)[idx]
+            out.extend((px, qty, cnt))
+        return L2BookSnapshot(self.exch_id, self.instr_id, self.symbol, self.transact_time, *out)
+
+    def clear(self) -> None:
+        self.__init__(self.instr_id, self.symbol, self.tick, self.capacity, self.exch_id)
+
+
+class L2OrderBookEngine:
+    """
+    逐笔委托 / 逐笔成交 → 按 (exchId, instrId) 维护的全档位委托簿（运行在 MDS 回调线程）
+
+    深交所（MDS_MSGTYPE_L2_ORDER）:
+      - 订单号为 ApplSeqNum；限价单按委托价挂入，本方最优按当前本方最优价挂入，
+        市价单不挂入（剩余部分由交易所撤销）；
+      - 逐笔成交 ExecType='F' 按 Bid/OfferApplSeqNum 扣减双方委托，ExecType='4' 为撤单。
+    上交所（MDS_MSGTYPE_L2_SSE_ORDER）:
+      - 订单号为 SseOrderNo；OrderType='A' 挂入撮合后的剩余量，'D' 撤单，'S' 产品状态订单忽略；
+      - 逐笔成交扣减簿中的被动方委托，主动方尚未挂入时自然跳过。
+
+    有变化的簿按 publish_interval 秒的节奏把前 depth 档交给 sink
+    （如 SnapshotBridge(policy="conflate", key=attrgetter("exch_id", "instr_id")).put）。
+    symbols / price_ticks / snapshot() / reset() 中的代码写法同 classify_code（如 "000001.SZ"）。
+    """
+
+    def __init__(
+        self,
+        depth: int = 10,
+        publish_interval: Optional[float] = 0.1,
+        sink: Optional[Callable[[L2BookSnapshot], Any]] = None,
+        symbols: Optional[Iterable[str]] = None,
+        price_tick: int = 100,
+        price_ticks: Optional[Dict[str, int]] = None,
+    ):
+        """
+        depth: 发布的档位数
+        publish_interval: 发布间隔（秒），0 表示每条逐笔都发布，None 表示只在调用 publish() 时发布
+        sink: 接收 L2BookSnapshot 的回调，在 MDS 回调线程中调用
+        symbols: 只重建这些标的，None 表示全部
+        price_tick / price_ticks: 默认最小价位及按代码指定的最小价位（如基金 10，即 0.001 元）
+        """
+        self.depth = depth
+        self.publish_interval = publish_interval
+        self.sink = sink
+        self.keys = frozenset(_book_key(c) for c in symbols) if symbols is not None else None
+        self.price_tick = price_tick
+        self.price_ticks = {_book_key(c): tick for c, tick in (price_ticks or {}).items()}
+
+        # (exchId, instrId) -> 委托簿，沪深同号的代码各自一个簿
+        self.books: Dict[Tuple[int, int], L2OrderBook] = {}
+        self._dirty: Dict[Tuple[int, int], L2OrderBook] = {}
+        self._next_publish = 0.0
+
+        self.order_count = 0
+        self.trade_count = 0
+        self.publish_count = 0
+
+    def _book(self, key: Tuple[int, int], security_id: bytes) -> L2OrderBook:
+        book = L2OrderBook(key[1], security_id.decode(),
+                           self.price_ticks.get(key, self.price_tick), exch_id=key[0])
+        self.books[key] = book
+        return book
+
+    def on_order(self, msg_id: int, order: Any) -> None:
+        """处理一条逐笔委托（MdsL2OrderT 或按 L2_ORDER_FIELDS 投影的 namedtuple）"""
+        key = (order.exchId, order.instrId)
+        if self.keys is not None and key not in self.keys:
+            return
+        book = self.books.get(key) or self._book(key, order.SecurityID)
+
+        side_flag = order.Side
+        if side_flag == _SIDE_BUY:
+            side = SIDE_BID
+        elif side_flag == _SIDE_SELL:
+            side = SIDE_ASK
+        else:
+            side = -1
+
+        order_type = order.OrderType
+        if msg_id == _MSG_SSE_ORDER:
+            if order_type == _SSE_ORDER_ADD and side >= 0:
+                book.add_order(order.SseOrderNo, side, order.Price, order.OrderQty)
+            elif order_type == _SSE_ORDER_DELETE:
+                book.reduce_order(order.SseOrderNo, order.OrderQty)
+        elif side >= 0 and order_type != _SZSE_ORDER_MARKET:
+            price = book.best_price(side) if order_type == _SZSE_ORDER_SAMEPARTY_BEST \
+                else order.Price
+            book.add_order(order.ApplSeqNum, side, price, order.OrderQty)
+
+        book.transact_time = order.TransactTime
+        self.order_count += 1
+        self._touch(book)
+
+    def on_trade(self, trade: Any) -> None:
+        """处理一条逐笔成交（MdsL2TradeT 或按 L2_TRADE_FIELDS 投影的 namedtuple）"""
+        key = (trade.exchId, trade.instrId)
+        if self.keys is not None and key not in self.keys:
+            return
+        book = self.books.get(key) or self._book(key, trade.SecurityID)
+
+        qty = trade.TradeQty
+        if trade.exchId == _EXCH_SZSE and trade.ExecType == _EXEC_CANCELED:
+            # 深交所撤单: 只有被撤的一方订单号非 0
+            book.reduce_order(trade.BidApplSeqNum or trade.OfferApplSeqNum, qty)
+        else:
+            book.reduce_order(trade.BidApplSeqNum, qty)
+            book.reduce_order(trade.OfferApplSeqNum, qty)
+
+        book.transact_time = trade.TransactTime
+        self.trade_count += 1
+        self._touch(book)
+
+    def on_tick(self, msg_id: int, tick: Any) -> None:
+        """按消息类型分发逐笔委托 / 逐笔成交（可直接作为 TickGapTracker 的 sink）"""
+        if msg_id == _MSG_TRADE:
+            self.on_trade(tick)
+        else:
+            self.on_order(msg_id, tick)
+
+    def _touch(self, book: L2OrderBook) -> None:
+        if book.dirty:
+            book.update_count += 1
+            self._dirty[(book.exch_id, book.instr_id)] = book
+        interval = self.publish_interval
+        if interval is not None and self._dirty:
+            now = time.monotonic()
+            if now >= self._next_publish:
+                self._next_publish = now + interval
+                self.publish()
+
+    def publish(self) -> List[L2BookSnapshot]:
+        """发布自上次发布以来有变化的簿，返回发布的快照"""
+        snapshots = []
+        dirty, self._dirty = self._dirty, {}
+        for book in dirty.values():
+            book.dirty = False
+            snapshots.append(book.top(self.depth))
+        if self.sink is not None:
+            for snap in snapshots:
+                self.sink(snap)
+        self.publish_count += len(snapshots)
+        return snapshots
+
+    def snapshot(self, symbol: str) -> Optional[L2BookSnapshot]:
+        """立即取某个标的的前 depth 档，尚未收到该标的逐笔时返回 None"""
+        book = self.books.get(_book_key(symbol))
+        return book.top(self.depth) if book is not None else None
+
+    def reset(self, symbols: Optional[Iterable[str]] = None) -> None:
+        """清空委托簿（如逐笔数据出现缺口且无法重传时），None 表示全部"""
+        keys = self.books.keys() if symbols is None else [_book_key(c) for c in symbols]
+        for key in list(keys):
+            book = self.books.get(key)
+            if book is not None:
+                book.clear()
+                self._dirty[key] = book
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+行情链路分段延迟采样（对数-线性直方图，按 msgId / 通道统计分位数）
+"""
+import calendar
+import ctypes
+import datetime
+import json
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from vendor.quote_api import MdsMktRspMsgBodyT, MdsMktDataSnapshotHeadT, eMdsMsgTypeT
+from vendor.quote_api.c_api_wrapper.mds_field_projection import MDS_PROJECTABLE_MSG_ID_TO_BODY
+
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("LatencyMonitor")
+
+# 分段（纳秒）：
+#   feed       交易所时间 → MDS 收到原始行情（origNetTime，跨时钟，精度为交易所时间的毫秒）
+#   server     MDS 收到 → MDS 推送（pushingTime - origNetTime，同一服务器时钟）
+#   transport  MDS 推送 → 进入 _handle_mkt_data_msg（网络 + C API 队列 + 等待 GIL，跨时钟）
+#   callback   进入派发 → SPI 回调返回
+#   total      交易所时间 → SPI 回调返回
+#   queue      写入桥接缓冲 → 消费者取走（按队列统计）
+STAGES = ("feed", "server", "transport", "callback", "total")
+
+_CST_OFFSET_SEC = 8 * 3600
+_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# msgId -> 消息类型名（去掉 MDS_MSGTYPE_ 前缀）
+_MSG_NAMES = {int(v): k[len("MDS_MSGTYPE_"):] for k, v in vars(eMdsMsgTypeT).items()
+              if k.startswith("MDS_MSGTYPE_")}
+
+
+class LogLinearHistogram:
+    """
+    对数-线性直方图（HdrHistogram 的简化版）
+
+    每个 2 的幂区间再线性分为 2**sub_bits 个桶，相对误差不超过 2**-sub_bits；
+    记录只做整数运算和一次列表自增，多个线程同时写入时计数可能有极少量丢失。
+    """
+
+    def __init__(self, sub_bits: int = 5, max_bits: int = 44):
+        """
+        sub_bits: 每个 2 的幂区间的线性桶数（2 的指数）
+        max_bits: 可记录的最大值（2 的指数，默认约 4.9 小时的纳秒数），更大的值记入最后一个桶
+        """
+        self.sub_bits = sub_bits
+        self._size = ((max_bits - sub_bits) << sub_bits) + (1 << (sub_bits + 1))
+        self.counts: List[int] = [0] * self._size
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.negative = 0       # 小于 0 的采样（跨时钟的分段可能出现），按 0 计入
+
+    def _index(self, v: int) -> int:
+        shift = v.bit_length() - self.sub_bits - 1
+        if shift <= 0:
+            return v
+        idx = (shift << self.sub_bits) + (v >> shift)
+        return idx if idx < self._size else self._size - 1
+
+    def _value(self, idx: int) -> int:
+        """桶的中间值"""
+        shift = (idx >> self.sub_bits) - 1
+        if shift <= 0:
+            return idx
+        return ((idx - (shift << self.sub_bits)) << shift) + (1 << (shift - 1))
+
+    def record(self, v: int) -> None:
+        if v < 0:
+            self.negative += 1
+            v = 0
+        self.counts[self._index(v)] += 1
+        self.count += 1
+        self.total += v
+        if v > self.max:
+            self.max = v
+
+    def record_many(self, values: Iterable[int]) -> None:
+        for v in values:
+            self.record(v)
+
+    def merge(self, other: "LogLinearHistogram") -> None:
+        if other.sub_bits != self.sub_bits or other._size != self._size:
+            raise ValueError("直方图精度不一致，无法合并")
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.negative += other.negative
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """第 q 百分位（0~100）的近似值，无数据时返回 0"""
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * q / 100.0 + 0.5))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self._value(i), self.max)
+        return self.max
+
+    def summary(self, unit: float = 1000.0) -> Dict[str, float]:
+        """count / mean / 各分位数 / max，数值按 unit 换算（默认纳秒 → 微秒）"""
+        out: Dict[str, float] = {"count": self.count}
+        if self.count:
+            out["mean"] = round(self.total / self.count / unit, 3)
+            for q in _PERCENTILES:
+                out[f"p{q:g}"] = round(self.percentile(q) / unit, 3)
+            out["max"] = round(self.max / unit, 3)
+        if self.negative:
+            out["negative"] = self.negative
+        return out
+
+    def reset(self) -> None:
+        self.counts = [0] * self._size
+        self.count = self.total = self.max = self.negative = 0
+
+
+def _time_layout(msg_id: int) -> Optional[Tuple[int, int, struct.Struct]]:
+    """
+    消息体中 tradeDate、交易所时间、origNetTime、pushingTime 的读取方式：
+    (相对 MdsMktRspMsgBodyT 的起始偏移, 读取长度, 解包格式 → (日期, 时间, 秒, 纳秒, 秒, 纳秒))；
+    快照取快照头，逐笔取逐笔结构体本身
+    """
+    define = MDS_PROJECTABLE_MSG_ID_TO_BODY.get(msg_id)
+    if define is None:
+        return None
+    member_name, body_type, _ = define
+    base = getattr(MdsMktRspMsgBodyT, member_name).offset
+    if hasattr(body_type, "head"):
+        base += body_type.head.offset
+        body_type, exch_time = MdsMktDataSnapshotHeadT, "updateTime"
+    elif hasattr(body_type, "TransactTime"):
+        exch_time = "TransactTime"
+    else:
+        return None
+
+    fields = sorted((getattr(body_type, name).offset, size) for name, size in (
+        ("tradeDate", 1), (exch_time, 1), ("origNetTime", 2), ("pushingTime", 2)))
+    fmt, pos = "<", fields[0][0]
+    for offset, n in fields:
+        fmt += f"{offset - pos}x{n}i"
+        pos = offset + 4 * n
+    return base + fields[0][0], pos - fields[0][0], struct.Struct(fmt)
+
+
+class QuoteLatencyMonitor:
+    """
+    行情链路延迟采样器
+
+        monitor = QuoteLatencyMonitor()
+        mds_api.set_latency_probe(monitor, channel)         # 派发函数内采样 feed..total
+        monitor.attach_queue(snapshot_bridge)               # 桥接缓冲的排队时长
+        monitor.start_export(10.0, path="latency.jsonl")    # 每 10 秒追加一行快照
+        monitor.snapshot()                                  # 进程内随时查询
+
+    MdsSpiLite 指定 latency_monitor 后会在连接时自动完成前两步。
+    sample_every > 1 时每 N 条消息采样一条，进一步降低开销。
+    """
+
+    def __init__(self, sample_every: int = 1, sub_bits: int = 5):
+        if sample_every < 1:
+            raise ValueError(f"sample_every 必须大于 0: {sample_every}")
+        self.sample_every = sample_every
+        self.sub_bits = sub_bits
+        self._seen = 0
+
+        self._lock = threading.Lock()
+        # (分组维度, 键) -> {分段: 直方图}
+        self._hists: Dict[Tuple[str, Any], Dict[str, LogLinearHistogram]] = {}
+        # 热路径缓存: (id(通道), msgId) -> (时间字段布局, msgId 直方图组, 通道直方图组)
+        self._slots: Dict[Tuple[int, int], Any] = {}
+        # tradeDate -> 当日零点（北京时间）的纳秒时间戳
+        self._midnight_ns: Dict[int, int] = {}
+        self.started_at = time.time()
+
+        self._export_thread: Optional[threading.Thread] = None
+        self._export_stop = threading.Event()
+
+    # —— 直方图 ——
+    def _group(self, dim: str, key: Any, stages: Iterable[str] = STAGES) -> Dict[str, LogLinearHistogram]:
+        with self._lock:
+            group = self._hists.get((dim, key))
+            if group is None:
+                group = self._hists[(dim, key)] = {s: LogLinearHistogram(self.sub_bits) for s in stages}
+            return group
+
+    def _slot(self, channel: Any, msg_id: int) -> Any:
+        try:
+            tag = channel.pChannelCfg.contents.channelTag.decode()
+        except Exception:
+            tag = str(id(channel))
+        name = _MSG_NAMES.get(msg_id) or f"0x{msg_id:02x}"
+        slot = (_time_layout(msg_id), self._group("msg", name), self._group("channel", tag))
+        self._slots[(id(channel), msg_id)] = slot
+        return slot
+
+    def _exchange_ns(self, trade_date: int, hhmmsssss: int) -> int:
+        midnight = self._midnight_ns.get(trade_date)
+        if midnight is None:
+            day = datetime.date(trade_date // 10000, trade_date // 100 % 100, trade_date % 100)
+            midnight = (calendar.timegm(day.timetuple()) - _CST_OFFSET_SEC) * 1_000_000_000
+            self._midnight_ns[trade_date] = midnight
+        t = hhmmsssss
+        ms = ((t // 10000000) * 3600 + (t // 100000 % 100) * 60 + t // 1000 % 100) * 1000 + t % 1000
+        return midnight + ms * 1_000_000
+
+    # —— 探针（MDS 回调线程） ——
+    def on_dispatch(self, channel: Any, msg_id: int, p_msg_item: Any, entry_ns: int, return_ns: int) -> None:
+        """MdsMsgDispatcher 在 SPI 回调返回后调用 @see MdsMsgDispatcher.set_latency_probe"""
+        if self.sample_every > 1:
+            self._seen += 1
+            if self._seen % self.sample_every:
+                return
+
+        slot = self._slots.get((id(channel), msg_id)) or self._slot(channel, msg_id)
+        layout, by_msg, by_channel = slot
+        callback = return_ns - entry_ns
+        by_msg["callback"].record(callback)
+        by_channel["callback"].record(callback)
+        if layout is None:
+            return
+
+        start, length, fields = layout
+        raw = ctypes.string_at(ctypes.cast(p_msg_item, ctypes.c_void_p).value + start, length)
+        trade_date, exch_time, net_sec, net_nsec, push_sec, push_nsec = fields.unpack(raw)
+        if trade_date <= 0:
+            return
+        exch_ns = self._exchange_ns(trade_date, exch_time)
+        net_ns = net_sec * 1_000_000_000 + net_nsec
+        push_ns = push_sec * 1_000_000_000 + push_nsec
+
+        total = return_ns - exch_ns
+        by_msg["total"].record(total)
+        by_channel["total"].record(total)
+        if net_sec > 0:
+            by_msg["feed"].record(net_ns - exch_ns)
+            by_channel["feed"].record(net_ns - exch_ns)
+        if push_sec > 0:
+            transport = entry_ns - push_ns
+            by_msg["transport"].record(transport)
+            by_channel["transport"].record(transport)
+            if net_sec > 0:
+                by_msg["server"].record(push_ns - net_ns)
+                by_channel["server"].record(push_ns - net_ns)
+
+    def attach_queue(self, bridge: Any, name: str = "snapshot_bridge") -> None:
+        """采样 SnapshotBridge 的排队时长（写入 → 消费者取走）"""
+        hist = self._group("queue", name, ("queue",))["queue"]
+        bridge.enable_latency(hist.record_many)
+
+    # —— 查询 / 导出 ——
+    def histogram(self, dim: str, key: Any, stage: str) -> Optional[LogLinearHistogram]:
+        """dim: 'msg'（键为消息类型名，如 'L2_TRADE'）/ 'channel'（通道标签）/ 'queue'（队列名）"""
+        group = self._hists.get((dim, key))
+        return group.get(stage) if group else None
+
+    def snapshot(self, reset: bool = False, unit: float = 1000.0) -> Dict[str, Any]:
+        """
+        {"time", "since", "unit", "msg": {...}, "channel": {...}, "queue": {...}}，
+        每个键下为 {分段: {count, mean, p50, p90, p99, p99.9, max}}，默认单位微秒；
+        reset=True 时清零（用于按导出周期统计）
+        """
+        now = time.time()
+        out: Dict[str, Any] = {"time": now, "since": self.started_at, "unit": "us" if unit == 1000.0 else unit,
+                               "msg": {}, "channel": {}, "queue": {}}
+        with self._lock:
+            groups = list(self._hists.items())
+        for (dim, key), group in groups:
+            stats = {stage: h.summary(unit) for stage, h in group.items() if h.count}
+            if stats:
+                out[dim][str(key)] = stats
+            if reset:
+                for h in group.values():
+                    h.reset()
+        if reset:
+            self.started_at = now
+        return out
+
+    def start_export(self, interval: float = 10.0, path: Optional[str] = None,
+                     sink: Optional[Callable[[Dict[str, Any]], Any]] = None, reset: bool = True) -> None:
+        """
+        后台线程每 interval 秒导出一次快照：写入 path（JSON Lines 追加）和 / 或调用 sink(snapshot)，
+        都未指定时输出到日志
+        """
+        if self._export_thread is not None:
+            raise RuntimeError("导出线程已启动")
+        self._export_stop.clear()
+
+        def run():
+            while not self._export_stop.wait(interval):
+                try:
+                    snap = self.snapshot(reset=reset)
+                    if path:
+                        with open(path, "a", encoding="utf-8") as f:
+                            f.write(json.dumps(snap, ensure_ascii=False) + "\n")
+                    if sink is not None:
+                        sink(snap)
+                    if not path and sink is None:
+                        _LOG.info("📊 行情延迟: %s", json.dumps(snap, ensure_ascii=False))
+                except Exception:
+                    _LOG.exception("❌ 导出延迟快照失败")
+
+        self._export_thread = threading.Thread(target=run, name="latency-export", daemon=True)
+        self._export_thread.start()
+
+    def stop_export(self) -> None:
+        self._export_stop.set()
+        if self._export_thread is not None:
+            self._export_thread.join()
+            self._export_thread = None
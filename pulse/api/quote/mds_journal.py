@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+MDS 行情消息的二进制录制与回放
+
+- MdsJournalWriter: 挂到 MdsClientApi 的行情通道上 (MdsClientApi.set_msg_recorder)，
+  把原始 SMsgHeadT + 消息体字节连同接收时间追加写入分段的内存映射文件；
+- MdsJournalReader: 顺序读取日志文件中的消息；
+- MdsReplayer: 把日志中的消息重新送入 MdsMsgDispatcher，驱动任意 MdsClientSpi，
+  支持全速 / 实时 / 倍速回放以及 msgId、证券代码过滤，无需 MDS 动态库。
+
+日志文件格式（本机字节序）:
+  文件头 16 字节: 魔数 b"PLSMDSJ1" + 文件头长度(uint32) + 保留(uint32)
+  每条记录: 记录长度(uint32，含记录头) + 接收时间(int64 ns) + SMsgHeadT + 消息体
+  记录长度为 0 表示该分段结束
+"""
+import ctypes
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from vendor.quote_api import (
+    MdsClientSpi,
+    MdsMsgDispatcher,
+    MdsAsyncApiChannelT,
+)
+from vendor.quote_api.c_api_wrapper.mds_field_projection import (
+    MDS_PROJECTABLE_MSG_ID_TO_BODY,
+    _resolve_field_path,
+)
+from vendor.quote_api.model import SMsgHeadT, MdsMktRspMsgBodyT
+
+JOURNAL_MAGIC = b"PLSMDSJ1"
+JOURNAL_SUFFIX = ".jrnl"
+
+_FILE_HEAD = struct.Struct("=8sII")
+_RECORD_HEAD = struct.Struct("=Iq")
+_MSG_HEAD_SIZE = ctypes.sizeof(SMsgHeadT)
+_MAX_BODY_SIZE = ctypes.sizeof(MdsMktRspMsgBodyT)
+_MAX_RECORD_SIZE = _RECORD_HEAD.size + _MSG_HEAD_SIZE + _MAX_BODY_SIZE
+
+# 回放速度: None 表示不等待（全速回放）
+SPEED_MAX = None
+SPEED_REALTIME = 1.0
+
+
+def _segment_path(directory: str, prefix: str, index: int) -> str:
+    return os.path.join(directory, f"{prefix}.{index:05d}{JOURNAL_SUFFIX}")
+
+
+def _segment_index(path: str, prefix: str) -> int:
+    """分段文件名中的序号，不是 prefix.NNNNN 形式的文件返回 -1"""
+    name = os.path.basename(path)[len(prefix) + 1:-len(JOURNAL_SUFFIX)]
+    return int(name) if name.isdigit() else -1
+
+
+def list_segments(path: str, prefix: str = "mds") -> List[str]:
+    """返回日志目录下的全部分段文件（按序号排序）；path 为单个文件时直接返回"""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(path, f"{prefix}.*{JOURNAL_SUFFIX}")))
+
+
+class MdsJournalWriter:
+    """
+    行情消息录制器（运行在 MDS 回调线程）
+
+    - record() 只做一次 memmove 把消息头和消息体拷贝进映射内存，不做任何解码；
+    - 单个分段写满后自动切换到下一个分段，close() 时把最后一个分段截断到实际长度；
+    - 多个行情通道可以共用同一个录制器（内部加锁）。
+    """
+
+    def __init__(self, directory: str, segment_size: int = 256 << 20, prefix: str = "mds"):
+        """
+        directory: 日志目录，不存在时自动创建
+        segment_size: 单个分段文件的大小（字节）
+        prefix: 分段文件名前缀，文件名形如 mds.00000.jrnl
+        """
+        if segment_size < _FILE_HEAD.size + _MAX_RECORD_SIZE:
+            raise ValueError(f"分段大小过小: {segment_size}")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_size = segment_size
+
+        # 接着已有的分段继续编号，避免覆盖之前录制的数据
+        # （取最大序号 + 1，中间缺号时也不会复用已有文件名）
+        existing = list_segments(directory, prefix)
+        self._index = max((_segment_index(p, prefix) for p in existing), default=-1) + 1
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[ctypes.Array] = None
+        self._base = 0
+        self._pos = 0
+        self._closed = False
+
+        self.record_count = 0
+        self.byte_count = 0
+
+        self._open_segment()
+
+    def _open_segment(self) -> None:
+        path = _segment_path(self.directory, self.prefix, self._index)
+        self._index += 1
+
+        self._file = open(path, "w+b")
+        self._file.truncate(self.segment_size)
+        self._mmap = mmap.mmap(self._file.fileno(), self.segment_size)
+        _FILE_HEAD.pack_into(self._mmap, 0, JOURNAL_MAGIC, _FILE_HEAD.size, 0)
+
+        self._view = (ctypes.c_char * self.segment_size).from_buffer(self._mmap)
+        self._base = ctypes.addressof(self._view)
+        self._pos = _FILE_HEAD.size
+
+    def _close_segment(self) -> None:
+        # 先释放 from_buffer 导出的视图，否则 mmap 无法关闭
+        self._view = None
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.truncate(self._pos)
+        self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def record(self, msg_head: SMsgHeadT, msg_body: Any,
+               recv_time_ns: Optional[int] = None) -> None:
+        """
+        追加一条消息（MdsMsgDispatcher 在派发前调用）
+        msg_head / msg_body 为指向 capi 内存的结构体，只在本次调用期间有效
+        """
+        body_size = min(max(msg_head.msgSize, 0), _MAX_BODY_SIZE)
+        size = _RECORD_HEAD.size + _MSG_HEAD_SIZE + body_size
+        if recv_time_ns is None:
+            recv_time_ns = time.time_ns()
+
+        with self._lock:
+            if self._closed:
+                return
+            # 保留 4 字节的结束标记
+            if self._pos + size + 4 > self.segment_size:
+                self._close_segment()
+                self._open_segment()
+
+            pos = self._pos
+            _RECORD_HEAD.pack_into(self._mmap, pos, size, recv_time_ns)
+            pos += _RECORD_HEAD.size
+            ctypes.memmove(self._base + pos, ctypes.addressof(msg_head), _MSG_HEAD_SIZE)
+            pos += _MSG_HEAD_SIZE
+            if body_size:
+                ctypes.memmove(self._base + pos, ctypes.addressof(msg_body), body_size)
+
+            self._pos += size
+            self.record_count += 1
+            self.byte_count += size
+
+    def flush(self) -> None:
+        """把已写入的数据刷到磁盘"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._close_segment()
+
+    def __enter__(self) -> "MdsJournalWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class MdsJournalReader:
+    """
+    顺序读取行情日志
+
+    迭代返回 (接收时间ns, SMsgHeadT, MdsMktRspMsgBodyT)；为避免逐条分配，
+    消息头和消息体为复用的同一对象，需要保留时请自行复制（memcpy）。
+    """
+
+    def __init__(self, path: str, prefix: str = "mds"):
+        """path: 日志目录或单个分段文件"""
+        self.segments = list_segments(path, prefix)
+        if not self.segments:
+            raise FileNotFoundError(f"未找到行情日志: {path}")
+
+        self._msg_head = SMsgHeadT()
+        self._msg_body = MdsMktRspMsgBodyT()
+
+    def _iter_segment(self, path: str) -> Iterator[Tuple[int, SMsgHeadT, MdsMktRspMsgBodyT]]:
+        msg_head, msg_body = self._msg_head, self._msg_body
+        head_addr, body_addr = ctypes.addressof(msg_head), ctypes.addressof(msg_body)
+
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < _FILE_HEAD.size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) as mm:
+                magic, pos, _ = _FILE_HEAD.unpack_from(mm, 0)
+                if magic != JOURNAL_MAGIC:
+                    raise ValueError(f"不是行情日志文件: {path}")
+
+                view = (ctypes.c_char * file_size).from_buffer(mm)
+                base = ctypes.addressof(view)
+                try:
+                    while pos + _RECORD_HEAD.size <= file_size:
+                        size, recv_time_ns = _RECORD_HEAD.unpack_from(mm, pos)
+                        if size == 0 or pos + size > file_size:
+                            break
+
+                        body_size = size - _RECORD_HEAD.size - _MSG_HEAD_SIZE
+                        start = base + pos + _RECORD_HEAD.size
+                        ctypes.memmove(head_addr, start, _MSG_HEAD_SIZE)
+                        ctypes.memmove(body_addr, start + _MSG_HEAD_SIZE, body_size)
+                        pos += size
+
+                        yield recv_time_ns, msg_head, msg_body
+                finally:
+                    del view
+
+    def __iter__(self) -> Iterator[Tuple[int, SMsgHeadT, MdsMktRspMsgBodyT]]:
+        for path in self.segments:
+            yield from self._iter_segment(path)
+
+
+def _instr_id_offsets() -> Dict[int, int]:
+    """{msgId: instrId 在 MdsMktRspMsgBodyT 中的偏移量}，没有 instrId 的消息不在其中"""
+    offsets: Dict[int, int] = {}
+    for msg_id, (member, _, _) in MDS_PROJECTABLE_MSG_ID_TO_BODY.items():
+        for path in (f"{member}.head.instrId", f"{member}.instrId"):
+            try:
+                offsets[int(msg_id)] = _resolve_field_path(MdsMktRspMsgBodyT, path)[0]
+                break
+            except Exception:
+                continue
+    return offsets
+
+
+class MdsReplayer:
+    """
+    行情日志回放器：把录制的消息按原始顺序送入 MdsMsgDispatcher，
+    回调方式与实盘完全相同（字段投影、空回调跳过等均生效）。
+    """
+
+    # 回放时使用的虚拟会话标识
+    _SESSION = 0
+
+    def __init__(
+        self,
+        path: str,
+        spi: MdsClientSpi,
+        speed: Optional[float] = SPEED_MAX,
+        msg_ids: Optional[Iterable[int]] = None,
+        symbols: Optional[Iterable[str]] = None,
+        copy_args: bool = False,
+        prefix: str = "mds",
+    ):
+        """
+        path: 日志目录或单个分段文件
+        spi: 接收回放消息的 MdsClientSpi
+        speed: None 全速回放；1.0 按录制时的间隔实时回放；x 按 x 倍速回放
+        msg_ids: 只回放这些 msgId，None 表示全部
+        symbols: 只回放这些证券代码（按 instrId 过滤），不含 instrId 的消息（如市场状态）不过滤
+        copy_args: 同 MdsClientApi.register_spi 的 copy_args
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError(f"回放速度必须大于 0: {speed}")
+
+        self.reader = MdsJournalReader(path, prefix)
+        self.speed = speed
+        self.msg_ids = frozenset(int(i) for i in msg_ids) if msg_ids is not None else None
+        self.instr_ids = frozenset(int(s) for s in symbols) if symbols is not None else None
+
+        self.channel = MdsAsyncApiChannelT()
+        self.dispatcher = MdsMsgDispatcher(spi, copy_args)
+        self.dispatcher.bind_session_channel(self._SESSION, self.channel)
+
+        self._instr_offsets = _instr_id_offsets()
+        self._stopped = False
+
+        self.read_count = 0
+        self.dispatch_count = 0
+
+    def _accept(self, msg_head: SMsgHeadT, msg_body: MdsMktRspMsgBodyT) -> bool:
+        msg_id = msg_head.msgId
+        if self.msg_ids is not None and msg_id not in self.msg_ids:
+            return False
+        if self.instr_ids is not None:
+            offset = self._instr_offsets.get(msg_id)
+            if offset is not None:
+                instr_id = ctypes.c_int32.from_buffer(msg_body, offset).value
+                return instr_id in self.instr_ids
+        return True
+
+    def stop(self) -> None:
+        """停止回放（可在回调或其他线程中调用）"""
+        self._stopped = True
+
+    def run(self) -> Dict[str, Any]:
+        """回放全部消息，返回统计信息"""
+        p_msg_head = ctypes.pointer(self.reader._msg_head)
+        p_msg_body = ctypes.pointer(self.reader._msg_body)
+        dispatch = self.dispatcher.dispatch_mkt_data_msg
+        session = self._SESSION
+        speed = self.speed
+
+        first_recv: Optional[int] = None
+        start = time.perf_counter()
+        self._stopped = False
+
+        for recv_time_ns, msg_head, msg_body in self.reader:
+            if self._stopped:
+                break
+            self.read_count += 1
+            if not self._accept(msg_head, msg_body):
+                continue
+
+            if speed is not None:
+                if first_recv is None:
+                    first_recv = recv_time_ns
+                delay = (recv_time_ns - first_recv) / 1e9 / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            dispatch(session, p_msg_head, p_msg_body)
+            self.dispatch_count += 1
+
+        elapsed = time.perf_counter() - start
+        return {
+            "read": self.read_count,
+            "dispatched": self.dispatch_count,
+            "elapsed": elapsed,
+            "msg_per_sec": self.dispatch_count / elapsed if elapsed > 0 else 0.0,
+        }
@@ -3,92 +3,189 @@
 针对 A 股 L1 快照的 MDS Lite SPI
 """
 import threading
-import asyncio
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from vendor.quote_api import (
     MdsClientSpi,
     MdsAsyncApiChannelT,
     eMdsExchangeIdT,
-    eMdsMdProductTypeT,
-    eMdsSubscribeModeT,
+    eMdsMsgTypeT,
     eMdsSubscribeDataTypeT,
 )
 from vendor.quote_api import MDSAPI_CFG_DEFAULT_SECTION, MDSAPI_CFG_DEFAULT_KEY_TCP_ADDR
 from vendor.quote_api.model import MdsSecurityStatusMsgT, MdsTradingSessionStatusMsgT
 
+from pulse.api.quote.bar_aggregator import BarAggregator
+from pulse.api.quote.l2_order_book import L2OrderBookEngine, L2_ORDER_FIELDS, L2_TRADE_FIELDS
+from pulse.api.quote.latency_monitor import QuoteLatencyMonitor
+from pulse.api.quote.shm_fanout import ShmFanoutPublisher
+from pulse.api.quote.snapshot_bridge import SnapshotBridge
+from pulse.api.quote.snapshot_store import SnapshotConflationStore
+from pulse.api.quote.subscription_manager import SubscriptionManager
+from pulse.api.quote.tick_gap_tracker import TickGapTracker
 from pulse.core.data.types import MarketSnapshot
 from pulse.core.utils.logger import get_logger
 
 _LOG = get_logger("MdsSpiLite")
 
 
+def _snapshot_fields(body: str) -> Dict[str, str]:
+    """
+    MarketSnapshot 需要的快照字段 (投影解码, 只从消息体中取这些字段)
+    body: 'stock' (L1 快照)、'l2Stock' (L2 快照) 或 'option' (期权快照)
+    """
+    return {
+        "symbol": f"{body}.SecurityID",
+        "last_px": f"{body}.TradePx",
+        "open_px": f"{body}.OpenPx",
+        "high_px": f"{body}.HighPx",
+        "low_px": f"{body}.LowPx",
+        "bid_px": f"{body}.BidLevels[0].Price",
+        "bid_qty": f"{body}.BidLevels[0].OrderQty",
+        "ask_px": f"{body}.OfferLevels[0].Price",
+        "ask_qty": f"{body}.OfferLevels[0].OrderQty",
+        "volume": f"{body}.TotalVolumeTraded",
+        "turnover": f"{body}.TotalValueTraded",
+        "update_time": "head.updateTime",
+        "exch_id": "head.exchId",
+        "instr_id": "head.instrId",
+    }
+
+
+# 指数快照没有买卖盘档位
+_INDEX_FIELDS = {
+    "symbol": "index.SecurityID",
+    "last_px": "index.TradePx",
+    "open_px": "index.OpenPx",
+    "high_px": "index.HighPx",
+    "low_px": "index.LowPx",
+    "volume": "index.TotalVolumeTraded",
+    "turnover": "index.TotalValueTraded",
+    "update_time": "head.updateTime",
+    "exch_id": "head.exchId",
+    "instr_id": "head.instrId",
+}
+
+# 指数快照的 MarketSnapshot.symbol 带交易所后缀（如 "000001.SH"），与同号股票区分
+_INDEX_SUFFIXES = {
+    eMdsExchangeIdT.MDS_EXCH_SSE: ".SH",
+    eMdsExchangeIdT.MDS_EXCH_SZSE: ".SZ",
+}
+
+
 class MdsSpiLite(MdsClientSpi):
     """
-    精简版 SPI：只订阅指定 A 股的 L1 快照，转换成 MarketSnapshot 推到队列。
+    精简版 SPI：只订阅指定代码的快照（股票 / 指数 / 期权），转换成 MarketSnapshot 写入桥接缓冲，
+    由事件循环中的消费者 await snapshot_bridge.get_batch() 批量取走；
+    只关心最新状态的消费者可改用 snapshot_store（按标的合并，只保留最新快照）；
+    指定 order_book_engine 时额外订阅逐笔委托/成交，在本地重建全档位委托簿；
+    指定 shm_publisher 时快照和逐笔同时写入共享内存分片，供其他进程读取；
+    指定 bar_aggregator 时按其 source 用快照或逐笔成交合成多周期 K 线；
+    再指定 tick_gap_tracker（其 sink 由本类接管）时，逐笔先经过序号检查和缺口回补；
+    指定 latency_monitor 时采样各段行情延迟（连接后挂到派发函数，并统计桥接缓冲的排队时长）。
     """
     def __init__(
         self,
         config_file: str,
         subscribe_codes: List[str],
-        snapshot_queue: Optional[asyncio.Queue] = None,
-        first_snapshot_evt: Optional[threading.Event] = None
+        snapshot_bridge: Optional[SnapshotBridge] = None,
+        first_snapshot_evt: Optional[threading.Event] = None,
+        snapshot_store: Optional[SnapshotConflationStore] = None,
+        order_book_engine: Optional[L2OrderBookEngine] = None,
+        tick_gap_tracker: Optional[TickGapTracker] = None,
+        shm_publisher: Optional[ShmFanoutPublisher] = None,
+        bar_aggregator: Optional[BarAggregator] = None,
+        latency_monitor: Optional[QuoteLatencyMonitor] = None
     ):
         super(MdsSpiLite, self).__init__()
         self.config_file = config_file
         self.subscribe_codes = subscribe_codes
-        self.snapshot_queue = snapshot_queue or asyncio.Queue()
+        # 只指定了 snapshot_store 时不再写入桥接缓冲
+        self.snapshot_store = snapshot_store
+        self.snapshot_bridge = snapshot_bridge or (None if snapshot_store else SnapshotBridge())
         self.first_snapshot_evt = first_snapshot_evt or threading.Event()
+        self.order_book_engine = order_book_engine
+        self.shm_publisher = shm_publisher
+        self.bar_aggregator = bar_aggregator
+        self._snapshot_bars = bar_aggregator is not None and bar_aggregator.source == "snapshot"
+        self._trade_bars = bar_aggregator is not None and bar_aggregator.source == "trade"
+        self.latency_monitor = latency_monitor
+        if latency_monitor is not None and self.snapshot_bridge is not None:
+            latency_monitor.attach_queue(self.snapshot_bridge, "snapshot_bridge")
+
+        # 逐笔的处理入口: 先经过序号检查（由 tracker 按序号回调 _dispatch_tick），否则直接分发
+        # 没有逐笔的使用方时不订阅逐笔，tick_gap_tracker 也不启用（否则只会收到频道心跳）
+        has_tick_consumer = order_book_engine is not None or shm_publisher is not None or self._trade_bars
+        self.tick_gap_tracker = tick_gap_tracker if has_tick_consumer else None
+        if tick_gap_tracker is not None and not has_tick_consumer:
+            _LOG.warning("⚠️ 没有逐笔的使用方，忽略 tick_gap_tracker")
+        self._tick_sink = None
+        if has_tick_consumer:
+            self._tick_sink = self._dispatch_tick
+            if tick_gap_tracker is not None:
+                tick_gap_tracker.sink = self._dispatch_tick
+                self._tick_sink = tick_gap_tracker.on_tick
+
+        # L1 在SDK里属于L2快照类型；classify_code 识别为指数 / 期权的代码需要对应的快照类型才会推送
+        # （数据种类只对同类产品生效，未订阅指数 / 期权代码时不会多收数据）；
+        # 有逐笔的使用方时追加订阅逐笔委托/成交
+        data_types = eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_SNAPSHOT \
+            | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_INDEX_SNAPSHOT \
+            | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_OPTION_SNAPSHOT
+        if has_tick_consumer:
+            data_types |= eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_TRADE \
+                | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_ORDER \
+                | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_SSE_ORDER
+        if self.tick_gap_tracker is not None:
+            # 频道心跳用于发现频道末尾的缺口
+            data_types |= eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_TICK_CHANNEL_HEARTBEAT
+        # 盘中调整订阅: spi.subscriptions.set_codes(...) 后调用 spi.subscriptions.sync()
+        self.subscriptions = SubscriptionManager(data_types=data_types, codes=subscribe_codes)
+
+    def get_field_projections(self):
+        """
+        快照只按需解码 MarketSnapshot 用到的字段，避免每条消息复制整个结构体
+        """
+        projections = {
+            eMdsMsgTypeT.MDS_MSGTYPE_MARKET_DATA_SNAPSHOT_FULL_REFRESH: _snapshot_fields("stock"),
+            eMdsMsgTypeT.MDS_MSGTYPE_L2_MARKET_DATA_SNAPSHOT: _snapshot_fields("l2Stock"),
+            eMdsMsgTypeT.MDS_MSGTYPE_INDEX_SNAPSHOT_FULL_REFRESH: _INDEX_FIELDS,
+            eMdsMsgTypeT.MDS_MSGTYPE_OPTION_SNAPSHOT_FULL_REFRESH: _snapshot_fields("option"),
+        }
+        if self._tick_sink is not None:
+            # 逐笔同样只解码委托簿 / 扇出用到的字段
+            projections[eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER] = L2_ORDER_FIELDS
+            projections[eMdsMsgTypeT.MDS_MSGTYPE_L2_SSE_ORDER] = L2_ORDER_FIELDS
+            projections[eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE] = L2_TRADE_FIELDS
+        return projections
 
     def on_connect(self, channel: MdsAsyncApiChannelT, user_info: Union[str,int,object]) -> int:
         """
         连接后自动订阅 L1 快照
         """
         _LOG.info("✅ MDS 已连接，开始订阅 L1 快照：%s", self.subscribe_codes)
+        if self.tick_gap_tracker is not None:
+            self.tick_gap_tracker.start()
+        if self.latency_monitor is not None:
+            self.mds_api.set_latency_probe(self.latency_monitor, channel)
 
-        # 拆分上交所/深交所
-        sse = [c for c in self.subscribe_codes if c.startswith("6")]
-        szse = [c for c in self.subscribe_codes if not c.startswith("6")]
-
-        # data_types: 只订阅 L1 快照
-        dt = eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_INDEX_SNAPSHOT \
-             | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_OPTION_SNAPSHOT \
-             | eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_SNAPSHOT  # 这里也可加 L2 快照
-
-        # 上海
-        if sse:
-            ret = self.mds_api.subscribe_by_string(
-                channel=channel,
-                security_list=",".join(sse),
-                delimiter=",",
-                exchange_id=eMdsExchangeIdT.MDS_EXCH_SSE,
-                product_type=eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_STOCK,
-                sub_mode=eMdsSubscribeModeT.MDS_SUB_MODE_SET,
-                data_types=eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_SNAPSHOT  # L1 在SDK里属于L2快照类型
-            )
-            _LOG.info("上海订阅结果: %s", ret)
-
-        # 深圳
-        if szse:
-            ret = self.mds_api.subscribe_by_string(
-                channel=channel,
-                security_list=",".join(szse),
-                delimiter=",",
-                exchange_id=eMdsExchangeIdT.MDS_EXCH_SZSE,
-                product_type=eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_STOCK,
-                sub_mode=eMdsSubscribeModeT.MDS_SUB_MODE_SET,
-                data_types=eMdsSubscribeDataTypeT.MDS_SUB_DATA_TYPE_L2_SNAPSHOT
-            )
-            _LOG.info("深圳订阅结果: %s", ret)
+        # 按目标集合批量重放订阅（交易所/产品类型由 classify_code 识别）
+        self.subscriptions.mds_api = self.mds_api
+        ret = self.subscriptions.on_connect(channel)
+        _LOG.info("订阅结果: %s %s", ret, {k: len(v) for k, v in self.subscriptions.groups().items()})
 
         return 0
 
-    def _push_snapshot(self, snap: MarketSnapshot):
-        """内部统一推送并通知首条快照到达"""
-        try:
-            self.snapshot_queue.put_nowait(snap)
-        except Exception:
-            _LOG.exception("❌ 推送 MarketSnapshot 失败")
+    def _push_snapshot(self, snap: MarketSnapshot, exch_id: int, instr_id: int):
+        """内部统一推送并通知首条快照到达（运行在 MDS 回调线程）"""
+        if self.snapshot_store is not None:
+            self.snapshot_store.put(snap, exch_id, instr_id)
+        if self.snapshot_bridge is not None and not self.snapshot_bridge.put(snap):
+            dropped = self.snapshot_bridge.drop_count
+            if dropped == 1 or dropped % 1000 == 0:   # 开盘行情风暴时避免刷屏
+                _LOG.warning("⚠️ 快照缓冲区已满，丢弃 %s（累计丢弃 %d）", snap.symbol, dropped)
+        if self._snapshot_bars:
+            self.bar_aggregator.on_snapshot(snap, exch_id, instr_id)
         if not self.first_snapshot_evt.is_set():
             self.first_snapshot_evt.set()
 
@@ -96,7 +193,7 @@ class MdsSpiLite(MdsClientSpi):
         self,
         channel: MdsAsyncApiChannelT,
         msg_head,
-        msg_body,           # MdsMktDataSnapshotT
+        msg_body,           # 投影后的快照字段, 见 _snapshot_fields
         user_info
     ) -> int:
         """
@@ -104,20 +201,22 @@ class MdsSpiLite(MdsClientSpi):
         """
         try:
             snap = MarketSnapshot(
-                symbol=msg_body.stock.SecurityID.decode(),
-                last_price=msg_body.stock.TradePx / 10000.0,
-                open_price=msg_body.stock.OpenPx / 10000.0,
-                high_price=msg_body.stock.HighestPx / 10000.0,
-                low_price=msg_body.stock.LowestPx / 10000.0,
-                bid_price=msg_body.stock.BidLevels[0].Price / 10000.0,
-                ask_price=msg_body.stock.OfferLevels[0].Price / 10000.0,
-                bid_qty=msg_body.stock.BidLevels[0].Volume,    # SDK 字段名或 Volume
-                ask_qty=msg_body.stock.OfferLevels[0].Volume,
-                volume=msg_body.stock.TotalVolumeTrade,
-                turnover=msg_body.stock.TotalValueTrade / 10000.0,
-                update_time=msg_body.stock.UpdateTime  # 如需可转换为 datetime
+                symbol=msg_body.symbol.decode(),
+                last_price=msg_body.last_px / 10000.0,
+                open_price=msg_body.open_px / 10000.0,
+                high_price=msg_body.high_px / 10000.0,
+                low_price=msg_body.low_px / 10000.0,
+                bid_price=msg_body.bid_px / 10000.0,
+                ask_price=msg_body.ask_px / 10000.0,
+                bid_qty=msg_body.bid_qty,
+                ask_qty=msg_body.ask_qty,
+                volume=msg_body.volume,
+                turnover=msg_body.turnover / 10000.0,
+                update_time=msg_body.update_time  # HHMMSSsss，如需可转换为 datetime
             )
-            self._push_snapshot(snap)
+            self._push_snapshot(snap, msg_body.exch_id, msg_body.instr_id)
+            if self.shm_publisher is not None:
+                self.shm_publisher.publish_snapshot(msg_body)
         except Exception:
             _LOG.exception("❌ 处理快照回调失败")
         return 0
@@ -128,6 +227,7 @@ class MdsSpiLite(MdsClientSpi):
 
     def on_disconnect(self, channel, user_info):
         _LOG.warning("⚠️ MDS 连接已断开，将自动重连")
+        self.subscriptions.on_disconnect()
         return 0
 
     # —— 市场状态类回调 ——
@@ -148,7 +248,23 @@ class MdsSpiLite(MdsClientSpi):
         return 0
 
     # —— Level2 逐笔示例回调 ——
+    def _dispatch_tick(self, msg_id: int, tick) -> None:
+        """逐笔交给委托簿、共享内存扇出和 K 线合成（经过 tick_gap_tracker 时由其按序号调用）"""
+        if self.order_book_engine is not None:
+            self.order_book_engine.on_tick(msg_id, tick)
+        if self.shm_publisher is not None:
+            self.shm_publisher.on_tick(msg_id, tick)
+        if self._trade_bars:
+            self.bar_aggregator.on_tick(msg_id, tick)
+
     def on_l2_tick_trade(self, channel, msg_head, msg_body, user_info):
+        if self._tick_sink is not None:
+            try:
+                self._tick_sink(msg_head.msgId, msg_body)
+            except Exception:
+                _LOG.exception("❌ 处理逐笔成交失败")
+            return 0
+
         # 这里只简单输出，用户可自行扩展写入队列
         try:
             _LOG.debug("逐笔成交 %s @ %.2f x %d", msg_body.SecurityID.decode(), msg_body.TradePrice/10000.0, msg_body.TradeQty)
@@ -157,10 +273,16 @@ class MdsSpiLite(MdsClientSpi):
         return 0
 
     def on_l2_tick_order(self, channel, msg_head, msg_body, user_info):
+        if self._tick_sink is not None:
+            try:
+                self._tick_sink(msg_head.msgId, msg_body)
+            except Exception:
+                _LOG.exception("❌ 处理逐笔委托失败")
         return 0
 
     def on_l2_market_data_snapshot(self, channel, msg_head, msg_body, user_info):
-        return 0
+        # 订阅的是 L2 快照，投影字段与 L1 快照一致
+        return self.on_market_data_snapshot_full_refresh(channel, msg_head, msg_body, user_info)
 
     def on_l2_best_orders_snapshot(self, channel, msg_head, msg_body, user_info):
         return 0
@@ -168,12 +290,41 @@ class MdsSpiLite(MdsClientSpi):
     def on_l2_market_overview(self, channel, msg_head, msg_body, user_info):
         return 0
 
-    # 其余未用回调直接返回 0 即可，保持与基类兼容
     def on_market_index_snapshot_full_refresh(self, channel, msg_head, msg_body, user_info):
+        """指数快照（投影字段见 _INDEX_FIELDS，没有盘口，不写入共享内存分片；代码带交易所后缀）"""
+        try:
+            self._push_snapshot(MarketSnapshot(
+                symbol=msg_body.symbol.decode() + _INDEX_SUFFIXES.get(msg_body.exch_id, ""),
+                last_price=msg_body.last_px / 10000.0,
+                open_price=msg_body.open_px / 10000.0,
+                high_price=msg_body.high_px / 10000.0,
+                low_price=msg_body.low_px / 10000.0,
+                bid_price=0.0,
+                ask_price=0.0,
+                bid_qty=0,
+                ask_qty=0,
+                volume=msg_body.volume,
+                turnover=msg_body.turnover / 10000.0,
+                update_time=msg_body.update_time
+            ), msg_body.exch_id, msg_body.instr_id)
+        except Exception:
+            _LOG.exception("❌ 处理指数快照回调失败")
         return 0
 
     def on_market_option_snapshot_full_refresh(self, channel, msg_head, msg_body, user_info):
-        return 0
+        # 期权快照与股票快照结构相同，投影字段一致
+        return self.on_market_data_snapshot_full_refresh(channel, msg_head, msg_body, user_info)
 
     def on_tick_channel_heart_beat(self, channel, msg_head, msg_body, user_info):
+        if self.tick_gap_tracker is not None:
+            self.tick_gap_tracker.on_heartbeat(msg_body)
+        return 0
+
+    def on_tick_resend_rsp(self, channel, msg_head, msg_body, qry_cursor, user_info):
+        # 运行在 TickGapTracker 的后台线程（重传接口同步执行回调）
+        if self.tick_gap_tracker is not None:
+            try:
+                self.tick_gap_tracker.on_resend_msg(msg_head.msgId, msg_body)
+            except Exception:
+                _LOG.exception("❌ 处理逐笔重传数据失败")
         return 0
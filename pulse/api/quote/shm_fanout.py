@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+行情的共享内存分片扇出：MDS 回调线程写入，多个策略进程零拷贝读取
+"""
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from vendor.quote_api import eMdsExchangeIdT, eMdsMsgTypeT
+
+# 记录类型
+KIND_SNAPSHOT = 1
+KIND_TRADE = 2
+KIND_ORDER = 3
+
+# 固定长度记录（价格/金额单位与 SDK 一致: 1元=10000）
+# - 快照: price=最新价, qty=成交总量, amount=成交总额, open/high/low, 买一/卖一
+# - 逐笔成交: price/qty/amount=成交价/量/额, bid_order/ask_order=买卖方订单号, side=内外盘标志
+# - 逐笔委托: price/qty=委托价/量, appl_seq/bid_order=订单号(深交所 ApplSeqNum / 上交所 SseOrderNo),
+#   side=买卖方向, flag=订单类型
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),             # 分片内的写入序号 (从 1 开始)，读者据此检测覆盖
+    ("kind", "u1"),
+    ("exch_id", "u1"),
+    ("side", "S1"),
+    ("flag", "S1"),
+    ("instr_id", "<i4"),
+    ("time", "<i4"),            # HHMMSSsss
+    ("channel_no", "<u2"),
+    ("_pad", "<u2"),
+    ("price", "<i8"),
+    ("qty", "<i8"),
+    ("amount", "<i8"),
+    ("open", "<i8"),
+    ("high", "<i8"),
+    ("low", "<i8"),
+    ("bid_px", "<i8"),
+    ("bid_qty", "<i8"),
+    ("ask_px", "<i8"),
+    ("ask_qty", "<i8"),
+    ("appl_seq", "<i8"),
+    ("bid_order", "<i8"),
+    ("ask_order", "<i8"),
+])
+_RECORD = struct.Struct("<QBBcciiHH" + "q" * 13)
+assert _RECORD.size == RECORD_DTYPE.itemsize
+
+# 分片头: 魔数, 容量, 记录长度, 保留; 写入序号单独占一个缓存行
+_MAGIC = b"PLSSHMR1"
+_HEADER = struct.Struct("<8sIIQ")
+_WRITE_SEQ = struct.Struct("<Q")
+_WRITE_SEQ_OFFSET = 64
+_DATA_OFFSET = 128
+
+_MSG_L2_TRADE = eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE
+_MSG_L2_SSE_ORDER = eMdsMsgTypeT.MDS_MSGTYPE_L2_SSE_ORDER
+_EXCH_SSE = eMdsExchangeIdT.MDS_EXCH_SSE
+_EXCH_SZSE = eMdsExchangeIdT.MDS_EXCH_SZSE
+
+
+# 本进程（及 fork 出的子进程）创建的共享内存名，其 resource_tracker 登记属于写者
+_CREATED = set()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """附加到已存在的共享内存，且不让本进程的 resource_tracker 在退出时删除它"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数：正常附加后立即取消 resource_tracker 登记
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _CREATED:
+            # 同进程 / fork 出的读者与写者共用 tracker 中的同一条登记，不能取消
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def shard_name(prefix: str, index: int) -> str:
+    return f"{prefix}_{index}"
+
+
+class ShmRingWriter:
+    """
+    单写者的共享内存环形缓冲（一个分片）
+
+    先写记录再发布写入序号；记录本身也带序号，读者可以据此发现读取过程中被覆盖的记录。
+    """
+
+    def __init__(self, name: str, capacity: int = 1 << 16):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.name = name
+        self.capacity = size
+        self._mask = size - 1
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=True, size=_DATA_OFFSET + size * _RECORD.size)
+        _CREATED.add(name)
+        self._buf = self.shm.buf
+        _HEADER.pack_into(self._buf, 0, _MAGIC, size, _RECORD.size, 0)
+        _WRITE_SEQ.pack_into(self._buf, _WRITE_SEQ_OFFSET, 0)
+        self.seq = 0
+
+    def write(self, *fields: Any) -> int:
+        """写入一条记录（fields 为 RECORD_DTYPE 中 seq 之后的各字段），返回序号"""
+        seq = self.seq + 1
+        _RECORD.pack_into(self._buf, _DATA_OFFSET + (seq & self._mask) * _RECORD.size, seq, *fields)
+        _WRITE_SEQ.pack_into(self._buf, _WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def close(self, unlink: bool = True) -> None:
+        self._buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _CREATED.discard(self.name)
+
+
+class ShmRingReader:
+    """
+    共享内存环形缓冲的读者（可在任意进程中创建，读者之间互不影响）
+
+    poll() 返回指向共享内存的记录视图（不复制）；落后超过容量的部分计入 overrun_count 并跳过。
+    视图中的记录在写者绕回一圈后会被覆盖，需要保留时请 copy()，或处理完后用 validate() 校验。
+    """
+
+    def __init__(self, name: str, from_start: bool = False):
+        """from_start: 从缓冲区中最早的记录开始读，默认只读附加之后写入的记录"""
+        self.name = name
+        self.shm = _attach(name)
+        magic, capacity, record_size, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != _MAGIC or record_size != _RECORD.size:
+            raise ValueError(f"共享内存格式不匹配: {name}")
+
+        self.capacity = capacity
+        self.records = np.ndarray((capacity,), dtype=RECORD_DTYPE, buffer=self.shm.buf, offset=_DATA_OFFSET)
+        self._write_seq = np.ndarray((1,), dtype="<u8", buffer=self.shm.buf, offset=_WRITE_SEQ_OFFSET)
+
+        head = int(self._write_seq[0])
+        self.next_seq = max(head - capacity + 1, 1) if from_start else head + 1
+        self.overrun_count = 0
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._write_seq[0])
+
+    def lag(self) -> int:
+        """尚未读取的记录数"""
+        return self.write_seq + 1 - self.next_seq
+
+    def poll(self, max_items: Optional[int] = None) -> np.ndarray:
+        """
+        取下一段连续的记录视图（到达缓冲区末尾时截断，下次调用继续读取），无新数据时返回空视图
+        """
+        head = self.write_seq
+        nxt = self.next_seq
+        if head - nxt + 1 > self.capacity:
+            # 读者落后超过一圈，跳到仍然有效的最早记录
+            skipped = head - self.capacity + 1 - nxt
+            self.overrun_count += skipped
+            nxt = head - self.capacity + 1
+
+        count = head - nxt + 1
+        if count <= 0:
+            return self.records[:0]
+        if max_items is not None:
+            count = min(count, max_items)
+
+        start = nxt & (self.capacity - 1)
+        count = min(count, self.capacity - start)
+        view = self.records[start:start + count]
+        self.next_seq = nxt + count
+        return view
+
+    def validate(self, view: np.ndarray) -> int:
+        """
+        处理完视图之后调用：返回视图中已被写者覆盖的记录数（>0 表示读到的数据可能不完整），
+        同时计入 overrun_count
+        """
+        if not len(view):
+            return 0
+        expected = np.arange(self.next_seq - len(view), self.next_seq, dtype=np.uint64)
+        overwritten = int(np.count_nonzero(view["seq"] != expected))
+        self.overrun_count += overwritten
+        return overwritten
+
+    def close(self) -> None:
+        self.records = None
+        self._write_seq = None
+        self.shm.close()
+
+
+class ShmFanoutPublisher:
+    """
+    MDS 回调线程中的扇出写者：按 instrId 把快照 / 逐笔写入 n_shards 个共享内存分片
+
+    - 缺省按 instrId 的 CRC32 分片；也可以传入 shard_map {instrId: 分片号}（如按行业划分），
+      不在 shard_map 中的标的仍按哈希分片；
+    - 每个分片只有一个写者（MDS 回调线程），写入不加锁。
+    """
+
+    def __init__(self, prefix: str, n_shards: int = 4, capacity: int = 1 << 16,
+                 shard_map: Optional[Dict[int, int]] = None):
+        if n_shards <= 0:
+            raise ValueError(f"分片数必须大于 0: {n_shards}")
+        self.prefix = prefix
+        self.n_shards = n_shards
+        self.shard_map = dict(shard_map or {})
+        self.writers: List[ShmRingWriter] = []
+        try:
+            for i in range(n_shards):
+                self.writers.append(ShmRingWriter(shard_name(prefix, i), capacity))
+        except Exception:
+            self.close()
+            raise
+
+    def shard_of(self, instr_id: int) -> int:
+        shard = self.shard_map.get(instr_id)
+        if shard is None:
+            shard = zlib.crc32(instr_id.to_bytes(4, "little", signed=True)) % self.n_shards
+            self.shard_map[instr_id] = shard
+        return shard
+
+    def publish_snapshot(self, body: Any) -> int:
+        """写入一条快照（MdsSpiLite 中投影后的快照字段，含 exch_id / instr_id）"""
+        instr_id = body.instr_id
+        return self.writers[self.shard_of(instr_id)].write(
+            KIND_SNAPSHOT, body.exch_id, b"\0", b"\0", instr_id, body.update_time, 0, 0,
+            body.last_px, body.volume, body.turnover, body.open_px, body.high_px, body.low_px,
+            body.bid_px, body.bid_qty, body.ask_px, body.ask_qty, 0, 0, 0)
+
+    def publish_trade(self, tick: Any) -> int:
+        """写入一条逐笔成交（MdsL2TradeT 或 L2_TRADE_FIELDS 投影）"""
+        instr_id = tick.instrId
+        return self.writers[self.shard_of(instr_id)].write(
+            KIND_TRADE, tick.exchId, tick.TradeBSFlag, tick.ExecType, instr_id, tick.TransactTime,
+            tick.ChannelNo, 0, tick.TradePrice, tick.TradeQty, tick.TradePrice * tick.TradeQty,
+            0, 0, 0, 0, 0, 0, 0, tick.ApplSeqNum, tick.BidApplSeqNum, tick.OfferApplSeqNum)
+
+    def publish_order(self, msg_id: int, tick: Any) -> int:
+        """写入一条逐笔委托（MdsL2OrderT 或 L2_ORDER_FIELDS 投影）"""
+        instr_id = tick.instrId
+        if msg_id == _MSG_L2_SSE_ORDER:
+            exch_id, order_no = _EXCH_SSE, tick.SseOrderNo
+        else:
+            exch_id, order_no = _EXCH_SZSE, tick.ApplSeqNum
+        return self.writers[self.shard_of(instr_id)].write(
+            KIND_ORDER, exch_id, tick.Side, tick.OrderType, instr_id, tick.TransactTime,
+            tick.ChannelNo, 0, tick.Price, tick.OrderQty, 0,
+            0, 0, 0, 0, 0, 0, 0, tick.ApplSeqNum, order_no, 0)
+
+    def on_tick(self, msg_id: int, tick: Any) -> None:
+        """按消息类型写入逐笔（可作为 TickGapTracker 的 sink）"""
+        if msg_id == _MSG_L2_TRADE:
+            self.publish_trade(tick)
+        else:
+            self.publish_order(msg_id, tick)
+
+    def close(self, unlink: bool = True) -> None:
+        for writer in self.writers:
+            writer.close(unlink)
+        self.writers = []
+
+
+class ShmFanoutSubscriber:
+    """
+    策略进程中的读者：附加到发布者的部分或全部分片，轮询读取记录视图
+    """
+
+    def __init__(self, prefix: str, shards: Iterable[int], from_start: bool = False):
+        self.readers: Dict[int, ShmRingReader] = {
+            i: ShmRingReader(shard_name(prefix, i), from_start) for i in shards
+        }
+
+    def poll(self, max_items: Optional[int] = None) -> List[Tuple[int, np.ndarray]]:
+        """返回 [(分片号, 记录视图)]，只包含有新数据的分片"""
+        out = []
+        for shard, reader in self.readers.items():
+            view = reader.poll(max_items)
+            if len(view):
+                out.append((shard, view))
+        return out
+
+    def run(self, handler: Callable[[int, np.ndarray], Any], idle_sleep: float = 0.0005,
+            stop: Optional[Callable[[], bool]] = None) -> None:
+        """
+        循环读取并调用 handler(分片号, 记录视图)，没有新数据时休眠 idle_sleep 秒；
+        stop() 返回 True 时退出
+        """
+        while stop is None or not stop():
+            batches = self.poll()
+            if not batches:
+                time.sleep(idle_sleep)
+                continue
+            for shard, view in batches:
+                handler(shard, view)
+                self.readers[shard].validate(view)
+
+    @property
+    def overrun_count(self) -> int:
+        return sum(r.overrun_count for r in self.readers.values())
+
+    def close(self) -> None:
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
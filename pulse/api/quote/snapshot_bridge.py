@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+C 回调线程 → asyncio 事件循环的批量桥接（环形缓冲）
+"""
+import asyncio
+import threading
+import time
+from operator import attrgetter
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# 缓冲区满时的处理策略
+POLICY_DROP = "drop"            # 丢弃新数据
+POLICY_BLOCK = "block"          # 阻塞回调线程直到有空位（超时后丢弃）
+POLICY_CONFLATE = "conflate"    # 同一 key 未被消费的旧数据原地替换为新数据，满时丢弃新 key
+
+_POLICIES = (POLICY_DROP, POLICY_BLOCK, POLICY_CONFLATE)
+
+
+class SnapshotBridge:
+    """
+    行情回调线程与事件循环之间的批量桥接。
+
+    - 生产者（MDS 异步 API 线程）调用 put() 写入环形缓冲，锁只保护下标的读写；
+    - 每一批数据最多调用一次 loop.call_soon_threadsafe 唤醒事件循环；
+    - 消费者在事件循环中 await get_batch() 一次取走当前积压的全部（或至多 max_items 条）数据。
+    """
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        policy: str = POLICY_DROP,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        block_timeout: Optional[float] = 1.0,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        capacity: 缓冲区容量（向上取整为 2 的幂）
+        policy: 缓冲区满时的处理策略，drop / block / conflate
+        key: conflate 策略下判断"同一标的"的取值函数，默认取 .symbol
+        block_timeout: block 策略下回调线程最长等待秒数，None 表示一直等待
+        loop: 消费者所在事件循环，缺省时在首次 get_batch 时绑定
+        """
+        if policy not in _POLICIES:
+            raise ValueError(f"未知的缓冲策略: {policy}, 可选 {_POLICIES}")
+        if capacity <= 0:
+            raise ValueError(f"缓冲区容量必须大于 0: {capacity}")
+
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._mask = size - 1
+        self._slots: List[Any] = [None] * size
+        self._head = 0      # 下一条待消费数据的序号
+        self._tail = 0      # 下一条写入数据的序号
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+
+        # conflate: 尚未消费的 key -> 序号
+        self._key = key or attrgetter("symbol")
+        self._pending: Dict[Hashable, int] = {}
+
+        self._loop = loop
+        self._waiter: Optional[asyncio.Future] = None
+        self._wakeup_pending = False
+        self._closed = False
+
+        # 排队时长采样（enable_latency 后记录每条数据写入时的 time_ns）
+        self._put_ns: Optional[List[int]] = None
+        self._latency_sink: Optional[Callable[[List[int]], Any]] = None
+
+        # 统计
+        self.put_count = 0
+        self.drop_count = 0
+        self.conflate_count = 0
+        self.wakeup_count = 0
+
+    # —— 生产者（C 回调线程） ——
+    def put(self, item: Any) -> bool:
+        """
+        写入一条数据，返回 False 表示因缓冲区满被丢弃
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            if self.policy == POLICY_CONFLATE:
+                k = self._key(item)
+                seq = self._pending.get(k)
+                if seq is not None:
+                    self._slots[seq & self._mask] = item
+                    if self._put_ns is not None:
+                        self._put_ns[seq & self._mask] = time.time_ns()
+                    self.put_count += 1
+                    self.conflate_count += 1
+                    return True
+                if self._tail - self._head >= self.capacity:
+                    self.drop_count += 1
+                    return False
+                self._pending[k] = self._tail
+
+            elif self._tail - self._head >= self.capacity:
+                if self.policy == POLICY_DROP or not self._not_full.wait_for(
+                        lambda: self._tail - self._head < self.capacity or self._closed,
+                        self.block_timeout) or self._closed:
+                    self.drop_count += 1
+                    return False
+
+            self._slots[self._tail & self._mask] = item
+            if self._put_ns is not None:
+                self._put_ns[self._tail & self._mask] = time.time_ns()
+            self._tail += 1
+            self.put_count += 1
+
+            # 已有未执行的唤醒时不再重复唤醒，保证每批最多一次 call_soon_threadsafe
+            if self._wakeup_pending or self._loop is None:
+                return True
+            self._wakeup_pending = True
+
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup)
+        except RuntimeError:
+            # 事件循环已关闭
+            self._wakeup_pending = False
+        return True
+
+    # —— 消费者（事件循环线程） ——
+    def _wakeup(self) -> None:
+        self._wakeup_pending = False
+        self.wakeup_count += 1
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def get_batch_nowait(self, max_items: Optional[int] = None) -> List[Any]:
+        """
+        取走当前积压的数据（不等待），无数据时返回空列表
+        """
+        with self._lock:
+            head, tail = self._head, self._tail
+            if max_items is not None and tail - head > max_items:
+                tail = head + max_items
+            if head == tail:
+                return []
+
+            start, end = head & self._mask, tail & self._mask
+            if start < end:
+                batch = self._slots[start:end]
+                self._slots[start:end] = [None] * (end - start)
+            else:
+                batch = self._slots[start:] + self._slots[:end]
+                self._slots[start:] = [None] * (self.capacity - start)
+                self._slots[:end] = [None] * end
+
+            if self._pending:
+                if tail == self._tail:
+                    self._pending.clear()
+                else:
+                    for item in batch:
+                        self._pending.pop(self._key(item), None)
+
+            put_ns = None
+            if self._put_ns is not None:
+                put_ns = self._put_ns[start:end] if start < end \
+                    else self._put_ns[start:] + self._put_ns[:end]
+
+            self._head = tail
+            if self.policy == POLICY_BLOCK:
+                self._not_full.notify_all()
+
+        if put_ns is not None and self._latency_sink is not None:
+            now = time.time_ns()
+            self._latency_sink([now - t for t in put_ns])
+        return batch
+
+    async def get_batch(self, max_items: Optional[int] = None) -> List[Any]:
+        """
+        等待并取走一批数据；桥接关闭且无剩余数据时返回空列表
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+
+        while True:
+            batch = self.get_batch_nowait(max_items)
+            if batch or self._closed:
+                return batch
+
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+    def enable_latency(self, sink: Callable[[List[int]], Any]) -> None:
+        """
+        开启排队时长采样：每次取走一批数据时以 sink([每条数据的排队纳秒数]) 回调（在消费者线程中）
+        """
+        with self._lock:
+            if self._put_ns is None:
+                self._put_ns = [0] * self.capacity
+            self._latency_sink = sink
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """绑定消费者所在的事件循环（在 MDS 启动前调用，可避免首批数据无人唤醒）"""
+        self._loop = loop
+
+    def close(self) -> None:
+        """关闭桥接：拒绝新数据，唤醒阻塞的回调线程和等待中的消费者"""
+        with self._lock:
+            self._closed = True
+            self._not_full.notify_all()
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup)
+
+    def __len__(self) -> int:
+        return self._tail - self._head
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+按 (exchId, instrId) 合并的最新快照表（数组存储，按版本号增量读取）
+"""
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from pulse.api.quote.subscription_manager import classify_code
+from pulse.core.data.types import MarketSnapshot
+
+# 列名 -> dtype，与 MarketSnapshot 字段一一对应（symbol 取订阅时的代码写法）
+_COLUMNS: Dict[str, type] = {
+    "last_price": np.float64,
+    "open_price": np.float64,
+    "high_price": np.float64,
+    "low_price": np.float64,
+    "bid_price": np.float64,
+    "ask_price": np.float64,
+    "bid_qty": np.int64,
+    "ask_qty": np.int64,
+    "volume": np.int64,
+    "turnover": np.float64,
+    "update_time": np.int64,
+}
+
+
+class SnapshotConflationStore:
+    """
+    最新快照合并表：每个订阅的 (exchId, instrId) 预分配一行，新快照原地覆盖旧快照。
+
+    - 代码写法同 classify_code：上证指数与深市同号股票需带后缀区分（000001.SH / 000001）；
+
+    - 每次写入全局版本号 +1，并记录到该行的 seq；
+    - changed_since(N) 一次取出 seq > N 的全部行；
+    - take_dirty() 取出并清空自上次调用以来有更新的行（脏位图）。
+    内存占用只与订阅数量有关，消费者落后时不会堆积过期行情。
+    """
+
+    def __init__(self, symbols: Iterable[str]):
+        codes = list(dict.fromkeys(symbols))
+        n = len(codes)
+
+        keys = [classify_code(c) for c in codes]
+        self.symbols = np.array(codes, dtype=object)
+        self.exch_ids = np.array([k[0] for k in keys], dtype=np.uint8)
+        self.instr_ids = np.array([k[2] for k in keys], dtype=np.int32)
+        self._rows: Dict[Tuple[int, int], int] = {(k[0], k[2]): i for i, k in enumerate(keys)}
+        if len(self._rows) != n:
+            raise ValueError(f"存在指向同一证券的重复代码: {codes}")
+
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(n, dtype=dtype) for name, dtype in _COLUMNS.items()
+        }
+        self.seq = np.zeros(n, dtype=np.uint64)
+        self.dirty = np.zeros(n, dtype=np.bool_)
+        self.version = 0
+
+        self._lock = threading.Lock()
+
+    def _row(self, symbol: str) -> Optional[int]:
+        exch_id, _, instr_id = classify_code(symbol)
+        return self._rows.get((exch_id, instr_id))
+
+    def put(self, snap: MarketSnapshot, exch_id: Optional[int] = None, instr_id: Optional[int] = None) -> bool:
+        """
+        写入一条快照（运行在 MDS 回调线程），未订阅的标的返回 False
+        exch_id / instr_id: 行情消息头中的交易所和证券编号；不提供时按 snap.symbol 识别
+        """
+        if exch_id is None or instr_id is None:
+            row = self._row(snap.symbol)
+        else:
+            row = self._rows.get((exch_id, instr_id))
+        if row is None:
+            return False
+
+        cols = self.columns
+        with self._lock:
+            for name in _COLUMNS:
+                cols[name][row] = getattr(snap, name)
+            self.version += 1
+            self.seq[row] = self.version
+            self.dirty[row] = True
+        return True
+
+    def _select(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """按行号复制出列数据（需在锁内调用）"""
+        out = {name: col[rows] for name, col in self.columns.items()}
+        out["symbol"] = self.symbols[rows]
+        out["exch_id"] = self.exch_ids[rows]
+        out["instr_id"] = self.instr_ids[rows]
+        out["seq"] = self.seq[rows]
+        return out
+
+    def changed_since(self, version: int) -> Tuple[int, Dict[str, np.ndarray]]:
+        """
+        返回 (当前版本号, 自 version 之后有更新的行)，下次以返回的版本号继续读取
+        """
+        with self._lock:
+            rows = np.flatnonzero(self.seq > version)
+            return self.version, self._select(rows)
+
+    def take_dirty(self) -> Dict[str, np.ndarray]:
+        """取出自上次调用以来有更新的行，并清空脏位图"""
+        with self._lock:
+            rows = np.flatnonzero(self.dirty)
+            self.dirty[rows] = False
+            return self._select(rows)
+
+    def get(self, symbol: str) -> Optional[MarketSnapshot]:
+        """读取单个标的的最新快照（代码写法同 classify_code），尚未收到行情时返回 None"""
+        row = self._row(symbol)
+        if row is None or not self.seq[row]:
+            return None
+        with self._lock:
+            values = {name: col[row].item() for name, col in self.columns.items()}
+        return MarketSnapshot(symbol=self.symbols[row], **values)
+
+    def __len__(self) -> int:
+        return len(self.instr_ids)
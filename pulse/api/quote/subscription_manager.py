@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+行情订阅管理：按 (交易所, 产品类型) 维护目标订阅集合，增量订阅 / 退订，断线重连后按需重放
+"""
+import ctypes
+import struct
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from vendor.quote_api import (
+    MdsClientApi,
+    MdsAsyncApiChannelT,
+    MdsApiSubscribeInfoT,
+    eMdsExchangeIdT,
+    eMdsMdProductTypeT,
+    eMdsSubscribeModeT,
+)
+from vendor.quote_api.model import MDS_MAX_SECURITY_CNT_PER_SUBSCRIBE
+
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("SubscriptionManager")
+
+_SSE = eMdsExchangeIdT.MDS_EXCH_SSE
+_SZSE = eMdsExchangeIdT.MDS_EXCH_SZSE
+_STOCK = eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_STOCK
+_INDEX = eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_INDEX
+_OPTION = eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_OPTION
+
+# 订阅条目 (exchId, mdProductType, instrId)
+SubEntry = Tuple[int, int, int]
+
+# 不带交易所后缀的 6 位代码按前缀识别（最长前缀优先）
+# - 上交所: 6 主板/科创板, 5 基金(ETF/LOF), 9 B股, 10/11 债券(含可转债), 01/02/009 国债, 204 回购
+# - 深交所: 00 主板, 30 创业板, 15/16/18 基金, 12 债券(含可转债), 13 回购, 20 B股, 399 指数
+# - 000xxx 同时是深市股票和上证指数代码，不带后缀时按深市股票处理，上证指数请写作 000001.SH
+_CODE_PREFIXES: Dict[str, Tuple[int, int]] = {
+    "6": (_SSE, _STOCK),
+    "5": (_SSE, _STOCK),
+    "9": (_SSE, _STOCK),
+    "10": (_SSE, _STOCK),
+    "11": (_SSE, _STOCK),
+    "01": (_SSE, _STOCK),
+    "02": (_SSE, _STOCK),
+    "009": (_SSE, _STOCK),
+    "204": (_SSE, _STOCK),
+    "00": (_SZSE, _STOCK),
+    "30": (_SZSE, _STOCK),
+    "15": (_SZSE, _STOCK),
+    "16": (_SZSE, _STOCK),
+    "18": (_SZSE, _STOCK),
+    "12": (_SZSE, _STOCK),
+    "13": (_SZSE, _STOCK),
+    "20": (_SZSE, _STOCK),
+    "399": (_SZSE, _INDEX),
+}
+
+# 带后缀时只需区分指数: 上证指数 000xxx, 深证指数 399xxx
+_EXCH_SUFFIXES = {"SH": _SSE, "SS": _SSE, "SZ": _SZSE}
+_INDEX_PREFIXES = {_SSE: ("000",), _SZSE: ("399",)}
+
+_ENTRY = struct.Struct("=BB2xi")    # MdsMktDataRequestEntryT
+
+
+def classify_code(code: str) -> SubEntry:
+    """
+    证券代码 → (exchId, mdProductType, instrId)
+
+    支持 "600000"、"600000.SH"、"SH600000"、"000300.SH" 等写法；
+    8 位期权代码: 1 开头为上交所期权，9 开头为深交所期权
+    """
+    text = code.strip().upper()
+    exch_id: Optional[int] = None
+    if "." in text:
+        text, suffix = text.rsplit(".", 1)
+        exch_id = _EXCH_SUFFIXES.get(suffix)
+        if exch_id is None:
+            raise ValueError(f"无法识别的交易所后缀: {code}")
+    elif text[:2] in _EXCH_SUFFIXES:
+        exch_id = _EXCH_SUFFIXES[text[:2]]
+        text = text[2:]
+
+    if not text.isdigit():
+        raise ValueError(f"无效的证券代码: {code}")
+
+    if len(text) == 8:
+        if exch_id is None:
+            exch_id = _SSE if text[0] == "1" else _SZSE
+        return exch_id, _OPTION, int(text)
+
+    if exch_id is not None:
+        product = _INDEX if text.startswith(_INDEX_PREFIXES[exch_id]) else _STOCK
+        return exch_id, product, int(text)
+
+    for n in (3, 2, 1):
+        routed = _CODE_PREFIXES.get(text[:n])
+        if routed is not None:
+            return routed[0], routed[1], int(text)
+    raise ValueError(f"无法识别证券代码所属市场: {code}")
+
+
+class SubscriptionManager:
+    """
+    行情订阅管理
+
+    - set_codes / add / remove 只修改目标集合，sync() 计算与已生效订阅的差集，
+      分别以 APPEND / DELETE 模式按每批最多 4000 只（MDS_MAX_SECURITY_CNT_PER_SUBSCRIBE）发送；
+    - on_connect() 在新连接上以批量订阅（BATCH_BEGIN / BATCH_APPEND / BATCH_END）一次性重放目标集合，
+      服务端在 BATCH_END 之前暂停推送，避免边订阅边推送；
+    - 每条订阅条目都带交易所和产品类型，不同市场 / 产品的代码可以放在同一批请求中。
+    """
+
+    def __init__(
+        self,
+        mds_api: Optional[MdsClientApi] = None,
+        data_types: int = 0,
+        codes: Iterable[str] = (),
+        chunk_size: int = MDS_MAX_SECURITY_CNT_PER_SUBSCRIBE,
+        require_initial_snapshot: bool = False,
+    ):
+        """
+        mds_api: 行情 API（也可在 on_connect 前通过属性赋值，MdsSpiLite 中为 spi.mds_api）
+        data_types: 订阅的数据种类 @see eMdsSubscribeDataTypeT
+        codes: 初始目标代码
+        chunk_size: 每个订阅请求最多包含的产品数量
+        require_initial_snapshot: 重连重放时是否要求推送初始快照（开盘后重连时会产生一轮快照洪峰）
+        """
+        if not 0 < chunk_size <= MDS_MAX_SECURITY_CNT_PER_SUBSCRIBE:
+            raise ValueError(f"chunk_size 取值范围为 1..{MDS_MAX_SECURITY_CNT_PER_SUBSCRIBE}: {chunk_size}")
+
+        self.mds_api = mds_api
+        self.data_types = data_types
+        self.chunk_size = chunk_size
+        self.require_initial_snapshot = require_initial_snapshot
+
+        self._desired: Set[SubEntry] = set(classify_code(c) for c in codes)
+        self._active: Set[SubEntry] = set()
+        self._channel: Optional[MdsAsyncApiChannelT] = None
+        self._lock = threading.RLock()
+        self._req_buf = MdsApiSubscribeInfoT()
+
+        self.request_count = 0
+
+    # —— 目标集合 ——
+    def set_codes(self, codes: Iterable[str]) -> None:
+        """替换目标订阅集合"""
+        entries = set(classify_code(c) for c in codes)
+        with self._lock:
+            self._desired = entries
+
+    def add(self, codes: Iterable[str]) -> None:
+        entries = [classify_code(c) for c in codes]
+        with self._lock:
+            self._desired.update(entries)
+
+    def remove(self, codes: Iterable[str]) -> None:
+        entries = [classify_code(c) for c in codes]
+        with self._lock:
+            self._desired.difference_update(entries)
+
+    @property
+    def desired(self) -> FrozenSet[SubEntry]:
+        with self._lock:
+            return frozenset(self._desired)
+
+    @property
+    def active(self) -> FrozenSet[SubEntry]:
+        """当前连接上已生效的订阅"""
+        with self._lock:
+            return frozenset(self._active)
+
+    def groups(self) -> Dict[Tuple[int, int], List[int]]:
+        """按 (exchId, mdProductType) 分组的目标 instrId"""
+        out: Dict[Tuple[int, int], List[int]] = {}
+        for exch_id, product, instr_id in sorted(self.desired):
+            out.setdefault((exch_id, product), []).append(instr_id)
+        return out
+
+    # —— 发送订阅请求 ——
+    def _send(self, channel: MdsAsyncApiChannelT, sub_mode: int,
+              entries: List[SubEntry], initial: bool = False) -> bool:
+        buf = self._req_buf
+        req = buf.mktDataRequestReq
+        req.subMode = sub_mode
+        req.dataTypes = self.data_types
+        req.beginTime = 0
+        req.isRequireInitialMktData = 1 if initial else 0
+        req.subSecurityCnt = len(entries)
+        if entries:
+            packed = b"".join(_ENTRY.pack(*e) for e in entries)
+            ctypes.memmove(buf.entries, packed, len(packed))
+
+        self.request_count += 1
+        ok = self.mds_api.subscribe_market_data(channel=channel, subscribe_info=buf)
+        if not ok:
+            _LOG.error("❌ 订阅请求失败 mode=%s count=%d", sub_mode, len(entries))
+        return bool(ok)
+
+    def _chunks(self, entries: Iterable[SubEntry]) -> List[List[SubEntry]]:
+        items = sorted(entries)
+        n = self.chunk_size
+        return [items[i:i + n] for i in range(0, len(items), n)]
+
+    def sync(self, channel: Optional[MdsAsyncApiChannelT] = None) -> Tuple[int, int]:
+        """
+        把目标集合与已生效订阅的差异发送到服务端，返回 (新增数量, 删除数量)；
+        未连接时只记录目标集合，连接后由 on_connect 重放
+        """
+        with self._lock:
+            channel = channel or self._channel
+            if channel is None or self.mds_api is None:
+                return 0, 0
+
+            to_add = self._desired - self._active
+            to_del = self._active - self._desired
+            for chunk in self._chunks(to_del):
+                if self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_DELETE, chunk):
+                    self._active.difference_update(chunk)
+            for chunk in self._chunks(to_add):
+                if self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_APPEND, chunk):
+                    self._active.update(chunk)
+
+        if to_add or to_del:
+            _LOG.info("🔄 增量订阅 +%d / -%d，当前 %d 只", len(to_add), len(to_del), len(self._active))
+        return len(to_add), len(to_del)
+
+    def on_connect(self, channel: MdsAsyncApiChannelT) -> bool:
+        """
+        新连接上重放目标集合（在 MdsClientSpi.on_connect 中调用）；
+        新会话在服务端没有任何订阅，因此只需发送当前目标集合，不必重放期间的增删过程
+        """
+        with self._lock:
+            self._channel = channel
+            self._active.clear()
+
+            chunks = self._chunks(self._desired)
+            if not chunks:
+                # 目标为空时发送空列表的重新订阅，明确不订阅任何产品
+                return self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_SET, [])
+
+            ok = self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_BATCH_BEGIN,
+                            chunks[0], self.require_initial_snapshot)
+            for chunk in chunks[1:]:
+                ok = self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_BATCH_APPEND, chunk) and ok
+            ok = self._send(channel, eMdsSubscribeModeT.MDS_SUB_MODE_BATCH_END, []) and ok
+
+            if ok:
+                self._active.update(self._desired)
+            count = len(self._active)
+
+        _LOG.info("✅ 订阅重放完成 %d 只（%d 批）", count, len(chunks))
+        return ok
+
+    def on_disconnect(self) -> None:
+        """连接断开后已生效订阅失效，目标集合保留到下次 on_connect"""
+        with self._lock:
+            self._channel = None
+            self._active.clear()
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+逐笔数据按 (交易所, 频道) 的序号连续性检查与后台重传回补
+"""
+import threading
+import time
+from collections import deque
+from ctypes import Structure
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from vendor.quote_api import (
+    MdsClientApi,
+    MdsAsyncApiChannelT,
+    eMdsExchangeIdT,
+    eMdsMsgTypeT,
+    eMdsTickResendStatusT,
+)
+from vendor.quote_api.model import MdsTickResendRequestReqT, memcpy
+
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("TickGapTracker")
+
+_MSG_L2_TRADE = eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE
+_MSG_L2_ORDER = eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER
+_MSG_L2_SSE_ORDER = eMdsMsgTypeT.MDS_MSGTYPE_L2_SSE_ORDER
+_MSG_TICK_RESEND = eMdsMsgTypeT.MDS_MSGTYPE_TICK_RESEND_REQUEST
+
+# 逐笔委托消息中没有 exchId 字段时按消息类型区分交易所
+_ORDER_MSG_EXCH = {
+    _MSG_L2_ORDER: eMdsExchangeIdT.MDS_EXCH_SZSE,
+    _MSG_L2_SSE_ORDER: eMdsExchangeIdT.MDS_EXCH_SSE,
+}
+
+ChannelKey = Tuple[int, int]    # (exchId, ChannelNo)
+
+
+def _detach(tick: Any) -> Any:
+    """缓存逐笔数据前脱离 capi 内存（投影后的 namedtuple 本身就是独立对象）"""
+    return memcpy(tick) if isinstance(tick, Structure) else tick
+
+
+class _ChannelState:
+    __slots__ = ("expected", "high", "held", "gaps", "deadline", "retries")
+
+    def __init__(self, expected: int):
+        self.expected = expected                # 下一条应交给下游的序号
+        self.high = expected - 1                # 已知的最大序号（收到的逐笔或频道心跳）
+        self.held: Dict[int, Tuple[int, Any]] = {}  # 缺口之后先到达的逐笔 {序号: (msgId, 逐笔)}
+        self.gaps: List[List[int]] = []         # 尚未回补的缺口 [[起始序号, 结束序号]]
+        self.deadline = 0.0                     # 最早缺口的放弃时间
+        self.retries = 0
+
+
+class TickGapTracker:
+    """
+    逐笔序号缺口检测与回补
+
+    - 每个 (交易所, 频道) 维护下一条期望的 ApplSeqNum，连续的逐笔直接交给下游（不复制）；
+    - 出现跳号时记录缺口，之后到达的逐笔先缓存；相邻缺口（间距不超过 merge_distance）合并为一个请求；
+    - 重传请求由后台线程通过 MdsClientApi.send_tick_resend_request_hugely 发出，
+      绝不在行情回调线程中调用；请求之间至少间隔 min_request_interval 秒；
+    - 回补的逐笔（on_tick_resend_rsp 中通过 on_resend_msg 送入）与缓存的逐笔按序号拼接后再交给下游；
+    - 超过 gap_timeout 秒仍未补齐的缺口放弃回补，调用 on_gap_lost 后继续向下游交付后续逐笔。
+
+    sink(msgId, 逐笔) 在本类的锁内调用，可能来自行情回调线程或后台回补线程，但保证按序号串行。
+    上交所按逐笔合并数据的统一编号处理（ApplSeqNum 即 BizIndex，按频道连续）。
+    """
+
+    def __init__(
+        self,
+        sink: Optional[Callable[[int, Any], Any]] = None,
+        mds_api: Optional[MdsClientApi] = None,
+        channel: Optional[MdsAsyncApiChannelT] = None,
+        merge_distance: int = 100,
+        coalesce_delay: float = 0.05,
+        min_request_interval: float = 0.2,
+        resend_timeout_ms: int = 3000,
+        gap_timeout: float = 10.0,
+        max_retries: int = 2,
+        on_gap_lost: Optional[Callable[[int, int, int, int], Any]] = None,
+        resend: Optional[Callable[[MdsTickResendRequestReqT], int]] = None,
+    ):
+        """
+        sink: 下游处理函数 sink(msgId, 逐笔)，如 L2OrderBookEngine.on_tick（交给 MdsSpiLite 时由其设置）
+        mds_api / channel: 发送重传请求的 API 及通道（通道为 None 时使用默认通道）
+        merge_distance: 两个缺口间隔不超过该序号数时合并为一个请求
+        coalesce_delay: 发现缺口后等待合并的时间（秒）
+        min_request_interval: 两次重传请求之间的最小间隔（秒）
+        resend_timeout_ms: 单次重传请求长时间无数据时的超时（毫秒）
+        gap_timeout: 缺口从发现到放弃回补的最长时间（秒）
+        max_retries: 单个缺口最多重新请求的次数
+        on_gap_lost: 放弃回补时的回调 on_gap_lost(exchId, ChannelNo, 起始序号, 结束序号)
+        resend: 自定义的重传函数（缺省使用 mds_api.send_tick_resend_request_hugely）
+        """
+        if resend is None:
+            if mds_api is None:
+                raise ValueError("需要指定 mds_api 或 resend")
+            resend = lambda req: mds_api.send_tick_resend_request_hugely(
+                channel=channel, tick_resend_req=req, time_out_ms=resend_timeout_ms)
+
+        self.sink = sink
+        self.resend = resend
+        self.merge_distance = merge_distance
+        self.coalesce_delay = coalesce_delay
+        self.min_request_interval = min_request_interval
+        self.gap_timeout = gap_timeout
+        self.max_retries = max_retries
+        self.on_gap_lost = on_gap_lost
+
+        self._states: Dict[ChannelKey, _ChannelState] = {}
+        self._lock = threading.RLock()
+        self._requests: Deque[ChannelKey] = deque()
+        self._wakeup = threading.Condition(threading.Lock())
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._last_request = 0.0
+
+        # 统计
+        self.gap_count = 0
+        self.request_count = 0
+        self.recovered_count = 0
+        self.lost_count = 0
+        self.duplicate_count = 0
+
+    # —— 行情回调线程 ——
+    def on_tick(self, msg_id: int, tick: Any) -> None:
+        """处理一条实时逐笔（MdsL2TradeT / MdsL2OrderT 或包含 exchId、ChannelNo、ApplSeqNum 的投影）"""
+        exch_id = tick.exchId if msg_id == _MSG_L2_TRADE else _ORDER_MSG_EXCH[msg_id]
+        key = (exch_id, tick.ChannelNo)
+        seq = tick.ApplSeqNum
+
+        with self._lock:
+            st = self._states.get(key)
+            if st is None:
+                # 从订阅后收到的第一条逐笔开始跟踪
+                st = self._states[key] = _ChannelState(seq)
+
+            if seq == st.expected and not st.held:
+                st.expected = seq + 1
+                if seq > st.high:
+                    st.high = seq
+                self.sink(msg_id, tick)
+                if st.gaps:
+                    # 心跳发现的尾部缺口被实时数据补上
+                    self._trim_gaps(st)
+                return
+
+            self._accept(key, st, seq, msg_id, _detach(tick))
+            if st.held and time.monotonic() >= st.deadline:
+                self._give_up(key, st)
+
+    def on_heartbeat(self, heartbeat: Any) -> None:
+        """处理逐笔频道心跳（MdsTickChannelHeartbeatT），用于发现频道末尾的缺口"""
+        key = (heartbeat.exchId, heartbeat.ChannelNo)
+        last = heartbeat.ApplLastSeqNum
+        with self._lock:
+            st = self._states.get(key)
+            if st is not None and last > st.high:
+                self._add_gap(key, st, st.high + 1, last)
+                st.high = last
+
+    # —— 后台回补线程（send_tick_resend_request_hugely 同步执行回调） ——
+    def on_resend_msg(self, msg_id: int, msg_body: Any) -> None:
+        """处理重传应答中的一条消息（MdsClientSpi.on_tick_resend_rsp 的 msg_head.msgId 和 msg_body）"""
+        if msg_id == _MSG_L2_TRADE:
+            tick = msg_body.trade
+        elif msg_id in _ORDER_MSG_EXCH:
+            tick = msg_body.order
+        elif msg_id == _MSG_TICK_RESEND:
+            rsp = msg_body.tickResendRsp
+            if rsp.resendStatus != eMdsTickResendStatusT.MDS_TICK_RESEND_STATUS_COMPLETED:
+                _LOG.warning("⚠️ 逐笔重传未完成 exch=%s channel=%s [%s, %s] status=%s count=%s",
+                             rsp.exchId, rsp.channelNo, rsp.beginApplSeqNum,
+                             rsp.endApplSeqNum, rsp.resendStatus, rsp.resendMsgCount)
+            return
+        else:
+            return
+
+        exch_id = tick.exchId if msg_id == _MSG_L2_TRADE else _ORDER_MSG_EXCH[msg_id]
+        key = (exch_id, tick.ChannelNo)
+        with self._lock:
+            st = self._states.get(key)
+            if st is not None:
+                self.recovered_count += 1
+                self._accept(key, st, tick.ApplSeqNum, msg_id, memcpy(tick))
+
+    # —— 内部处理（需在锁内调用） ——
+    def _accept(self, key: ChannelKey, st: _ChannelState, seq: int, msg_id: int, tick: Any) -> None:
+        if seq < st.expected or seq in st.held:
+            self.duplicate_count += 1
+            return
+
+        if seq > st.high + 1:
+            self._add_gap(key, st, st.high + 1, seq - 1)
+        if seq > st.high:
+            st.high = seq
+        st.held[seq] = (msg_id, tick)
+        self._drain(st)
+
+    def _drain(self, st: _ChannelState) -> None:
+        """把从 expected 开始连续的缓存逐笔交给下游"""
+        held = st.held
+        seq = st.expected
+        while seq in held:
+            msg_id, tick = held.pop(seq)
+            self.sink(msg_id, tick)
+            seq += 1
+        st.expected = seq
+        self._trim_gaps(st)
+
+    def _trim_gaps(self, st: _ChannelState) -> None:
+        """去掉已经补齐（序号小于 expected）的缺口"""
+        gaps = st.gaps
+        while gaps and gaps[0][1] < st.expected:
+            gaps.pop(0)
+        if gaps and gaps[0][0] < st.expected:
+            gaps[0][0] = st.expected
+        if not gaps:
+            st.retries = 0
+
+    def _add_gap(self, key: ChannelKey, st: _ChannelState, begin: int, end: int) -> None:
+        gaps = st.gaps
+        if gaps and begin - gaps[-1][1] <= self.merge_distance:
+            gaps[-1][1] = end
+        else:
+            if not gaps:
+                st.deadline = time.monotonic() + self.gap_timeout
+            gaps.append([begin, end])
+        self.gap_count += 1
+        self._schedule(key)
+
+    def _give_up(self, key: ChannelKey, st: _ChannelState) -> None:
+        """放弃回补当前缺口，跳到下一条已缓存的逐笔"""
+        if st.held:
+            next_seq = min(st.held)
+        else:
+            next_seq = st.high + 1
+        lost = (st.expected, next_seq - 1)
+        self.lost_count += next_seq - st.expected
+        _LOG.warning("⚠️ 逐笔缺口回补超时，放弃 exch=%s channel=%s [%s, %s]",
+                     key[0], key[1], lost[0], lost[1])
+
+        st.expected = next_seq
+        self._drain(st)
+        if st.gaps:
+            st.deadline = time.monotonic() + self.gap_timeout
+        if self.on_gap_lost is not None:
+            self.on_gap_lost(key[0], key[1], lost[0], lost[1])
+
+    def _schedule(self, key: ChannelKey) -> None:
+        with self._wakeup:
+            if key not in self._requests:
+                self._requests.append(key)
+            self._wakeup.notify()
+
+    # —— 后台线程 ——
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TickGapTracker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._running = False
+        with self._wakeup:
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while self._running:
+            with self._wakeup:
+                if not self._requests:
+                    self._wakeup.wait(0.5)
+            if not self._running:
+                break
+
+            self._expire()
+            if not self._requests:
+                continue
+
+            # 等待片刻，让紧接着出现的缺口合并到同一个请求中
+            time.sleep(self.coalesce_delay)
+            with self._wakeup:
+                keys = list(self._requests)
+                self._requests.clear()
+
+            for key in keys:
+                if not self._running:
+                    break
+                self._request(key)
+
+    def _expire(self) -> None:
+        """处理超时的缺口（频道没有新的逐笔到达时由后台线程兜底）"""
+        now = time.monotonic()
+        with self._lock:
+            for key, st in self._states.items():
+                if st.gaps and now >= st.deadline:
+                    self._give_up(key, st)
+
+    def _request(self, key: ChannelKey) -> None:
+        with self._lock:
+            st = self._states.get(key)
+            if st is None or not st.gaps:
+                return
+            ranges = [tuple(gap) for gap in st.gaps]
+
+        for begin, end in ranges:
+            wait = self._last_request + self.min_request_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+
+            req = MdsTickResendRequestReqT()
+            req.exchId, req.channelNo = key
+            req.beginApplSeqNum = begin
+            req.endApplSeqNum = end
+            self.request_count += 1
+            try:
+                ret = self.resend(req)
+                if ret < 0:
+                    _LOG.warning("⚠️ 逐笔重传请求失败 exch=%s channel=%s [%s, %s] ret=%s",
+                                 key[0], key[1], begin, end, ret)
+            except Exception:
+                _LOG.exception("❌ 逐笔重传请求异常")
+
+        # 仍有缺口（部分完成或请求失败）时在重试次数内重新请求，否则等待超时放弃
+        with self._lock:
+            if st.gaps and st.retries < self.max_retries:
+                st.retries += 1
+                self._schedule(key)
+
+    def reset(self) -> None:
+        """清空全部频道状态（如重新订阅之后），缓存的逐笔按序号交给下游"""
+        with self._lock:
+            for st in self._states.values():
+                for seq in sorted(st.held):
+                    self.sink(*st.held[seq])
+            self._states.clear()
+        with self._wakeup:
+            self._requests.clear()
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+板块篮子委托：一次性按预算 / 权重算出整篮委托，按 500 笔原子批次经 send_batch_orders 发出，并按回报汇总成交进度
+"""
+import threading
+import time
+from ctypes import sizeof
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from vendor.trade_api import OesOrdReqT
+from vendor.trade_api.model import eOesBuySellTypeT, eOesOrdTypeT
+
+from pulse.api.trade.order_encoder import resolve_security
+from pulse.core.data.ctypes_dtype import frombuffer
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("BasketEngine")
+
+# SDK 一次可原子发送的最大委托笔数
+ATOMIC_BATCH_SIZE = 500
+
+_ORD_STATUS_FINAL_MIN = 4       # 大于该值为终结状态 @see eOesOrdStatusT
+_ORD_STATUS_INVALID_MIN = 10    # 大于该值为废单
+_ORD_STATUS_REJECTED = 11       # on_order_reject 的委托记为 OES 内部废单
+_PRICE_SCALE = 10000            # 价格 / 金额单位: 1 元 = 10000
+
+
+def infer_mkt_ids(symbols: Sequence[str]) -> np.ndarray:
+    """按 resolve_security（与行情订阅共用 classify_code）识别各证券的市场"""
+    return np.array([resolve_security(s)[0] for s in symbols], dtype=np.uint8)
+
+
+def size_basket(
+    prices: Sequence[float],
+    budget: Optional[float] = None,
+    weights: Optional[Sequence[float]] = None,
+    per_stock: Optional[float] = None,
+    lot: int = 100,
+) -> np.ndarray:
+    """
+    按预算计算每只证券的委托数量（向下取整到 lot），价格单位为元
+
+    - weights: 目标权重（自动归一化），按 budget × 权重 分配；
+    - per_stock: 每只固定金额；同时给出 budget 时按顺序累计，超出预算的证券数量置 0；
+    - 只给 budget: 等权分配。
+    价格无效（<= 0 / NaN）的证券数量为 0。
+    """
+    px = np.asarray(prices, dtype=np.float64)
+    if weights is not None:
+        if budget is None:
+            raise ValueError("按权重分配时必须给出 budget")
+        w = np.clip(np.asarray(weights, dtype=np.float64), 0, None)
+        if w.shape != px.shape or w.sum() <= 0:
+            raise ValueError("weights 与 prices 长度不一致或权重全为 0")
+        alloc = budget * w / w.sum()
+    elif per_stock is not None:
+        alloc = np.full(px.shape, float(per_stock))
+    elif budget is not None:
+        alloc = np.full(px.shape, budget / max(len(px), 1))
+    else:
+        raise ValueError("budget / weights / per_stock 至少给出一个")
+
+    valid = np.isfinite(px) & (px > 0)
+    qty = np.zeros(px.shape, dtype=np.int64)
+    qty[valid] = np.floor(alloc[valid] / px[valid] / lot).astype(np.int64) * lot
+    if per_stock is not None and weights is None and budget is not None:
+        qty[np.cumsum(qty * np.where(valid, px, 0)) > budget] = 0
+    return qty
+
+
+class Basket:
+    """
+    一篮子委托及其成交进度（由 BasketEngine 创建）
+
+    - reqs 为连续存放的 OesOrdReqT 数组，clSeqNo 连续，按 clSeqNo - first_seq 定位到腿；
+    - 各腿的累计成交数量 / 金额和状态存放在 ndarray 中，回报只更新对应下标及汇总值。
+    """
+
+    def __init__(self, name: str, symbols: np.ndarray, reqs: Any, env_id: int, first_seq: int):
+        n = len(symbols)
+        self.name = name
+        self.symbols = symbols
+        self.reqs = reqs
+        self.view = frombuffer(OesOrdReqT, reqs)
+        self.env_id = env_id
+        self.first_seq = first_seq
+        self.target_qty = int(self.view["ordQty"].sum())
+
+        self.status = np.zeros(n, dtype=np.uint8)
+        self.cum_qty = np.zeros(n, dtype=np.int64)
+        self.cum_amt = np.zeros(n, dtype=np.int64)
+        self.filled_qty = 0
+        self.filled_amt = 0
+        self.to_send = np.arange(n)
+        self.risk_codes: Optional[np.ndarray] = None
+        self.sent = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.closed = 0
+        self.send_errors: List[int] = []
+        self.sent_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def leg_of(self, env_id: int, cl_seq_no: int) -> int:
+        """回报对应的腿下标，不属于本篮子时返回 -1"""
+        i = cl_seq_no - self.first_seq
+        return i if env_id == self.env_id and 0 <= i < len(self.symbols) else -1
+
+    # —— 回报更新（回报线程） ——
+    def _fill(self, i: int, cum_qty: int, cum_amt: int) -> None:
+        if cum_qty > self.cum_qty[i]:
+            self.filled_qty += cum_qty - int(self.cum_qty[i])
+            self.filled_amt += cum_amt - int(self.cum_amt[i])
+            self.cum_qty[i] = cum_qty
+            self.cum_amt[i] = cum_amt
+
+    def _status(self, i: int, status: int) -> None:
+        old = int(self.status[i])
+        if old > _ORD_STATUS_FINAL_MIN or status < old and status <= _ORD_STATUS_FINAL_MIN:
+            return
+        self.status[i] = status
+        if status > _ORD_STATUS_FINAL_MIN:
+            if status > _ORD_STATUS_INVALID_MIN:
+                self.rejected += 1
+            self._close_leg()
+
+    def _close_leg(self) -> None:
+        self.closed += 1
+        if self.closed == len(self.symbols):
+            self.done_at = time.time()
+            self.done.set()
+
+    # —— 查询 ——
+    def progress(self) -> Dict[str, Any]:
+        """汇总进度（金额单位为元）"""
+        return {
+            "name": self.name,
+            "legs": len(self.symbols),
+            "sent": self.sent,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "risk_rejected": 0 if self.risk_codes is None else int(np.count_nonzero(self.risk_codes)),
+            "closed": self.closed,
+            "target_qty": self.target_qty,
+            "filled_qty": self.filled_qty,
+            "fill_ratio": round(self.filled_qty / self.target_qty, 4) if self.target_qty else 0.0,
+            "filled_amt": self.filled_amt / _PRICE_SCALE,
+            "send_errors": list(self.send_errors),
+            "done": self.done.is_set(),
+        }
+
+    def legs(self) -> Dict[str, np.ndarray]:
+        """按腿展开的明细列（代码 / 委托数量 / 价格(元) / 累计成交 / 状态），可直接构造 DataFrame"""
+        return {
+            "symbol": self.symbols,
+            "clSeqNo": self.view["clSeqNo"].copy(),
+            "ordQty": self.view["ordQty"].copy(),
+            "ordPrice": self.view["ordPrice"] / _PRICE_SCALE,
+            "cumQty": self.cum_qty.copy(),
+            "cumAmt": self.cum_amt / _PRICE_SCALE,
+            "status": self.status.copy(),
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待全部腿终结（成交 / 撤单 / 拒绝）"""
+        return self.done.wait(timeout)
+
+
+class BasketEngine:
+    """
+    板块篮子委托引擎
+
+        engine = BasketEngine(oes_api, allocator=ClSeqNoAllocator(...))
+        spi = OesSpiLite(on_any=engine.on_report)        # 回报驱动进度
+        qty = size_basket(prices, budget=8_000_000)
+        basket = engine.submit("银行", symbols, prices, qty)
+        basket.progress()
+
+    - 整篮委托一次性写入连续的 OesOrdReqT 数组（NumPy 按列赋值，不逐笔构造结构体）；
+    - 按 ATOMIC_BATCH_SIZE 笔切片调用 send_batch_orders，每片在 SDK 中原子发送；
+    - 某片发送失败时停止发送后续批次，已发出的腿照常跟踪，失败信息记入 send_errors。
+    """
+
+    def __init__(self, api: Any, allocator: Any = None, channel: Any = None,
+                 chunk_size: int = ATOMIC_BATCH_SIZE,
+                 on_done: Optional[Callable[[Basket], Any]] = None,
+                 risk_gate: Any = None):
+        """
+        api: 已启动的 OesClientApi
+        allocator: ClSeqNoAllocator；为 None 时从 api 的流水号计数中整段预留
+        channel: 委托通道，None 表示默认委托通道
+        chunk_size: 每次 send_batch_orders 的笔数（不超过 500 才能保证原子性）
+        on_done: 篮子全部腿终结时在回报线程中调用
+        risk_gate: RiskGate；发送前整篮向量化检查，未通过的腿不发送并记为拒绝
+        """
+        if not 0 < chunk_size <= ATOMIC_BATCH_SIZE:
+            raise ValueError(f"chunk_size 必须在 1~{ATOMIC_BATCH_SIZE} 之间: {chunk_size}")
+        self.api = api
+        self.allocator = allocator
+        self.channel = channel
+        self.chunk_size = chunk_size
+        self.on_done = on_done
+        self.risk_gate = risk_gate
+        self._lock = threading.Lock()
+        self._active: List[Basket] = []
+
+    # —— 构造 ——
+    def _env_id(self) -> int:
+        ch = self.channel or self.api.get_default_ord_channel()
+        return ch.pChannelCfg.contents.remoteCfg.clEnvId
+
+    def _reserve_seqs(self, env_id: int, n: int) -> int:
+        if self.allocator is not None:
+            return self.allocator.take(n, env_id)[0]
+        first = self.api.get_next_cl_seq_no(env_id)
+        self.api.set_last_cl_seq_no(cl_env_id=env_id, last_cl_seq_no=first + n - 1)
+        return first
+
+    def build(
+        self,
+        name: str,
+        symbols: Sequence[str],
+        prices: Sequence[float],
+        qtys: Sequence[int],
+        bs_type: int = eOesBuySellTypeT.OES_BS_TYPE_BUY,
+        ord_type: int = eOesOrdTypeT.OES_ORD_TYPE_LMT,
+        mkt_ids: Optional[Sequence[int]] = None,
+    ) -> Basket:
+        """生成篮子（数量为 0 的证券被剔除），价格单位为元；此时尚未发送"""
+        syms = np.asarray(symbols, dtype=str)
+        px = np.asarray(prices, dtype=np.float64)
+        qty = np.asarray(qtys, dtype=np.int64)
+        if not len(syms) == len(px) == len(qty):
+            raise ValueError("symbols / prices / qtys 长度不一致")
+        keep = qty > 0
+        syms, px, qty = syms[keep], px[keep], qty[keep]
+        resolved = [resolve_security(s) for s in syms]
+        if mkt_ids is None:
+            mkt = np.array([m for m, _ in resolved], dtype=np.uint8)
+        else:
+            mkt = np.asarray(mkt_ids, dtype=np.uint8)[keep]
+
+        n = len(syms)
+        if not n:
+            raise ValueError(f"篮子 {name} 没有委托数量大于 0 的证券")
+        env_id = self._env_id()
+        first_seq = self._reserve_seqs(env_id, n)
+        reqs = (OesOrdReqT * n)()
+        view = frombuffer(OesOrdReqT, reqs)
+        view["clSeqNo"] = np.arange(first_seq, first_seq + n, dtype=np.int32)
+        view["mktId"] = mkt
+        view["ordType"] = ord_type
+        view["bsType"] = bs_type
+        view["securityId"] = [sid.encode() for _, sid in resolved]
+        view["ordQty"] = qty
+        view["ordPrice"] = np.rint(px * _PRICE_SCALE).astype(np.int32)
+        return Basket(name, syms, reqs, env_id, first_seq)
+
+    # —— 发送 ——
+    def send(self, basket: Basket) -> Basket:
+        """（经本地风控后）按原子批次发送篮子"""
+        if basket.sent_at is not None:
+            raise RuntimeError(f"篮子 {basket.name} 已发送")
+        with self._lock:
+            self._active.append(basket)
+
+        basket.sent_at = time.time()
+        reqs = basket.reqs
+        if self.risk_gate is not None:
+            codes = self.risk_gate.check_reqs(basket.view, basket.env_id)
+            basket.to_send = np.flatnonzero(codes == 0)
+            if len(basket.to_send) < len(basket):
+                self._risk_reject(basket, codes)
+                reqs = (OesOrdReqT * len(basket.to_send))()
+                frombuffer(OesOrdReqT, reqs)[:] = basket.view[basket.to_send]
+
+        total = len(basket.to_send)
+        for start in range(0, total, self.chunk_size):
+            end = min(start + self.chunk_size, total)
+            chunk = (OesOrdReqT * (end - start)).from_buffer(reqs, start * sizeof(OesOrdReqT))
+            ret = self.api.send_batch_orders(self.channel, chunk)
+            if ret is None or ret < 0:
+                basket.send_errors.append(ret)
+                _LOG.error("❌ 篮子 %s 第 %d~%d 笔发送失败: %s，停止发送剩余 %d 笔",
+                           basket.name, start, end - 1, ret, total - start)
+                break
+            basket.sent = end
+        _LOG.info("📤 篮子 %s 已发送 %d/%d 笔，耗时 %.2fms",
+                  basket.name, basket.sent, len(basket), (time.time() - basket.sent_at) * 1000)
+        if basket.sent < total:
+            self._finish_unsent(basket)
+        return basket
+
+    def submit(self, name: str, symbols: Sequence[str], prices: Sequence[float], qtys: Sequence[int],
+               **kwargs: Any) -> Basket:
+        """build + send"""
+        return self.send(self.build(name, symbols, prices, qtys, **kwargs))
+
+    def _risk_reject(self, basket: Basket, codes: np.ndarray) -> None:
+        # 未通过本地风控的腿不发送，直接记为拒绝
+        basket.risk_codes = codes
+        rejected = np.flatnonzero(codes)
+        _LOG.warning("⚠️ 篮子 %s 有 %d/%d 笔未通过本地风控", basket.name, len(rejected), len(basket))
+        with self._lock:
+            for i in rejected.tolist():
+                basket._status(i, _ORD_STATUS_REJECTED)
+            finished = self._pop_done(basket)
+        if finished:
+            self._finished(basket)
+
+    def _finish_unsent(self, basket: Basket) -> None:
+        # 未发出的腿不会有回报，直接记为终结（不计入 rejected），保证篮子能够完成
+        unsent = basket.to_send[basket.sent:].tolist()
+        if self.risk_gate is not None:
+            for i in unsent:
+                self.risk_gate.release(int(basket.view["clSeqNo"][i]), basket.env_id)
+        with self._lock:
+            for i in unsent:
+                basket.status[i] = _ORD_STATUS_REJECTED
+                basket._close_leg()
+            finished = self._pop_done(basket)
+        if finished:
+            self._finished(basket)
+
+    # —— 回报（回报线程） ——
+    def on_report(self, body: Any) -> None:
+        """
+        可直接作为 OesSpiLite(on_any=...) 使用：按回报体类型分派，
+        与篮子无关的回报（资金 / 持仓 / 其他委托）直接忽略
+        """
+        if hasattr(body, "trdQty"):
+            self.on_trade_report(body)
+        elif hasattr(body, "ordStatus"):
+            self.on_order_report(body)
+        elif hasattr(body, "ordRejReason") and hasattr(body, "clSeqNo"):
+            self.on_order_reject(body)
+
+    def on_order_report(self, b: Any) -> None:
+        """OesOrdCnfmT"""
+        self._update(b, b.ordStatus, fill=True)
+
+    def on_trade_report(self, b: Any) -> None:
+        """OesTrdCnfmT（携带累计成交数量 / 金额和订单当前状态）"""
+        self._update(b, b.ordStatus, fill=True)
+
+    def on_order_reject(self, b: Any) -> None:
+        """OesOrdRejectT"""
+        self._update(b, _ORD_STATUS_REJECTED, fill=False)
+
+    def _update(self, b: Any, status: int, fill: bool) -> None:
+        with self._lock:
+            for basket in self._active:
+                i = basket.leg_of(b.clEnvId, b.clSeqNo)
+                if i >= 0:
+                    break
+            else:
+                return
+            if fill:
+                if basket.status[i] == 0:
+                    basket.accepted += 1
+                basket._fill(i, b.cumQty, b.cumAmt)
+            basket._status(i, status)
+            finished = self._pop_done(basket)
+        if finished:
+            self._finished(basket)
+
+    def _pop_done(self, basket: Basket) -> bool:
+        if basket.done.is_set() and basket in self._active:
+            self._active.remove(basket)
+            return True
+        return False
+
+    def _finished(self, basket: Basket) -> None:
+        _LOG.info("✅ 篮子 %s 完成: %s", basket.name, basket.progress())
+        if self.on_done is not None:
+            try:
+                self.on_done(basket)
+            except Exception:
+                _LOG.exception("❌ 篮子完成回调失败")
+
+    def active_baskets(self) -> List[Basket]:
+        with self._lock:
+            return list(self._active)
@@ -8,6 +8,8 @@ from typing import Callable, Any
 from vendor.trade_api import OesClientSpi
 from vendor.trade_api.model import eOesBuySellTypeT, eOesOrdTypeSzT, eOesOrdTypeShT, OesFundTrsfReportT
 from core.utils.logger import get_logger
+from core.order_management.order_store import OrderStore
+from core.order_management.report_checkpoint import ReportCheckpoint
 
 log = get_logger("OesSpi")
 _INT_MAX = 2**31 - 1
@@ -36,22 +38,38 @@ def _sym(b: Any) -> str:
     sid = getattr(b, "securityId", b"")
     return sid.decode() if isinstance(sid, (bytes, bytearray)) else str(sid)
 
+def _price_type(rec: Any) -> str:
+    return _PRICE_TYPE_CN.get(rec.ord_type, '限价' if rec.ord_price else '市价')
+
 class OesSpiLite(OesClientSpi):
     """专注于 A 股（深圳）委托回报/成交报告/资金/持仓，日志中文化"""
     __abstractmethods__ = set()
 
-    def __init__(self, on_any: Callable[[Any], None] | None = None):
+    def __init__(self, on_any: Callable[[Any], None] | None = None, order_store: OrderStore | None = None,
+                 checkpoint: ReportCheckpoint | None = None, subscribe_env_id: int = 0):
         super().__init__()
         self._hook = on_any
-        # 记录 clSeqNo 对应的操作方向和委托类型
-        self._side_map: dict[int, str] = {}
-        self._price_type_map: dict[int, str] = {}
+        # 委托状态表：按 (clEnvId, clSeqNo) 记录方向、委托类型和成交进度
+        self.orders = order_store if order_store is not None else OrderStore()
+        # 回报断点：重连时从最后处理的回报之后续传，重复回报直接丢弃；未指定时只在进程内续传
+        self.checkpoint = checkpoint if checkpoint is not None else ReportCheckpoint()
+        self.subscribe_env_id = subscribe_env_id
+
+    def _fresh(self, rpt_head: Any) -> bool:
+        # 断点之前的回报（重连后补发的重复部分）不再处理
+        if rpt_head is None:
+            return True
+        return self.checkpoint.accept(self.subscribe_env_id, rpt_head.rptSeqNum)
 
     def on_rpt_connect(self, channel: Any, user_info: Any) -> int:
         tag = channel.pChannelCfg.contents.channelTag.decode()
-        log.info(f"[{_now()}] 回报通道[{tag}]已连接，开始订阅回报")
+        last = self.checkpoint.last(self.subscribe_env_id)
+        if not last and not self.checkpoint.persistent:
+            # 进程内首次连接且没有断点文件：只接收最新的回报
+            last = _INT_MAX
+        log.info(f"[{_now()}] 回报通道[{tag}]已连接，从回报编号 {last} 开始订阅回报")
         self.oes_api.send_report_synchronization(
-            channel, subscribe_env_id=0, subscribe_rpt_types=0, last_rpt_seq_num=_INT_MAX
+            channel, subscribe_env_id=self.subscribe_env_id, subscribe_rpt_types=0, last_rpt_seq_num=last
         )
         return 0
 
@@ -62,25 +80,25 @@ class OesSpiLite(OesClientSpi):
 
     def on_order_insert(self, channel: Any, msg_head: Any, rpt_head: Any, rpt_body: Any, user_info: Any) -> int:
         # 委托生成回调，先于 on_order_report
+        if not self._fresh(rpt_head):
+            return 0
         b = rpt_body
         if hasattr(b, 'clSeqNo') and hasattr(b, 'ordQty'):
             seq = b.clSeqNo
-            bs = getattr(b, 'bsType', None)
-            op = _SIDE_CN.get(bs, '')
-            # 生成时也记录方向
-            self._side_map[seq] = op
+            op = _SIDE_CN.get(self.orders.on_order_insert(b).bs_type, '')
             log.info(f"[{_now()}] 委托生成 | 证券={_sym(b)} | 操作={op} | 数量={b.ordQty} | 单号={seq}")
         return 0
 
     def on_order_report(self, channel: Any, msg_head: Any, rpt_head: Any, rpt_body: Any, user_info: Any) -> int:
         # 订单回报：记录委托类型并输出中文
+        if not self._fresh(rpt_head):
+            return 0
         b = rpt_body
         if hasattr(b, 'ordStatus'):
             seq = b.clSeqNo
-            op = self._side_map.get(seq, '')
-            ot = getattr(b, 'ordType', None)
-            price_type = _PRICE_TYPE_CN.get(ot, '限价' if getattr(b, 'ordPrice', 0) else '市价')
-            self._price_type_map[seq] = price_type
+            rec = self.orders.on_order_report(b)
+            op = _SIDE_CN.get(rec.bs_type, '')
+            price_type = _price_type(rec)
             qty = b.ordQty
             price_disp = '市价' if price_type == '市价' else f"{b.ordPrice/10000:.2f}"
             status = _STATUS_CN.get(b.ordStatus, f"状态{b.ordStatus}")
@@ -93,11 +111,14 @@ class OesSpiLite(OesClientSpi):
 
     def on_trade_report(self, channel: Any, msg_head: Any, rpt_head: Any, rpt_body: Any, user_info: Any) -> int:
         # 成交报告：沿用原委托类型
+        if not self._fresh(rpt_head):
+            return 0
         b = rpt_body
         if hasattr(b, 'trdQty'):
             seq = b.clSeqNo
-            op = self._side_map.get(seq, '')
-            price_type = self._price_type_map.get(seq, '市价')
+            rec = self.orders.on_trade_report(b)
+            op = _SIDE_CN.get(rec.bs_type, '')
+            price_type = _price_type(rec)
             price = b.trdPrice / 10000
             amt = b.trdAmt / 10000
             log.info(
@@ -108,6 +129,8 @@ class OesSpiLite(OesClientSpi):
         return 0
 
     def on_cash_asset_variation(self, channel: Any, msg_head: Any, rpt_head: Any, rpt_body: Any, user_info: Any) -> int:
+        if not self._fresh(rpt_head):
+            return 0
         b = rpt_body
         if hasattr(b, 'cashAvl') or hasattr(b, 'currentAvailableBal'):
             avail = getattr(b, 'currentAvailableBal', getattr(b, 'cashAvl', 0)) / 10000
@@ -118,6 +141,8 @@ class OesSpiLite(OesClientSpi):
         return 0
 
     def on_stock_holding_variation(self, channel: Any, msg_head: Any, rpt_head: Any, rpt_body: Any, user_info: Any) -> int:
+        if not self._fresh(rpt_head):
+            return 0
         b = rpt_body
         if hasattr(b, 'sumHld') or hasattr(b, 'positionQty'):
             total = getattr(b, 'sumHld', getattr(b, 'positionQty', 0))
@@ -136,7 +161,11 @@ class OesSpiLite(OesClientSpi):
         return 0
 
     def on_order_reject(self, channel, msg_head, rpt_head, rpt_body, user_info):
+        if not self._fresh(rpt_head):
+            return 0
         seq = getattr(rpt_body, 'clSeqNo', None)
+        if seq is not None:
+            self.orders.on_order_reject(rpt_body)
         reason = getattr(rpt_body, 'ordRejReason', getattr(rpt_body, 'rejReason', 0))
         log.error(f"[{_now()}] ❌ 订单被拒 | 单号={seq} | 原因代码={reason}")
         if self._hook:
@@ -144,6 +173,8 @@ class OesSpiLite(OesClientSpi):
         return 0
 
     def on_fund_trsf_report(self, channel, msg_head, rpt_head, rpt_body: OesFundTrsfReportT, user_info):
+        if not self._fresh(rpt_head):
+            return 0
         amt = getattr(rpt_body, 'trsfAmt', 0) / 10000
         status = getattr(rpt_body, 'trsfStatus', 0)
         log.info(f"[{_now()}] 出入金回报 | 金额={amt:,.2f} | 状态={status}")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+预分配的委托编码器：按证券缓存模板，热路径只写入 clSeqNo / 买卖方向 / 价格 / 数量后直接调用 C 接口
+"""
+import struct
+from ctypes import POINTER, addressof, c_size_t, sizeof
+from typing import Any, Dict, Optional, Tuple
+
+from vendor.trade_api import OesOrdCancelReqT, OesOrdReqT
+from vendor.trade_api.c_api_wrapper import COesApiFuncLoader
+from vendor.quote_api import eMdsExchangeIdT, eMdsMdProductTypeT
+from vendor.trade_api.model import eOesMarketIdT, eOesOrdTypeT
+
+from pulse.api.quote.subscription_manager import classify_code
+
+# 批量委托接口单次调用的上限
+MAX_BATCH = 10000
+
+# 热路径一次 pack_into 写入的字段（ordReqOrigSendTime 由 API 在发送时填充，填充域按偏移自动跳过）；
+# mktId ~ securityId 是连续的模板前缀，按 (证券, 买卖方向) 预先打包成 bytes，热路径整段写入
+_PREFIX_FIELDS = (
+    ("mktId", "B"), ("ordType", "B"), ("bsType", "B"), ("assignedTgwItemNo", "B"),
+    ("invAcctId", "16s"), ("securityId", "16s"),
+)
+_ORD_FIELDS = (("clSeqNo", "i"),) + _PREFIX_FIELDS + (
+    ("ordQty", "i"), ("ordPrice", "i"), ("origClOrdId", "q"), ("userInfo", "q"),
+)
+_CANCEL_FIELDS = (
+    ("clSeqNo", "i"), ("mktId", "B"), ("assignedTgwItemNo", "B"), ("invAcctId", "16s"), ("securityId", "16s"),
+    ("origClSeqNo", "i"), ("origClEnvId", "b"), ("origClOrdId", "q"), ("userInfo", "q"),
+)
+
+# 模板: (mktId, ordType, invAcctId, securityId)
+Template = Tuple[int, int, bytes, bytes]
+
+# (exchId, 是否期权) -> mktId
+_MKT_IDS = {
+    (eMdsExchangeIdT.MDS_EXCH_SSE, False): eOesMarketIdT.OES_MKT_SH_ASHARE,
+    (eMdsExchangeIdT.MDS_EXCH_SZSE, False): eOesMarketIdT.OES_MKT_SZ_ASHARE,
+    (eMdsExchangeIdT.MDS_EXCH_SSE, True): eOesMarketIdT.OES_MKT_SH_OPTION,
+    (eMdsExchangeIdT.MDS_EXCH_SZSE, True): eOesMarketIdT.OES_MKT_SZ_OPTION,
+}
+
+
+def resolve_security(symbol: str) -> Tuple[int, str]:
+    """
+    证券代码 → (mktId, securityId)
+
+    市场与行情订阅共用 classify_code 的识别规则（如 110xxx / 113xxx 可转债属于上海），
+    securityId 为去掉交易所前后缀的纯数字代码
+    """
+    exch_id, product, instr_id = classify_code(symbol)
+    option = product == eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_OPTION
+    return int(_MKT_IDS[(exch_id, option)]), f"{instr_id:0{8 if option else 6}d}"
+
+
+def _layout(ctype: Any, fields: Tuple[Tuple[str, str], ...], start: int = 0) -> struct.Struct:
+    """按结构体的字段偏移（从 start 起）生成打包格式，SDK 结构体变化时在导入时报错"""
+    fmt, pos = "<", start
+    for name, code in fields:
+        field = getattr(ctype, name)
+        if field.offset < pos or field.size != struct.calcsize("<" + code):
+            raise TypeError(f"{ctype.__name__}.{name} 的内存布局与预期不一致")
+        if field.offset > pos:
+            fmt += f"{field.offset - pos}x"
+        fmt += code
+        pos = field.offset + field.size
+    return struct.Struct(fmt)
+
+
+def _prefixed(full: struct.Struct, prefix: struct.Struct) -> struct.Struct:
+    """把 full 中与 prefix 对应的连续字段合并为一个 bytes 字段"""
+    before, found, after = full.format.partition(prefix.format[1:])
+    if not found:
+        raise TypeError(f"模板前缀 {prefix.format} 不是 {full.format} 中的连续字段")
+    return struct.Struct(f"{before}{prefix.size}s{after}")
+
+
+_PREFIX_LAYOUT = _layout(OesOrdReqT, _PREFIX_FIELDS, OesOrdReqT.mktId.offset)
+_ORD_LAYOUT = _prefixed(_layout(OesOrdReqT, _ORD_FIELDS), _PREFIX_LAYOUT)
+_CANCEL_LAYOUT = _layout(OesOrdCancelReqT, _CANCEL_FIELDS)
+_ORD_SIZE = sizeof(OesOrdReqT)
+_NO_PREFIX: Dict[int, bytes] = {}
+
+
+def _resolve(func: Any) -> Any:
+    """LazyCFuncPointer → ctypes 函数本身，省去每次调用的代理开销"""
+    return func.resolve() if hasattr(func, "resolve") else func
+
+
+class OrderEncoder:
+    """
+    预分配的委托编码器（非线程安全，每个下单线程各用一个实例）
+
+        enc = OrderEncoder(oes_api, capacity=1000)
+        enc.template("600000")                          # 可选，首次用到时自动创建
+        enc.send_order("600000", bs_type, 101000, 100, seq)
+        for ...:
+            enc.add("000001", bs_type, price, qty, seq)
+        enc.flush()                                     # 一次 C 调用，SDK 按 500 笔原子拆分
+
+    - 委托池是一块连续的 OesOrdReqT 数组，指向各槽位的指针数组在构造时一次生成；
+    - 每笔委托只做一次 struct.pack_into（按 证券 + 方向 缓存的模板前缀 + 本次的 clSeqNo / 价格 / 数量）；
+    - C 接口同步把请求编码进发送缓冲区，调用返回后槽位即可复用。
+    """
+
+    def __init__(self, api: Any, channel: Any = None, capacity: int = 1000, inv_acct_id: str = ""):
+        """
+        api: 已启动的 OesClientApi（只在发送时访问）
+        channel: 委托通道，None 表示首次发送时的默认委托通道
+        capacity: 批量委托池的槽位数（单次 flush 的最大笔数）
+        inv_acct_id: 模板中的股东账户，空表示由 OES 自动填充
+        """
+        if not 0 < capacity <= MAX_BATCH:
+            raise ValueError(f"capacity 必须在 1~{MAX_BATCH} 之间: {capacity}")
+        self.api = api
+        self.channel = channel
+        self.capacity = capacity
+        self.inv_acct_id = inv_acct_id.encode()
+        self.templates: Dict[str, Template] = {}
+        # 证券 → {买卖方向: 打包好的模板前缀}
+        self._prefixes: Dict[str, Dict[int, bytes]] = {}
+
+        # 单笔委托 / 撤单使用的独立槽位
+        self._single = OesOrdReqT()
+        self._cancel = OesOrdCancelReqT()
+
+        # 批量委托池及指向各槽位的指针数组
+        self.pool = (OesOrdReqT * capacity)()
+        base = addressof(self.pool)
+        self._ptrs = (POINTER(OesOrdReqT) * capacity).from_buffer(
+            (c_size_t * capacity)(*range(base, base + _ORD_SIZE * capacity, _ORD_SIZE)))
+        self._ptr_views: Dict[int, Any] = {capacity: self._ptrs}
+        self.count = 0
+
+        self._c_send: Any = None
+        self._c_cancel: Any = None
+        self._c_batch: Any = None
+
+    # —— 模板 ——
+    def template(self, symbol: str, mkt_id: Optional[int] = None,
+                 ord_type: int = eOesOrdTypeT.OES_ORD_TYPE_LMT) -> Template:
+        """创建 / 覆盖证券模板；mkt_id 缺省由 resolve_security 识别（代码写法同 classify_code）"""
+        resolved, security_id = resolve_security(symbol)
+        if mkt_id is None:
+            mkt_id = resolved
+        tpl = (mkt_id, ord_type, self.inv_acct_id, security_id.encode())
+        self.templates[symbol] = tpl
+        self._prefixes[symbol] = {}
+        return tpl
+
+    def _prefix(self, symbol: str, bs_type: int) -> bytes:
+        """证券 + 买卖方向 → 打包好的模板前缀（mktId ~ securityId），首次用到时生成"""
+        tpl = self.templates.get(symbol) or self.template(symbol)
+        prefix = _PREFIX_LAYOUT.pack(tpl[0], tpl[1], bs_type, 0, tpl[2], tpl[3])
+        self._prefixes.setdefault(symbol, {})[bs_type] = prefix
+        return prefix
+
+    # —— 编码 ——
+    def encode(self, req: Any, symbol: str, bs_type: int, price: int, qty: int, cl_seq_no: int,
+               user_info: int = 0) -> Any:
+        """按模板把一笔委托写入 req（OesOrdReqT 或池中的槽位），价格单位为 元 × 10000"""
+        prefix = self._prefixes.get(symbol, _NO_PREFIX).get(bs_type) or self._prefix(symbol, bs_type)
+        _ORD_LAYOUT.pack_into(req, 0, cl_seq_no, prefix, qty, price, 0, user_info)
+        return req
+
+    def add(self, symbol: str, bs_type: int, price: int, qty: int, cl_seq_no: int, user_info: int = 0) -> int:
+        """写入批量委托池的下一个槽位，返回槽位下标；池满时抛出 OverflowError（先 flush）"""
+        i = self.count
+        if i >= self.capacity:
+            raise OverflowError(f"委托池已满({self.capacity})，请先 flush()")
+        prefix = self._prefixes.get(symbol, _NO_PREFIX).get(bs_type) or self._prefix(symbol, bs_type)
+        _ORD_LAYOUT.pack_into(self.pool, i * _ORD_SIZE, cl_seq_no, prefix, qty, price, 0, user_info)
+        self.count = i + 1
+        return i
+
+    def clear(self) -> None:
+        """丢弃池中尚未发送的委托"""
+        self.count = 0
+
+    # —— 发送 ——
+    def _bind(self) -> None:
+        loader = COesApiFuncLoader()
+        self._c_send = _resolve(loader.c_oes_async_api_send_order)
+        self._c_cancel = _resolve(loader.c_oes_async_api_send_cancel_order)
+        self._c_batch = _resolve(loader.c_oes_async_api_send_batch_orders)
+        if self.channel is None:
+            self.channel = self.api.get_default_ord_channel()
+
+    def send_order(self, symbol: str, bs_type: int, price: int, qty: int, cl_seq_no: int,
+                   user_info: int = 0) -> int:
+        """编码并发送单笔委托，返回值同 OesClientApi.send_order"""
+        if self._c_send is None:
+            self._bind()
+        prefix = self._prefixes.get(symbol, _NO_PREFIX).get(bs_type) or self._prefix(symbol, bs_type)
+        _ORD_LAYOUT.pack_into(self._single, 0, cl_seq_no, prefix, qty, price, 0, user_info)
+        return self._c_send(self.channel, self._single)
+
+    def send_cancel(self, mkt_id: int, cl_seq_no: int, orig_cl_seq_no: int = 0, orig_cl_env_id: int = 0,
+                    orig_cl_ord_id: int = 0, user_info: int = 0) -> int:
+        """发送撤单请求（按 origClSeqNo + origClEnvId 或 origClOrdId 指定原委托）"""
+        if self._c_cancel is None:
+            self._bind()
+        _CANCEL_LAYOUT.pack_into(self._cancel, 0, cl_seq_no, mkt_id, 0, b"", b"",
+                                 orig_cl_seq_no, orig_cl_env_id, orig_cl_ord_id, user_info)
+        return self._c_cancel(self.channel, self._cancel)
+
+    def flush(self) -> int:
+        """一次性发送池中全部委托并清空，返回值同 OesClientApi.send_batch_orders；池为空时返回 0"""
+        n = self.count
+        if not n:
+            return 0
+        if self._c_batch is None:
+            self._bind()
+        ptrs = self._ptr_views.get(n)
+        if ptrs is None:
+            ptrs = self._ptr_views[n] = (POINTER(OesOrdReqT) * n).from_buffer(self._ptrs)
+        self.count = 0
+        return self._c_batch(self.channel, ptrs, n)
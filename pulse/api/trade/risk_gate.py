@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+本地事前风控：在 send_order / send_batch_orders 之前检查资金、可卖持仓、单券 / 板块金额上限、价格笼子和报单频率
+"""
+import errno
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vendor.quote_api import eMdsMdProductTypeT
+from vendor.trade_api.model import eOesBuySellTypeT
+
+from pulse.api.quote.subscription_manager import classify_code
+from pulse.api.trade.order_encoder import resolve_security
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("RiskGate")
+
+# —— 拒绝原因 ——
+RISK_OK = 0
+RISK_QTY = 1            # 数量无效
+RISK_NO_PRICE = 2       # 没有参考价
+RISK_PRICE_BAND = 3     # 超出价格笼子
+RISK_CASH = 4           # 可用资金不足
+RISK_HOLDING = 5        # 可卖持仓不足
+RISK_SYMBOL_CAP = 6     # 超出单券金额上限
+RISK_SECTOR_CAP = 7     # 超出板块金额上限
+RISK_RATE = 8           # 超出报单频率
+
+RISK_REASONS = {
+    RISK_OK: "通过",
+    RISK_QTY: "数量无效",
+    RISK_NO_PRICE: "没有参考价",
+    RISK_PRICE_BAND: "超出价格笼子",
+    RISK_CASH: "可用资金不足",
+    RISK_HOLDING: "可卖持仓不足",
+    RISK_SYMBOL_CAP: "超出单券金额上限",
+    RISK_SECTOR_CAP: "超出板块金额上限",
+    RISK_RATE: "超出报单频率",
+}
+
+_BUY = eOesBuySellTypeT.OES_BS_TYPE_BUY
+_SELL = eOesBuySellTypeT.OES_BS_TYPE_SELL
+_ORD_STATUS_FINAL_MIN = 4       # 大于该值为终结状态 @see eOesOrdStatusT
+_PRICE_SCALE = 10000            # 价格 / 金额单位: 1 元 = 10000
+_NO_CAP = np.iinfo(np.int64).max
+_STOCK = eMdsMdProductTypeT.MDS_MD_PRODUCT_TYPE_STOCK
+
+# 证券维度数组的键: (mktId, securityId)
+Key = Tuple[int, str]
+
+
+class RiskRejectedError(Exception):
+    """委托未通过本地风控"""
+
+    def __init__(self, reason: int, symbol: str = ""):
+        self.reason = reason
+        self.symbol = symbol
+        super().__init__(f"本地风控拒绝 {symbol}: {RISK_REASONS.get(reason, reason)}")
+
+
+def _group_cumsum(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """按 keys 分组、保持原顺序的累计和"""
+    order = np.argsort(keys, kind="stable")
+    k, v = keys[order], values[order]
+    cum = np.cumsum(v)
+    starts = np.r_[0, np.flatnonzero(k[1:] != k[:-1]) + 1]
+    base = np.repeat(cum[starts] - v[starts], np.diff(np.r_[starts, len(k)]))
+    out = np.empty_like(cum)
+    out[order] = cum - base
+    return out
+
+
+class RiskGate:
+    """
+    本地事前风控闸门（金额、价格单位同 OES: 1 元 = 10000；上限参数以元为单位）
+
+        gate = RiskGate(symbol_cap=2_000_000, sector_caps={"银行": 5_000_000},
+                        sectors=sector_map, price_band=0.02, max_rate=200)
+        spi = OesSpiLite(on_any=gate.on_report)            # 资金 / 持仓 / 委托回报维护状态
+        gate.send_order(oes_api, req)                      # 不通过时抛出 RiskRejectedError
+        codes = gate.check_reqs(basket.view, env_id)       # 篮子整体向量化检查
+
+    - 单笔检查只做几次数组下标运算；篮子按原顺序累计资金 / 持仓 / 上限占用，超限之后的腿被拒绝；
+    - 通过的委托立即占用资金 / 可卖数量 / 上限额度；收到委托回报后资金 / 持仓占用转为“等待资金 / 持仓回报”，
+      下一条资金 / 持仓变动回报到达后才释放（此时柜台已冻结），避免回报先后顺序造成的超额；
+    - 被 OES 拒绝、撤单或发送失败的委托，未成交部分的上限额度会释放；
+    - 尚未收到资金回报时不检查资金；收到第一条持仓回报之前不检查可卖持仓，之后未出现的证券按 0 股处理；
+    - 证券按 (mktId, securityId) 区分，代码写法同 classify_code（沪深同号的证券需带后缀，如 "000001.SH"）。
+    """
+
+    def __init__(
+        self,
+        symbol_cap: Optional[float] = None,
+        sector_caps: Optional[Dict[str, float]] = None,
+        sectors: Optional[Dict[str, str]] = None,
+        price_band: Optional[float] = None,
+        require_price: bool = False,
+        max_rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        capacity: int = 1024,
+    ):
+        """
+        symbol_cap: 单券累计买入金额上限（元），None 表示不限
+        sector_caps: {板块: 累计买入金额上限（元）}
+        sectors: {证券代码: 板块}
+        price_band: 委托价相对最新价的最大偏离（如 0.02），None 表示不检查
+        require_price: 开启价格笼子时，没有最新价的委托是否拒绝
+        max_rate: 每秒最多报单笔数（令牌桶），None 表示不限
+        burst: 令牌桶容量，缺省等于 max_rate
+        capacity: 证券数组的初始容量
+        """
+        self.price_band = price_band
+        self.require_price = require_price
+        self.max_rate = max_rate
+        self.burst = float(burst if burst is not None else (max_rate or 0))
+        self._tokens = self.burst
+        self._token_ts = time.monotonic()
+        self._lock = threading.Lock()
+
+        # 资金（None 表示尚未收到资金回报）
+        self.cash: Optional[int] = None
+        self.pending_cash = 0           # 已通过、尚未收到委托回报
+        self.unsynced_cash = 0          # 已收到委托回报、尚未收到资金回报
+        self.holdings_known = False
+
+        # 证券维度的数组
+        self._keys: Dict[str, Key] = {}         # 代码写法 -> (mktId, securityId) 的缓存
+        self._index: Dict[Key, int] = {}
+        self._symbols: list = []
+        self._default_cap = _NO_CAP if symbol_cap is None else int(symbol_cap * _PRICE_SCALE)
+        self._last_px = np.zeros(capacity, dtype=np.int64)
+        self._sellable = np.zeros(capacity, dtype=np.int64)
+        self._pending_sell = np.zeros(capacity, dtype=np.int64)
+        self._unsynced_sell = np.zeros(capacity, dtype=np.int64)
+        self._exposure = np.zeros(capacity, dtype=np.int64)
+        self._cap = np.full(capacity, self._default_cap, dtype=np.int64)
+        self._sector = np.full(capacity, -1, dtype=np.int32)
+
+        # 板块维度
+        self._sector_index: Dict[str, int] = {}
+        self._sector_exposure = np.zeros(0, dtype=np.int64)
+        self._sector_cap = np.zeros(0, dtype=np.int64)
+
+        # 已通过、尚未终结的委托: (clEnvId, clSeqNo) -> [证券下标, 是否买入, 价格, 数量, 已收到委托回报]
+        self._live: Dict[Tuple[int, int], list] = {}
+
+        for sector, cap in (sector_caps or {}).items():
+            self.set_sector_cap(sector, cap)
+        if sectors:
+            self.set_sectors(sectors)
+
+    # —— 配置 ——
+    def _key(self, symbol: str) -> Key:
+        key = self._keys.get(symbol)
+        if key is None:
+            key = self._keys[symbol] = resolve_security(symbol)
+        return key
+
+    def _ensure(self, key: Key) -> int:
+        i = self._index.get(key)
+        if i is not None:
+            return i
+        i = len(self._symbols)
+        if i == len(self._last_px):
+            n = i * 2
+            for name, fill in (("_last_px", 0), ("_sellable", 0), ("_pending_sell", 0), ("_unsynced_sell", 0),
+                               ("_exposure", 0), ("_cap", self._default_cap), ("_sector", -1)):
+                old = getattr(self, name)
+                new = np.full(n, fill, dtype=old.dtype)
+                new[:i] = old
+                setattr(self, name, new)
+        self._index[key] = i
+        self._symbols.append(key)
+        return i
+
+    def _ensure_sector(self, sector: str) -> int:
+        s = self._sector_index.get(sector)
+        if s is None:
+            s = self._sector_index[sector] = len(self._sector_index)
+            self._sector_exposure = np.append(self._sector_exposure, 0)
+            self._sector_cap = np.append(self._sector_cap, _NO_CAP)
+        return s
+
+    def set_sectors(self, sectors: Dict[str, str]) -> None:
+        """{证券代码: 板块}"""
+        with self._lock:
+            for symbol, sector in sectors.items():
+                i = self._ensure(self._key(symbol))
+                self._sector[i] = self._ensure_sector(sector)
+
+    def set_sector_cap(self, sector: str, cap: Optional[float]) -> None:
+        """板块累计买入金额上限（元），None 表示不限"""
+        with self._lock:
+            s = self._ensure_sector(sector)
+            self._sector_cap[s] = _NO_CAP if cap is None else int(cap * _PRICE_SCALE)
+
+    def set_symbol_cap(self, symbol: str, cap: Optional[float]) -> None:
+        """单券累计买入金额上限（元），None 表示不限"""
+        with self._lock:
+            i = self._ensure(self._key(symbol))
+            self._cap[i] = _NO_CAP if cap is None else int(cap * _PRICE_SCALE)
+
+    # —— 行情 ——
+    def set_last_price(self, symbol: str, price: int) -> None:
+        """最新价（元 × 10000）"""
+        with self._lock:
+            i = self._ensure(self._key(symbol))
+            self._last_px[i] = price
+
+    def update_prices(self, symbols: Sequence[str], prices: Sequence[int]) -> None:
+        """批量更新最新价（元 × 10000）"""
+        with self._lock:
+            idx = np.fromiter((self._ensure(self._key(s)) for s in symbols), dtype=np.int64, count=len(symbols))
+            self._last_px[idx] = prices
+
+    def on_snapshot(self, snap: Any) -> None:
+        """
+        MarketSnapshot（last_price 单位为元），可挂在行情队列的消费端；
+        指数 / 期权快照忽略（MdsSpiLite 推送的指数快照代码带交易所后缀，如 "000001.SH"）
+        """
+        if snap.last_price > 0 and classify_code(snap.symbol)[1] == _STOCK:
+            self.set_last_price(snap.symbol, int(round(snap.last_price * _PRICE_SCALE)))
+
+    # —— 单笔检查 ——
+    def _take_tokens(self, n: int) -> int:
+        """令牌桶：返回本次可用的令牌数（不超过 n），并扣减"""
+        if self.max_rate is None:
+            return n
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._token_ts) * self.max_rate)
+        self._token_ts = now
+        k = min(n, int(self._tokens))
+        self._tokens -= k
+        return k
+
+    def check(self, symbol: str, bs_type: int, price: int, qty: int, cl_seq_no: int, env_id: int = 0,
+              mkt_id: Optional[int] = None) -> int:
+        """
+        检查单笔委托（价格为元 × 10000，0 表示市价），通过时占用额度并返回 RISK_OK，否则返回拒绝原因
+        mkt_id: 给出时 symbol 为委托中的 securityId，不再按代码识别市场
+        """
+        key = self._key(symbol) if mkt_id is None else (mkt_id, symbol)
+        with self._lock:
+            i = self._ensure(key)
+            if qty <= 0:
+                return RISK_QTY
+            last = int(self._last_px[i])
+            if self.price_band is not None:
+                if not last:
+                    if self.require_price:
+                        return RISK_NO_PRICE
+                elif price and abs(price - last) > last * self.price_band:
+                    return RISK_PRICE_BAND
+            px = price or last
+            notional = px * qty
+            buy = bs_type == _BUY
+            if buy:
+                if self.cash is not None and notional > self.cash - self.pending_cash - self.unsynced_cash:
+                    return RISK_CASH
+                if self._exposure[i] + notional > self._cap[i]:
+                    return RISK_SYMBOL_CAP
+                s = self._sector[i]
+                if s >= 0 and self._sector_exposure[s] + notional > self._sector_cap[s]:
+                    return RISK_SECTOR_CAP
+            elif bs_type == _SELL and self.holdings_known:
+                if qty > self._sellable[i] - self._pending_sell[i] - self._unsynced_sell[i]:
+                    return RISK_HOLDING
+            if not self._take_tokens(1):
+                return RISK_RATE
+
+            if buy:
+                self.pending_cash += notional
+                self._exposure[i] += notional
+                if s >= 0:
+                    self._sector_exposure[s] += notional
+            elif bs_type == _SELL:
+                self._pending_sell[i] += qty
+            self._live[(env_id, cl_seq_no)] = [i, buy, px, qty, False]
+            return RISK_OK
+
+    # —— 篮子检查 ——
+    def check_basket(
+        self,
+        symbols: Sequence[str],
+        bs_types: Any,
+        prices: Any,
+        qtys: Any,
+        cl_seq_nos: Any,
+        env_id: int = 0,
+        mkt_ids: Any = None,
+    ) -> np.ndarray:
+        """
+        向量化检查一篮子委托，返回与输入一一对应的拒绝原因数组（RISK_OK 为通过），通过的腿立即占用额度。
+        资金 / 持仓 / 上限按篮子顺序累计（被其他规则拒绝的腿也计入累计，偏保守）；
+        给出 mkt_ids 时 symbols 为委托中的 securityId
+        """
+        n = len(symbols)
+        if mkt_ids is None:
+            keys = [self._key(s) for s in symbols]
+        else:
+            keys = list(zip(np.broadcast_to(np.asarray(mkt_ids), (n,)).tolist(), symbols))
+        bs = np.broadcast_to(np.asarray(bs_types), (n,))
+        px = np.asarray(prices, dtype=np.int64)
+        qty = np.asarray(qtys, dtype=np.int64)
+        seqs = np.asarray(cl_seq_nos, dtype=np.int64)
+        codes = np.zeros(n, dtype=np.int8)
+        if not n:
+            return codes
+
+        with self._lock:
+            idx = np.fromiter((self._ensure(k) for k in keys), dtype=np.int64, count=n)
+            codes[qty <= 0] = RISK_QTY
+
+            last = self._last_px[idx]
+            if self.price_band is not None:
+                no_px = last == 0
+                if self.require_price:
+                    codes[(codes == 0) & no_px] = RISK_NO_PRICE
+                off_band = ~no_px & (px > 0) & (np.abs(px - last) > last * self.price_band)
+                codes[(codes == 0) & off_band] = RISK_PRICE_BAND
+            px_eff = np.where(px > 0, px, last)
+            notional = px_eff * qty
+            buy = bs == _BUY
+            sell = bs == _SELL
+
+            if self.holdings_known:
+                m = sell & (codes == 0)
+                avail = self._sellable[idx] - self._pending_sell[idx] - self._unsynced_sell[idx]
+                codes[m & (_group_cumsum(idx, qty * m) > avail)] = RISK_HOLDING
+
+            m = buy & (codes == 0)
+            used = self._exposure[idx] + _group_cumsum(idx, notional * m)
+            codes[m & (used > self._cap[idx])] = RISK_SYMBOL_CAP
+
+            sec = self._sector[idx]
+            m = buy & (codes == 0) & (sec >= 0)
+            if m.any():
+                sec_safe = np.where(sec >= 0, sec, 0)
+                used = self._sector_exposure[sec_safe] + _group_cumsum(sec, notional * m)
+                codes[m & (used > self._sector_cap[sec_safe])] = RISK_SECTOR_CAP
+
+            if self.cash is not None:
+                m = buy & (codes == 0)
+                avail_cash = self.cash - self.pending_cash - self.unsynced_cash
+                codes[m & (np.cumsum(notional * m) > avail_cash)] = RISK_CASH
+
+            ok = codes == 0
+            allowed = self._take_tokens(int(ok.sum()))
+            codes[ok & (np.cumsum(ok) > allowed)] = RISK_RATE
+            ok = codes == 0
+
+            # 占用额度
+            ok_buy = ok & buy
+            self.pending_cash += int(notional[ok_buy].sum())
+            np.add.at(self._exposure, idx[ok_buy], notional[ok_buy])
+            m = ok_buy & (sec >= 0)
+            np.add.at(self._sector_exposure, sec[m], notional[m])
+            ok_sell = ok & sell
+            np.add.at(self._pending_sell, idx[ok_sell], qty[ok_sell])
+            self._live.update(
+                ((env_id, s), [i, b, p, q, False])
+                for s, i, b, p, q in zip(seqs[ok].tolist(), idx[ok].tolist(), buy[ok].tolist(),
+                                         px_eff[ok].tolist(), qty[ok].tolist()))
+        return codes
+
+    def check_reqs(self, view: np.ndarray, env_id: int = 0) -> np.ndarray:
+        """检查 OesOrdReqT 结构化数组（core.data.ctypes_dtype.frombuffer 得到的视图）"""
+        return self.check_basket(
+            np.char.decode(view["securityId"]).tolist(), view["bsType"], view["ordPrice"],
+            view["ordQty"], view["clSeqNo"], env_id, view["mktId"])
+
+    # —— 发送 ——
+    @staticmethod
+    def _env_id(api: Any, channel: Any) -> int:
+        ch = channel or api.get_default_ord_channel()
+        return ch.pChannelCfg.contents.remoteCfg.clEnvId
+
+    def send_order(self, api: Any, req: Any, channel: Any = None) -> int:
+        """检查后调用 api.send_order；未通过时抛出 RiskRejectedError，发送失败时释放额度"""
+        env_id = self._env_id(api, channel)
+        symbol = req.securityId.decode()
+        code = self.check(symbol, req.bsType, req.ordPrice, req.ordQty, req.clSeqNo, env_id, req.mktId)
+        if code != RISK_OK:
+            raise RiskRejectedError(code, symbol)
+        ret = api.send_order(channel, req)
+        if ret is None or ret < 0:
+            self.release(req.clSeqNo, env_id)
+        return ret
+
+    def send_batch_orders(self, api: Any, reqs: Sequence[Any], channel: Any = None) -> Tuple[int, np.ndarray]:
+        """
+        检查后只发送通过的委托，返回 (api.send_batch_orders 的返回值, 各笔拒绝原因)；
+        全部被拒绝时返回值为 -EPERM
+        """
+        env_id = self._env_id(api, channel)
+        codes = self.check_basket(
+            [r.securityId.decode() for r in reqs], [r.bsType for r in reqs], [r.ordPrice for r in reqs],
+            [r.ordQty for r in reqs], [r.clSeqNo for r in reqs], env_id, [r.mktId for r in reqs])
+        passed = [r for r, c in zip(reqs, codes) if c == RISK_OK]
+        if len(passed) < len(reqs):
+            _LOG.warning("⚠️ 批量委托有 %d/%d 笔未通过本地风控", len(reqs) - len(passed), len(reqs))
+        if not passed:
+            return -errno.EPERM, codes
+        ret = api.send_batch_orders(channel, passed)
+        if ret is None or ret < 0:
+            for r in passed:
+                self.release(r.clSeqNo, env_id)
+        return ret, codes
+
+    # —— 回报（回报线程） ——
+    def on_report(self, body: Any) -> None:
+        """
+        可直接作为 OesSpiLite(on_any=...) 使用：按回报体类型分派
+        （成交回报不影响风控状态，资金 / 持仓变化以随后的资金 / 持仓回报为准）
+        """
+        if hasattr(body, "currentAvailableBal"):
+            self.on_cash_asset_variation(body)
+        elif hasattr(body, "sellAvlHld"):
+            self.on_stock_holding_variation(body)
+        elif hasattr(body, "trdQty"):
+            return
+        elif hasattr(body, "ordStatus"):
+            self.on_order_report(body)
+        elif hasattr(body, "ordRejReason") and hasattr(body, "clSeqNo"):
+            self.on_order_reject(body)
+
+    def on_cash_asset_variation(self, b: Any) -> None:
+        """OesCashAssetReportT / OesCashAssetItemT（也可用于启动时的资金查询结果）"""
+        with self._lock:
+            self.cash = b.currentAvailableBal
+            self.unsynced_cash = 0
+
+    def on_stock_holding_variation(self, b: Any) -> None:
+        """OesStkHoldingReportT / OesStkHoldingItemT（也可用于启动时的持仓查询结果）"""
+        sid = b.securityId
+        symbol = sid.decode() if isinstance(sid, (bytes, bytearray)) else str(sid)
+        with self._lock:
+            i = self._ensure((b.mktId, symbol))
+            self._sellable[i] = b.sellAvlHld
+            self._unsynced_sell[i] = 0
+            self.holdings_known = True
+
+    def _ack(self, live: list) -> None:
+        # 柜台已受理：占用转为等待资金 / 持仓回报
+        if live[4]:
+            return
+        live[4] = True
+        i, buy, px, qty = live[0], live[1], live[2], live[3]
+        if buy:
+            self.pending_cash -= px * qty
+            self.unsynced_cash += px * qty
+        else:
+            self._pending_sell[i] -= qty
+            self._unsynced_sell[i] += qty
+
+    def _release(self, key: Tuple[int, int], unfilled: int, acked: bool) -> None:
+        live = self._live.pop(key, None)
+        if live is None:
+            return
+        i, buy, px, qty = live[0], live[1], live[2], live[3]
+        if not live[4] and not acked:
+            # 未被柜台受理（拒绝 / 发送失败）：直接释放占用
+            if buy:
+                self.pending_cash -= px * qty
+            else:
+                self._pending_sell[i] -= qty
+        if buy and unfilled > 0:
+            self._exposure[i] -= px * unfilled
+            s = self._sector[i]
+            if s >= 0:
+                self._sector_exposure[s] -= px * unfilled
+
+    def on_order_report(self, b: Any) -> None:
+        """OesOrdCnfmT：首次回报视为柜台已受理，终结时释放未成交部分的上限额度"""
+        key = (b.clEnvId, b.clSeqNo)
+        with self._lock:
+            live = self._live.get(key)
+            if live is None:
+                return
+            self._ack(live)
+            if b.ordStatus > _ORD_STATUS_FINAL_MIN:
+                self._release(key, live[3] - b.cumQty, acked=True)
+
+    def on_order_reject(self, b: Any) -> None:
+        """OesOrdRejectT"""
+        with self._lock:
+            key = (b.clEnvId, b.clSeqNo)
+            live = self._live.get(key)
+            if live is not None:
+                self._release(key, live[3], acked=False)
+
+    def release(self, cl_seq_no: int, env_id: int = 0) -> None:
+        """撤销一笔已通过检查但未发出的委托的全部占用"""
+        key = (env_id, cl_seq_no)
+        with self._lock:
+            live = self._live.get(key)
+            if live is not None:
+                self._release(key, live[3], acked=False)
+
+    # —— 查询 ——
+    def snapshot(self) -> Dict[str, Any]:
+        """当前可用额度（元）"""
+        with self._lock:
+            cash = None if self.cash is None else (self.cash - self.pending_cash - self.unsynced_cash) / _PRICE_SCALE
+            return {
+                "cash_available": cash,
+                "pending_cash": self.pending_cash / _PRICE_SCALE,
+                "unsynced_cash": self.unsynced_cash / _PRICE_SCALE,
+                "live_orders": len(self._live),
+                "symbols": len(self._symbols),
+                "sector_exposure": {name: int(self._sector_exposure[s]) / _PRICE_SCALE
+                                    for name, s in self._sector_index.items()},
+            }
+
+    def exposure(self, symbol: str) -> float:
+        """单券已占用的买入金额（元）"""
+        i = self._index.get(self._key(symbol))
+        return 0.0 if i is None else int(self._exposure[i]) / _PRICE_SCALE
@@ -0,0 +1,150 @@
+# core/data/bulk_query.py
+# -*- coding: utf-8 -*-
+"""
+bulk_query.py —— MDS / OES 查询结果的批量收集
+--------------------------------------------
+• query_* 的每条回报不再逐条回调 SPI，而是经 MdsQryRowSink / OesQryRowSink 按原始内存
+  拷贝进预分配的 structured ndarray，以 cursor.isEnd 判断结束
+• submit() 返回 concurrent.futures.Future，query_async() 可直接 await
+• 每个查询通道一个工作线程：同一通道上的查询串行，不同通道（OES 的各个委托 / 回报通道
+  各自带有内置查询通道）之间并发；MDS 的查询统一走内置查询通道，只需一个工作线程
+• 结果是 structured ndarray，column_views() / to_dataframe() 按列零拷贝访问
+"""
+from __future__ import annotations
+import asyncio
+import ctypes
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from vendor.quote_api import MdsQryRowSink
+from vendor.trade_api import OesQryRowSink
+
+from .ctypes_dtype import ctypes_to_dtype
+
+
+class RowCollector(MdsQryRowSink, OesQryRowSink):
+    """
+    把查询回报原样拷贝进按需扩容的 structured ndarray（MDS / OES 查询通用）
+    ctype 为空时按第一条回报的结构体类型分配；查询结果为空时只有指定了 ctype 才能得到带字段的空数组
+    """
+
+    def __init__(self, ctype: Any = None, capacity: int = 1024) -> None:
+        self.ctype = ctype
+        self.capacity = max(1, capacity)
+        self.count = 0
+        self.is_end = False
+        self._itemsize = 0
+        self._buf: Optional[np.ndarray] = None
+        if ctype is not None:
+            self._alloc(ctype)
+
+    def _alloc(self, ctype: Any) -> None:
+        self.ctype = ctype
+        self._itemsize = ctypes.sizeof(ctype)
+        self._buf = np.empty(self.capacity, dtype=ctypes_to_dtype(ctype))
+
+    def on_qry_row(self, channel, msg_id, body_type, msg_head, p_msg_item, qry_cursor) -> int:
+        if self._buf is None:
+            self._alloc(body_type)
+        elif self.count == len(self._buf):
+            # np.resize 会丢掉 dtype 中的对齐填充，这里按原 dtype 重新分配
+            grown = np.empty(len(self._buf) * 2, dtype=self._buf.dtype)
+            grown[:self.count] = self._buf
+            self._buf = grown
+
+        ctypes.memmove(self._buf.ctypes.data + self.count * self._itemsize,
+                       p_msg_item, self._itemsize)
+        self.count += 1
+        if qry_cursor.isEnd:
+            self.is_end = True
+        return 0
+
+    def result(self) -> np.ndarray:
+        if self._buf is None:
+            return np.empty(0)
+        return self._buf[:self.count]
+
+
+class BulkQuery:
+    """
+    查询结果批量收集
+
+        bq = BulkQuery(oes_api, channels=(None, oes_api.get_default_rpt_channel()))
+        fut_hld = bq.submit("query_stk_holding")
+        fut_ord = bq.submit("query_order", qry_filter=flt)      # 与上一个查询在不同通道并发
+        holdings = fut_hld.result()                             # structured ndarray (OesStkHoldingItemT)
+
+        snapshots = await BulkQuery(mds_api).query_async("query_snapshot_list", security_list="600000,000001")
+    """
+
+    def __init__(self, api: Any, channels: Sequence[Any] = (None,), capacity: int = 1024) -> None:
+        """
+        api: MdsClientApi 或 OesClientApi
+        channels: 用于查询的通道，None 表示接口的默认通道；MDS 查询不区分通道，保持默认即可
+        capacity: 结果缓冲区的初始行数（不够时按倍数扩容）
+        """
+        if not channels:
+            raise ValueError("channels 不能为空")
+        self.api = api
+        self.capacity = capacity
+        self._channels: List[Any] = list(channels)
+        self._workers = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"bulk-query-{i}")
+                         for i in range(len(self._channels))]
+        self._pending = [0] * len(self._channels)
+        self._lock = threading.Lock()
+
+    def _pick(self) -> int:
+        # 排队最少的通道
+        return min(range(len(self._pending)), key=self._pending.__getitem__)
+
+    def _done(self, index: int) -> None:
+        with self._lock:
+            self._pending[index] -= 1
+
+    def submit(self, query: Union[str, Callable[..., int]], *, channel_index: Optional[int] = None,
+               ctype: Any = None, capacity: Optional[int] = None, **kwargs: Any) -> Future:
+        """
+        提交一个查询，返回 Future（结果为 structured ndarray）
+
+        query: 查询接口名（如 "query_stk_holding"）或绑定方法
+        channel_index: 指定 channels 中的通道，默认取排队最少的通道
+        ctype: 结果结构体类型（默认按回报推断，只影响空结果的 dtype）
+        kwargs: 透传给查询接口的参数（qry_filter、security_list 等）
+        """
+        method = getattr(self.api, query) if isinstance(query, str) else query
+        with self._lock:
+            index = self._pick() if channel_index is None else channel_index
+            self._pending[index] += 1
+
+        channel = self._channels[index]
+        rows = capacity or self.capacity
+
+        def run() -> np.ndarray:
+            sink = RowCollector(ctype, rows)
+            if channel is not None:
+                kwargs["channel"] = channel
+            ret = method(user_info=sink, **kwargs)
+            if ret is None or ret < 0:
+                raise RuntimeError(f"{getattr(method, '__name__', method)} 查询失败: {ret}")
+            if sink.count and not sink.is_end:
+                raise RuntimeError(f"{getattr(method, '__name__', method)} 查询未收到结束标志 (已收到 {sink.count} 条)")
+            return sink.result()
+
+        future = self._workers[index].submit(run)
+        future.add_done_callback(lambda _: self._done(index))
+        return future
+
+    def query(self, query: Union[str, Callable[..., int]], **kwargs: Any) -> np.ndarray:
+        """同步查询"""
+        return self.submit(query, **kwargs).result()
+
+    async def query_async(self, query: Union[str, Callable[..., int]], **kwargs: Any) -> np.ndarray:
+        """在事件循环中等待查询结果"""
+        return await asyncio.wrap_future(self.submit(query, **kwargs))
+
+    def close(self, wait: bool = True) -> None:
+        for worker in self._workers:
+            worker.shutdown(wait=wait)
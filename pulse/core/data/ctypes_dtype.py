@@ -0,0 +1,169 @@
+# core/data/ctypes_dtype.py
+# -*- coding: utf-8 -*-
+"""
+ctypes_dtype.py —— ctypes 结构体 → NumPy structured dtype
+--------------------------------------------
+• ctypes_to_dtype(cls) 按 _fields_ 的偏移量/大小推导出内存布局完全一致的 dtype
+  （嵌套结构体、联合体、匿名联合体、数组、c_char 数组均支持）
+• frombuffer() / structs_to_array() 把成批的记录直接视为 ndarray，不逐字段访问
+• to_dataframe() 把嵌套字段展开成 "stock.BidLevels[0].Price" 形式的列
+"""
+from __future__ import annotations
+import ctypes
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_SIGNED = {1: "i1", 2: "i2", 4: "i4", 8: "i8"}
+_UNSIGNED = {1: "u1", 2: "u2", 4: "u4", 8: "u8"}
+
+
+def _scalar_dtype(ctype: Any) -> np.dtype:
+    """基础类型（整数/浮点/字符/指针）对应的 dtype，字节序为本机字节序"""
+    size = ctypes.sizeof(ctype)
+    if issubclass(ctype, (ctypes._Pointer, ctypes._CFuncPtr)):
+        return np.dtype(_UNSIGNED[size])
+
+    code = getattr(ctype, "_type_", None)
+    if code == "c":
+        return np.dtype("S1")
+    if code in ("f", "d", "g"):
+        return np.dtype(f"f{size}")
+    if code == "?":
+        return np.dtype("?")
+    if code in ("P", "z", "Z"):
+        # c_void_p / c_char_p / c_wchar_p 按地址值处理
+        return np.dtype(_UNSIGNED[size])
+    if isinstance(code, str):
+        return np.dtype(_SIGNED[size] if code.islower() else _UNSIGNED[size])
+    raise TypeError(f"不支持的 ctypes 类型: {ctype!r}")
+
+
+@lru_cache(maxsize=None)
+def ctypes_to_dtype(ctype: Any) -> np.dtype:
+    """
+    推导与 ctypes 类型内存布局一致的 NumPy dtype。
+
+    • Structure/Union 使用显式偏移量和 itemsize，因此对齐填充与 C 完全一致；
+      联合体成员在 dtype 中相互重叠（偏移量均为 0）
+    • 匿名成员（_anonymous_）展开到上一层，与 ctypes 的属性访问方式一致
+    • 以 "__" 开头的保留字段（__reserve/__filler 等）不输出
+    • c_char 数组 → "S{n}"，其他数组 → 子数组 dtype
+    """
+    if issubclass(ctype, ctypes.Array):
+        if getattr(ctype._type_, "_type_", None) == "c":
+            return np.dtype(f"S{ctype._length_}")
+        return np.dtype((ctypes_to_dtype(ctype._type_), (ctype._length_,)))
+
+    if not issubclass(ctype, (ctypes.Structure, ctypes.Union)):
+        return _scalar_dtype(ctype)
+
+    names: List[str] = []
+    formats: List[np.dtype] = []
+    offsets: List[int] = []
+    for name, sub_dtype, offset in _iter_fields(ctype):
+        if name in names:
+            raise TypeError(f"{ctype.__name__} 中字段重名: {name}")
+        names.append(name)
+        formats.append(sub_dtype)
+        offsets.append(offset)
+
+    return np.dtype({
+        "names": names,
+        "formats": formats,
+        "offsets": offsets,
+        "itemsize": ctypes.sizeof(ctype),
+    })
+
+
+def _iter_fields(ctype: Any, base: int = 0) -> Iterable[Tuple[str, np.dtype, int]]:
+    anonymous = getattr(ctype, "_anonymous_", ())
+    for field in ctype._fields_:
+        if len(field) > 2:
+            raise TypeError(f"不支持位域字段: {ctype.__name__}.{field[0]}")
+
+        name, field_type = field[0], field[1]
+        offset = base + getattr(ctype, name).offset
+        if name in anonymous:
+            yield from _iter_fields(field_type, offset)
+        elif not name.startswith("__"):
+            yield name, ctypes_to_dtype(field_type), offset
+
+
+def frombuffer(ctype: Any, buffer: Any, count: int = -1, offset: int = 0) -> np.ndarray:
+    """
+    把连续存放的 ctype 记录（bytes / bytearray / mmap / memoryview / ctypes 数组）
+    直接视为 structured ndarray，不复制数据
+    """
+    return np.frombuffer(buffer, dtype=ctypes_to_dtype(ctype), count=count, offset=offset)
+
+
+def structs_to_array(items: Sequence[Any], ctype: Optional[Any] = None) -> np.ndarray:
+    """
+    把一组 ctypes 结构体实例（例如查询回调中收集的记录）拼成 structured ndarray。
+    只做一次整块内存拼接，不访问任何字段。
+    """
+    if ctype is None:
+        if not items:
+            raise ValueError("items 为空时需要指定 ctype")
+        ctype = type(items[0])
+    buf = b"".join(memoryview(item).cast("B") for item in items)
+    return np.frombuffer(buf, dtype=ctypes_to_dtype(ctype))
+
+
+def flatten_fields(dtype: np.dtype, prefix: str = "") -> List[Tuple[str, int, np.dtype]]:
+    """
+    展开嵌套 dtype，返回 [(列名, 记录内偏移量, 标量 dtype)]；
+    子数组逐元素展开为 "BidLevels[0].Price" 形式的列名
+    """
+    out: List[Tuple[str, int, np.dtype]] = []
+    if dtype.names is None:
+        if dtype.subdtype is None:
+            out.append((prefix, 0, dtype))
+            return out
+        base, shape = dtype.subdtype
+        for index in np.ndindex(*shape):
+            suffix = "".join(f"[{i}]" for i in index)
+            flat = int(np.ravel_multi_index(index, shape))
+            for name, offset, leaf in flatten_fields(base, ""):
+                col = f"{prefix}{suffix}" + (f".{name}" if name else "")
+                out.append((col, flat * base.itemsize + offset, leaf))
+        return out
+
+    for name in dtype.names:
+        sub, offset = dtype.fields[name][:2]
+        for col, sub_offset, leaf in flatten_fields(sub, f"{prefix}.{name}" if prefix else name):
+            out.append((col, offset + sub_offset, leaf))
+    return out
+
+
+def column_views(arr: np.ndarray, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    按 flatten_fields 的列名返回各列的跨步视图（零拷贝）。
+    columns 为空时返回全部列；含联合体的结构体（如 MdsMktDataSnapshotT）建议只取需要的列。
+    """
+    fields = flatten_fields(arr.dtype)
+    if columns is not None:
+        wanted = set(columns)
+        fields = [f for f in fields if f[0] in wanted]
+        missing = wanted - {f[0] for f in fields}
+        if missing:
+            raise KeyError(f"{arr.dtype} 中不存在的列: {sorted(missing)}")
+
+    base = np.ascontiguousarray(arr).reshape(-1)
+    if not len(base):
+        # 空缓冲区上带偏移量的视图会越界，直接给出零长度的列
+        return {name: np.empty(0, dtype=leaf) for name, _, leaf in fields}
+    return {
+        name: np.ndarray(shape=base.shape, dtype=leaf, buffer=base,
+                         offset=offset, strides=(base.dtype.itemsize,))
+        for name, offset, leaf in fields
+    }
+
+
+def to_dataframe(arr: np.ndarray, columns: Optional[Sequence[str]] = None):
+    """structured ndarray → pandas.DataFrame（按列整块转换）"""
+    import pandas as pd
+
+    return pd.DataFrame(column_views(arr, columns))
@@ -0,0 +1,220 @@
+# core/data/static_info_cache.py
+# -*- coding: utf-8 -*-
+"""
+static_info_cache.py —— 按交易日缓存的证券静态信息
+--------------------------------------------
+• 每个交易日查询一次 MDS 证券静态信息和 OES 现货 / 发行 / ETF 产品信息，
+  按列写入 <cache_dir>/<YYYYMMDD>/<表名>.col，之后的进程启动直接 mmap 打开，不再走网络
+• 查询结果经 bulk_query.RowCollector 直接按原始内存拷贝进预分配的 ndarray，不逐字段访问
+• 按 securityId（可选加市场）建立的索引在首次查找时才构建
+• ensure() 发现交易日变化时只刷新一次，旧交易日目录按 keep_days 清理
+"""
+from __future__ import annotations
+import datetime
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from vendor.quote_api import MdsStockStaticInfoT
+from vendor.trade_api import OesStockItemT, OesIssueItemT, OesEtfItemT
+
+from .bulk_query import RowCollector
+from .ctypes_dtype import column_views
+
+_MAGIC = b"PLSCOL01"
+_HEADER = struct.Struct("<8sI")         # magic, JSON 头长度
+_ALIGN = 64
+
+# 表名 → (结构体, 市场字段, 查询函数(cache) -> 返回值)
+# exchId(MDS) 与 mktId(OES) 的沪 / 深 A 股取值相同: 1=上海, 2=深圳
+_TABLES: Dict[str, Tuple[Any, str, Callable[["StaticInfoCache", Any], int]]] = {
+    "mds_stock": (MdsStockStaticInfoT, "exchId",
+                  lambda c, sink: c.mds_api.query_stock_static_info_list(user_info=sink)),
+    "oes_stock": (OesStockItemT, "mktId",
+                  lambda c, sink: c.oes_api.query_stock(user_info=sink)),
+    "oes_issue": (OesIssueItemT, "mktId",
+                  lambda c, sink: c.oes_api.query_issue(user_info=sink)),
+    "oes_etf": (OesEtfItemT, "mktId",
+                lambda c, sink: c.oes_api.query_etf(user_info=sink)),
+}
+
+
+# ---------- 列式文件 ----------
+def write_columns(path: str, columns: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+    """
+    各列按 64 字节对齐依次写入，JSON 头记录 [列名, dtype, 偏移量]；
+    先写临时文件再原子替换，其他进程不会读到半个文件
+    """
+    rows = len(next(iter(columns.values()))) if columns else 0
+    layout: List[List[Any]] = []
+    offset = 0
+    for name, col in columns.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout.append([name, col.dtype.str, offset])
+        offset += col.dtype.itemsize * rows
+
+    header = json.dumps({"rows": rows, "columns": layout, "meta": meta or {}}).encode()
+    data_start = -(-(_HEADER.size + len(header)) // _ALIGN) * _ALIGN
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(header)))
+        f.write(header)
+        for (name, _, col_offset), col in zip(layout, columns.values()):
+            f.seek(data_start + col_offset)
+            f.write(np.ascontiguousarray(col).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def open_columns(path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """mmap 打开 write_columns 写出的文件，返回 ({列名: 只读视图}, meta)"""
+    with open(path, "rb") as f:
+        magic, header_len = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"不是列式缓存文件: {path}")
+        header = json.loads(f.read(header_len))
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_start = -(-(_HEADER.size + header_len) // _ALIGN) * _ALIGN
+    rows = header["rows"]
+    if not rows:
+        # 空表（如当天没有新股发行）：文件只有头部，各列为零长度数组
+        return {name: np.empty(0, dtype=np.dtype(dt)) for name, dt, _ in header["columns"]}, header["meta"]
+    columns = {
+        name: np.ndarray(shape=(rows,), dtype=np.dtype(dt), buffer=mm, offset=data_start + off)
+        for name, dt, off in header["columns"]
+    }
+    return columns, header["meta"]
+
+
+class StaticInfoCache:
+    """
+    证券静态信息的交易日缓存
+
+        cache = StaticInfoCache("~/.pulse/static", mds_api=mds_api, oes_api=oes_api)
+        cache.ensure()                                  # 启动 / 重连后调用
+        row = cache.lookup("oes_stock", "600000", 1)    # → {"securityId": b"600000", ...}
+        ticks = cache.column("mds_stock", "priceTick")  # 整列（mmap 只读视图）
+
+    只提供 mds_api 或 oes_api 时只缓存对应的表；两者都不提供时只能读取已有缓存。
+    """
+
+    TABLES = tuple(_TABLES)
+
+    def __init__(self, cache_dir: str, mds_api: Any = None, oes_api: Any = None, keep_days: int = 5) -> None:
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.mds_api = mds_api
+        self.oes_api = oes_api
+        self.keep_days = keep_days
+
+        self.trading_day = 0
+        self._tables: Dict[str, Dict[str, np.ndarray]] = {}
+        self._indexes: Dict[str, Dict[Any, int]] = {}
+        self._lock = threading.RLock()
+
+    # ---------- 交易日 ----------
+    def current_trading_day(self) -> int:
+        """OES 的当前交易日，没有 OES 连接时取本地日期"""
+        if self.oes_api is not None:
+            day = self.oes_api.get_trading_day()
+            if day and day > 0:
+                return day
+        return int(datetime.date.today().strftime("%Y%m%d"))
+
+    def ensure(self, trading_day: Optional[int] = None) -> int:
+        """保证已加载指定（默认当前）交易日的缓存；交易日没变时直接返回"""
+        day = trading_day or self.current_trading_day()
+        with self._lock:
+            if day != self.trading_day:
+                self._load_day(day, refresh=False)
+        return day
+
+    def refresh(self) -> None:
+        """强制重新查询当前交易日的全部表（如盘中新增证券）"""
+        with self._lock:
+            self._load_day(self.trading_day or self.current_trading_day(), refresh=True)
+
+    def _day_dir(self, day: int) -> str:
+        return os.path.join(self.cache_dir, str(day))
+
+    def _load_day(self, day: int, refresh: bool) -> None:
+        day_dir = self._day_dir(day)
+        os.makedirs(day_dir, exist_ok=True)
+
+        tables: Dict[str, Dict[str, np.ndarray]] = {}
+        for name, (ctype, _, query) in _TABLES.items():
+            path = os.path.join(day_dir, f"{name}.col")
+            api = self.mds_api if name.startswith("mds_") else self.oes_api
+            if api is not None and (refresh or not os.path.exists(path)):
+                sink = RowCollector(ctype, 4096)
+                ret = query(self, sink)
+                if ret is None or ret < 0:
+                    raise RuntimeError(f"查询 {name} 失败: {ret}")
+                # 查询结果为空时写出零长度的列（dtype 来自 ctype），表仍然存在
+                write_columns(path, column_views(sink.result()), {"trading_day": day, "struct": ctype.__name__})
+            if os.path.exists(path):
+                tables[name], _ = open_columns(path)
+
+        self._tables = tables
+        self._indexes = {}
+        self.trading_day = day
+        self._prune(day)
+
+    def _prune(self, day: int) -> None:
+        if not self.keep_days:
+            return
+        days = sorted(d for d in os.listdir(self.cache_dir) if d.isdigit() and int(d) <= day)
+        for old in days[:-self.keep_days]:
+            shutil.rmtree(os.path.join(self.cache_dir, old), ignore_errors=True)
+
+    # ---------- 查找 ----------
+    def has_table(self, table: str) -> bool:
+        return table in self._tables
+
+    def columns(self, table: str) -> Dict[str, np.ndarray]:
+        """整张表 {列名: 数组}（列名同 column_views，例如 "securityId"、"priceTick"）"""
+        try:
+            return self._tables[table]
+        except KeyError:
+            raise KeyError(f"未加载的静态信息表: {table}（先调用 ensure()）") from None
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        return self.columns(table)[name]
+
+    def _index(self, table: str) -> Dict[Any, int]:
+        index = self._indexes.get(table)
+        if index is None:
+            cols = self.columns(table)
+            codes = cols["securityId"].tolist()
+            markets = cols[_TABLES[table][1]].tolist()
+            index = {}
+            # 倒序写入，同一代码在两个市场都有时不带市场的查找取第一条
+            for row in range(len(codes) - 1, -1, -1):
+                index[(codes[row], markets[row])] = row
+                index[codes[row]] = row
+            self._indexes[table] = index
+        return index
+
+    def row_of(self, table: str, security_id: Union[str, bytes, int], market: Optional[int] = None) -> int:
+        """证券代码 → 行号，不存在时返回 -1；整数代码（instrId）按 6 位补零"""
+        if isinstance(security_id, int):
+            security_id = f"{security_id:06d}"
+        if isinstance(security_id, str):
+            security_id = security_id.encode()
+        key = security_id if market is None else (security_id, market)
+        return self._index(table).get(key, -1)
+
+    def lookup(self, table: str, security_id: Union[str, bytes, int],
+               market: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """单只证券的整行 {列名: 值}，不存在时返回 None"""
+        row = self.row_of(table, security_id, market)
+        if row < 0:
+            return None
+        return {name: col[row].item() for name, col in self.columns(table).items()}
@@ -0,0 +1,335 @@
+# core/order_management/account_cache.py
+# -*- coding: utf-8 -*-
+"""
+account_cache.py —— 由 OES 回报维护的资金 / 持仓缓存
+--------------------------------------------
+• bootstrap() 经 BulkQuery 并发批量查询一次资金和持仓，之后不再轮询柜台
+• 之后只由回报增量维护：资金 / 持仓变动回报整条覆盖；成交回报先按成交数量 / 金额
+  增量调整，等随后的资金 / 持仓变动回报到达后以柜台数据为准（同一回报通道内成交回报
+  先于其引起的资金 / 持仓变动回报）；成交按 (mktId, exchTrdNum, trdSide) 去重
+• 读取不加锁：Position / Cash 是不可变的 NamedTuple，更新时整条替换；
+  全局 version 每次更新递增，snapshot() 按顺序锁（seqlock）方式重试得到一致的快照
+• verify() 重新查询一次柜台并与缓存比对（查询期间被回报更新过的条目跳过），
+  start_reconcile() 在后台线程中定期执行
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pulse.core.utils.logger import get_logger
+
+_LOG = get_logger("AccountCache")
+
+# eOesBuySellTypeT
+BS_TYPE_BUY = 1
+BS_TYPE_SELL = 2
+
+
+class Position(NamedTuple):
+    """单只证券持仓（数量单位为股，价格为 元 × 10000）"""
+    symbol: str
+    mkt_id: int
+    sum_hld: int                # 总持仓
+    sell_avl_hld: int           # 可卖持仓
+    original_hld: int           # 日初持仓
+    total_buy_hld: int          # 日中累计买入
+    total_sell_hld: int         # 日中累计卖出
+    cost_price: int             # 持仓成本价
+    version: int                # 最后一次更新时的全局版本号
+
+
+class Cash(NamedTuple):
+    """资金（单位: 元 × 10000）"""
+    cash_acct_id: str
+    available: int              # 当前可用余额
+    total: int                  # 当前余额
+    drawable: int               # 当前可取余额
+    buy_frz_amt: int            # 交易冻结
+    total_buy_amt: int          # 日中累计买入金额
+    total_sell_amt: int         # 日中累计卖出金额
+    total_fee_amt: int          # 日中累计费用
+    version: int
+
+
+class AccountSnapshot(NamedTuple):
+    version: int
+    cash: Optional[Cash]
+    positions: Dict[str, Position]
+
+
+# (类别, 证券代码 / 资金账户, 字段, 缓存值, 柜台值)
+Mismatch = Tuple[str, str, str, int, int]
+
+_POSITION_CHECKED = ("sum_hld", "sell_avl_hld")
+_CASH_CHECKED = ("available", "total")
+
+
+def _text(v: Any) -> str:
+    return v.decode() if isinstance(v, (bytes, bytearray)) else str(v)
+
+
+def _position(b: Any, version: int) -> Position:
+    # b: OesStkHoldingReportT / OesStkHoldingItemT 或同字段的 ndarray 记录
+    return Position(_text(_get(b, "securityId")), int(_get(b, "mktId")),
+                    int(_get(b, "sumHld")), int(_get(b, "sellAvlHld")), int(_get(b, "originalHld")), int(_get(b, "totalBuyHld")), int(_get(b, "totalSellHld")),
+                    int(_get(b, "costPrice")), version)
+
+
+def _cash(b: Any, version: int) -> Cash:
+    # b: OesCashAssetReportT / OesCashAssetItemT 或同字段的 ndarray 记录
+    return Cash(_text(_get(b, "cashAcctId")), int(_get(b, "currentAvailableBal")), int(_get(b, "currentTotalBal")),
+                int(_get(b, "currentDrawableBal")), int(_get(b, "buyFrzAmt")), int(_get(b, "totalBuyAmt")),
+                int(_get(b, "totalSellAmt")), int(_get(b, "totalFeeAmt")), version)
+
+
+def _is_record(b: Any) -> bool:
+    return hasattr(b, "dtype")
+
+
+def _get(b: Any, name: str) -> Any:
+    return b[name] if _is_record(b) else getattr(b, name)
+
+
+class AccountCache:
+    """
+    资金 / 持仓缓存
+
+        cache = AccountCache()
+        spi = OesSpiLite(on_any=cache.on_report)
+        ...                                            # 注册 SPI、启动 OES 客户端
+        cache.bootstrap(BulkQuery(oes_api))            # 一次批量查询
+        cache.position("600000").sell_avl_hld          # 无锁读取
+        cache.start_reconcile(bulk, interval=60)       # 可选：后台定期与柜台比对
+    """
+
+    def __init__(self, on_mismatch: Optional[Callable[[List[Mismatch]], Any]] = None) -> None:
+        """
+        Args:
+            on_mismatch: verify() 发现不一致时调用（参数为不一致列表）
+        """
+        self.on_mismatch = on_mismatch
+        self._positions: Dict[str, Position] = {}
+        self._cash: Optional[Cash] = None
+        self._version = 0                       # 奇数表示正在写入
+        self._lock = threading.Lock()           # 只在写入方之间互斥
+        self._trades: set = set()
+        self.ready = threading.Event()
+        self.duplicate_trades = 0
+        self._reconcile_stop: Optional[threading.Event] = None
+        self._reconcile_thread: Optional[threading.Thread] = None
+
+    # ---------- 写入（回报线程 / 查询线程） ----------
+    def _begin(self) -> int:
+        self._version += 1
+        return self._version + 1
+
+    def _end(self) -> None:
+        self._version += 1
+
+    def load(self, cash_rows: Any, holding_rows: Any) -> None:
+        """用一次查询的结果整体替换缓存（OesCashAssetItemT / OesStkHoldingItemT 的 ndarray 或结构体序列）"""
+        with self._lock:
+            v = self._begin()
+            try:
+                self._positions = {p.symbol: p for p in (_position(r, v) for r in holding_rows)}
+                self._cash = _cash(cash_rows[0], v) if len(cash_rows) else None
+            finally:
+                self._end()
+        self.ready.set()
+
+    def bootstrap(self, bulk: Any, cash_filter: Any = None, holding_filter: Any = None) -> AccountSnapshot:
+        """
+        经 BulkQuery 并发查询资金和持仓并载入缓存
+
+        应在回报通道订阅之后调用：查询期间到达的回报会先写入，随后被查询结果覆盖，
+        而查询结果已包含这些回报的影响
+        """
+        cash_rows, holding_rows = self._query(bulk, cash_filter, holding_filter)
+        self.load(cash_rows, holding_rows)
+        return self.snapshot()
+
+    @staticmethod
+    def _query(bulk: Any, cash_filter: Any, holding_filter: Any) -> Tuple[Any, Any]:
+        fut_cash = bulk.submit("query_cash_asset", qry_filter=cash_filter)
+        fut_hld = bulk.submit("query_stk_holding", qry_filter=holding_filter)
+        return fut_cash.result(), fut_hld.result()
+
+    def on_stock_holding_variation(self, b: Any) -> None:
+        """OesStkHoldingReportT：整条覆盖（丢弃之前由成交回报做的增量调整）"""
+        with self._lock:
+            v = self._begin()
+            try:
+                p = _position(b, v)
+                self._positions[p.symbol] = p
+            finally:
+                self._end()
+
+    def on_cash_asset_variation(self, b: Any) -> None:
+        """OesCashAssetReportT：整条覆盖"""
+        with self._lock:
+            v = self._begin()
+            try:
+                self._cash = _cash(b, v)
+            finally:
+                self._end()
+
+    def on_trade_report(self, b: Any) -> None:
+        """OesTrdCnfmT：在资金 / 持仓变动回报到达之前先按成交增量调整"""
+        side = b.trdSide
+        if side not in (BS_TYPE_BUY, BS_TYPE_SELL):
+            return
+        key = (b.mktId, b.exchTrdNum, side)
+        symbol = _text(b.securityId)
+        qty, amt, fee = b.trdQty, b.trdAmt, b.trdFee
+        with self._lock:
+            if key in self._trades:
+                self.duplicate_trades += 1
+                return
+            self._trades.add(key)
+            v = self._begin()
+            try:
+                p = self._positions.get(symbol)
+                if p is None:
+                    p = Position(symbol, b.mktId, 0, 0, 0, 0, 0, 0, v)
+                c = self._cash
+                if side == BS_TYPE_BUY:
+                    # 买入当日不可卖；资金在委托时已冻结，成交时由冻结转为支出
+                    self._positions[symbol] = p._replace(
+                        sum_hld=p.sum_hld + qty, total_buy_hld=p.total_buy_hld + qty, version=v)
+                    if c is not None:
+                        self._cash = c._replace(
+                            total=c.total - amt - fee, buy_frz_amt=max(0, c.buy_frz_amt - amt),
+                            total_buy_amt=c.total_buy_amt + amt, total_fee_amt=c.total_fee_amt + fee, version=v)
+                else:
+                    # 可卖持仓在委托时已冻结；卖出所得当日可用
+                    self._positions[symbol] = p._replace(
+                        sum_hld=p.sum_hld - qty, total_sell_hld=p.total_sell_hld + qty, version=v)
+                    if c is not None:
+                        self._cash = c._replace(
+                            available=c.available + amt - fee, total=c.total + amt - fee,
+                            total_sell_amt=c.total_sell_amt + amt, total_fee_amt=c.total_fee_amt + fee, version=v)
+            finally:
+                self._end()
+
+    def on_report(self, body: Any) -> None:
+        """可直接作为 OesSpiLite(on_any=...) 使用：按回报体类型分派，其余回报忽略"""
+        if hasattr(body, "currentAvailableBal"):
+            self.on_cash_asset_variation(body)
+        elif hasattr(body, "sellAvlHld"):
+            self.on_stock_holding_variation(body)
+        elif hasattr(body, "trdQty") and hasattr(body, "exchTrdNum"):
+            self.on_trade_report(body)
+
+    # ---------- 读取（无锁） ----------
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def cash(self) -> Optional[Cash]:
+        return self._cash
+
+    def position(self, symbol: str) -> Optional[Position]:
+        return self._positions.get(symbol)
+
+    def sellable(self, symbol: str) -> int:
+        p = self._positions.get(symbol)
+        return p.sell_avl_hld if p is not None else 0
+
+    def snapshot(self) -> AccountSnapshot:
+        """一致的快照：读取期间若有写入则重试"""
+        while True:
+            v = self._version
+            if v & 1:
+                time.sleep(0)           # 写入进行中，让出 GIL 给写线程
+                continue
+            positions = dict(self._positions)
+            cash = self._cash
+            if self._version == v:
+                return AccountSnapshot(v, cash, positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._positions
+
+    # ---------- 与柜台比对 ----------
+    def verify(self, bulk: Any, repair: bool = True) -> List[Mismatch]:
+        """
+        重新查询资金和持仓并与缓存比对，返回不一致的条目
+
+        Args:
+            bulk: BulkQuery
+            repair: 是否用查询结果修正不一致的条目
+
+        查询开始之后被回报更新过的条目无法判断先后，跳过比对
+        """
+        v0 = self._version
+        cash_rows, holding_rows = self._query(bulk, None, None)
+        mismatches: List[Mismatch] = []
+        with self._lock:
+            v = self._begin()
+            try:
+                # 持仓
+                seen = set()
+                for r in holding_rows:
+                    actual = _position(r, v)
+                    seen.add(actual.symbol)
+                    cached = self._positions.get(actual.symbol)
+                    if cached is not None and cached.version > v0:
+                        continue
+                    diff = [(f, getattr(cached, f) if cached else 0, getattr(actual, f)) for f in _POSITION_CHECKED
+                            if (getattr(cached, f) if cached else 0) != getattr(actual, f)]
+                    if diff:
+                        mismatches.extend(("position", actual.symbol, f, c, a) for f, c, a in diff)
+                        if repair:
+                            self._positions[actual.symbol] = actual
+                for symbol, cached in list(self._positions.items()):
+                    if symbol in seen or cached.version > v0 or not cached.sum_hld:
+                        continue
+                    mismatches.append(("position", symbol, "sum_hld", cached.sum_hld, 0))
+                    if repair:
+                        del self._positions[symbol]
+                # 资金
+                if len(cash_rows):
+                    actual_cash = _cash(cash_rows[0], v)
+                    cached_cash = self._cash
+                    if cached_cash is None or cached_cash.version <= v0:
+                        diff = [(f, getattr(cached_cash, f) if cached_cash else 0, getattr(actual_cash, f))
+                                for f in _CASH_CHECKED
+                                if (getattr(cached_cash, f) if cached_cash else 0) != getattr(actual_cash, f)]
+                        if diff:
+                            mismatches.extend(("cash", actual_cash.cash_acct_id, f, c, a) for f, c, a in diff)
+                            if repair:
+                                self._cash = actual_cash
+            finally:
+                self._end()
+
+        if mismatches and self.on_mismatch is not None:
+            self.on_mismatch(mismatches)
+        return mismatches
+
+    def start_reconcile(self, bulk: Any, interval: float = 60.0, repair: bool = True) -> None:
+        """后台线程每 interval 秒执行一次 verify()"""
+        if self._reconcile_thread is not None:
+            return
+        stop = self._reconcile_stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.verify(bulk, repair)
+                except Exception:               # 查询失败时等下一轮
+                    _LOG.exception("❌ 资金 / 持仓对账失败")
+
+        self._reconcile_thread = threading.Thread(target=run, name="AccountReconcile", daemon=True)
+        self._reconcile_thread.start()
+
+    def stop_reconcile(self, timeout: Optional[float] = None) -> None:
+        if self._reconcile_thread is None:
+            return
+        self._reconcile_stop.set()
+        self._reconcile_thread.join(timeout)
+        self._reconcile_thread = None
@@ -0,0 +1,294 @@
+# core/order_management/order_store.py
+# -*- coding: utf-8 -*-
+"""
+order_store.py —— 由 OES 回报驱动的委托状态表
+--------------------------------------------
+• 委托记录用 __slots__ 保存，按 (clEnvId, clSeqNo) 定位，另有 clOrdId 索引
+• 由 on_order_insert / on_order_report / on_trade_report / on_order_reject 更新
+  累计成交数量 / 金额 / 费用、撤单数量和当前状态；回报乱序时累计值只增不减，终结状态不回退
+• 按证券代码索引未结委托：open_orders("600000") / has_open() 都是 O(1)
+• 终结委托先留在最近 keep_closed 条里，超出后压缩成定长二进制行写入归档，仍可按单号查询
+"""
+from __future__ import annotations
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# eOesOrdStatusT
+ORD_STATUS_PENDING = 0
+ORD_STATUS_FINAL_MIN = 4                # 大于该值的均为终结状态
+ORD_STATUS_INVALID_OES = 11             # OES 内部废单（on_order_reject 的委托记为该状态）
+BS_TYPE_CANCEL = 30                     # 撤单请求：只按单号跟踪，不计入证券的未结委托
+
+OrderKey = Tuple[int, int]              # (clEnvId, clSeqNo)
+
+# 归档行: clEnvId clSeqNo clOrdId mktId bsType ordType ordStatus securityId
+#        ordQty ordPrice cumQty canceledQty cumAmt cumFee rejReason
+_ARCHIVE_ROW = struct.Struct("<biqBBBB16siiiiqqi")
+
+
+def _sym(b: Any) -> str:
+    sid = getattr(b, "securityId", b"")
+    return sid.decode() if isinstance(sid, (bytes, bytearray)) else str(sid)
+
+
+def is_final_status(status: int) -> bool:
+    return status > ORD_STATUS_FINAL_MIN
+
+
+class OrderRecord:
+    """单笔委托的当前状态（价格、金额单位同 OES: 1 元 = 10000）"""
+
+    __slots__ = (
+        "env_id", "cl_seq_no", "cl_ord_id", "security_id", "mkt_id", "bs_type", "ord_type",
+        "ord_qty", "ord_price", "status", "cum_qty", "cum_amt", "cum_fee", "canceled_qty", "rej_reason",
+    )
+
+    def __init__(self, env_id: int, cl_seq_no: int, security_id: str = "", mkt_id: int = 0,
+                 bs_type: int = 0, ord_type: int = 0, ord_qty: int = 0, ord_price: int = 0) -> None:
+        self.env_id = env_id
+        self.cl_seq_no = cl_seq_no
+        self.cl_ord_id = 0
+        self.security_id = security_id
+        self.mkt_id = mkt_id
+        self.bs_type = bs_type
+        self.ord_type = ord_type
+        self.ord_qty = ord_qty
+        self.ord_price = ord_price
+        self.status = ORD_STATUS_PENDING
+        self.cum_qty = 0
+        self.cum_amt = 0
+        self.cum_fee = 0
+        self.canceled_qty = 0
+        self.rej_reason = 0
+
+    @property
+    def key(self) -> OrderKey:
+        return self.env_id, self.cl_seq_no
+
+    @property
+    def is_open(self) -> bool:
+        return self.status <= ORD_STATUS_FINAL_MIN
+
+    @property
+    def leaves_qty(self) -> int:
+        """剩余未成交数量（终结委托为 0）"""
+        return max(self.ord_qty - self.cum_qty - self.canceled_qty, 0) if self.is_open else 0
+
+    def to_row(self) -> bytes:
+        return _ARCHIVE_ROW.pack(
+            self.env_id, self.cl_seq_no, self.cl_ord_id, self.mkt_id, self.bs_type, self.ord_type,
+            self.status, self.security_id.encode(), self.ord_qty, self.ord_price, self.cum_qty,
+            self.canceled_qty, self.cum_amt, self.cum_fee, self.rej_reason)
+
+    @classmethod
+    def from_row(cls, buf: Any, offset: int = 0) -> "OrderRecord":
+        (env_id, cl_seq_no, cl_ord_id, mkt_id, bs_type, ord_type, status, sid, ord_qty, ord_price,
+         cum_qty, canceled_qty, cum_amt, cum_fee, rej_reason) = _ARCHIVE_ROW.unpack_from(buf, offset)
+        rec = cls(env_id, cl_seq_no, sid.rstrip(b"\0").decode(), mkt_id, bs_type, ord_type, ord_qty, ord_price)
+        rec.cl_ord_id = cl_ord_id
+        rec.status = status
+        rec.cum_qty = cum_qty
+        rec.cum_amt = cum_amt
+        rec.cum_fee = cum_fee
+        rec.canceled_qty = canceled_qty
+        rec.rej_reason = rej_reason
+        return rec
+
+    def __repr__(self) -> str:
+        return (f"OrderRecord({self.env_id}:{self.cl_seq_no} {self.security_id} bs={self.bs_type} "
+                f"qty={self.ord_qty} px={self.ord_price} status={self.status} cum={self.cum_qty})")
+
+
+class OrderStore:
+    """
+    委托状态表（回报线程写，策略线程读）
+
+        store = OrderStore()
+        spi = OesSpiLite(order_store=store)
+        store.open_orders("600000")       # 该证券全部未结委托
+        store.fill(seq)                   # (累计成交数量, 累计成交金额, 状态)
+
+    - 写入和多步查询在同一把锁下进行，单次回报更新只做几次字典操作；
+    - 每个环境号各自编号，单号查询缺省 clEnvId=0 时请传入 env_id。
+    """
+
+    def __init__(self, keep_closed: int = 1024) -> None:
+        """
+        Args:
+            keep_closed: 保留完整记录的最近终结委托数，更早的压缩进归档
+        """
+        if keep_closed < 0:
+            raise ValueError(f"keep_closed 不能为负数: {keep_closed}")
+        self.keep_closed = keep_closed
+        self._lock = threading.Lock()
+        self._open: Dict[OrderKey, OrderRecord] = {}
+        self._open_by_sym: Dict[str, Dict[OrderKey, OrderRecord]] = {}
+        self._closed: "OrderedDict[OrderKey, OrderRecord]" = OrderedDict()
+        self._by_cl_ord_id: Dict[int, OrderKey] = {}
+        self._archive = bytearray()
+        self._archive_rows: Dict[OrderKey, int] = {}
+
+    # ---------- 回报更新 ----------
+    def _upsert(self, b: Any) -> OrderRecord:
+        key = (getattr(b, "clEnvId", 0), b.clSeqNo)
+        rec = self._open.get(key) or self._closed.get(key)
+        if rec is None:
+            rec = OrderRecord(key[0], key[1], _sym(b), getattr(b, "mktId", 0), getattr(b, "bsType", 0),
+                              getattr(b, "ordType", 0), getattr(b, "ordQty", 0), getattr(b, "ordPrice", 0))
+            self._track(rec)
+        return rec
+
+    def _track(self, rec: OrderRecord) -> None:
+        key = rec.key
+        if key in self._archive_rows:
+            return                  # 已归档委托的迟到回报：不再进入未结表
+        self._open[key] = rec
+        if rec.bs_type != BS_TYPE_CANCEL:
+            self._open_by_sym.setdefault(rec.security_id, {})[key] = rec
+
+    def _set_status(self, rec: OrderRecord, status: int) -> None:
+        if not rec.is_open or status < rec.status and status <= ORD_STATUS_FINAL_MIN:
+            return
+        rec.status = status
+        if is_final_status(status):
+            self._close(rec)
+
+    def _close(self, rec: OrderRecord) -> None:
+        key = rec.key
+        if self._open.pop(key, None) is None:
+            return
+        by_sym = self._open_by_sym.get(rec.security_id)
+        if by_sym is not None:
+            by_sym.pop(key, None)
+            if not by_sym:
+                del self._open_by_sym[rec.security_id]
+        self._closed[key] = rec
+        while len(self._closed) > self.keep_closed:
+            old_key, old = self._closed.popitem(last=False)
+            self._archive_rows[old_key] = len(self._archive)
+            self._archive += old.to_row()
+
+    def on_order_insert(self, b: Any) -> OrderRecord:
+        """OesOrdCnfmT（委托生成）"""
+        with self._lock:
+            rec = self._upsert(b)
+            if b.clOrdId:
+                rec.cl_ord_id = b.clOrdId
+                self._by_cl_ord_id[b.clOrdId] = rec.key
+            self._set_status(rec, b.ordStatus)
+            return rec
+
+    def on_order_report(self, b: Any) -> OrderRecord:
+        """OesOrdCnfmT（委托确认 / 状态变化）"""
+        with self._lock:
+            rec = self._upsert(b)
+            if b.clOrdId and not rec.cl_ord_id:
+                rec.cl_ord_id = b.clOrdId
+                self._by_cl_ord_id[b.clOrdId] = rec.key
+            if b.cumQty > rec.cum_qty:
+                rec.cum_qty = b.cumQty
+                rec.cum_amt = b.cumAmt
+                rec.cum_fee = b.cumFee
+            if b.canceledQty > rec.canceled_qty:
+                rec.canceled_qty = b.canceledQty
+            if b.ordRejReason:
+                rec.rej_reason = b.ordRejReason
+            self._set_status(rec, b.ordStatus)
+            return rec
+
+    def on_trade_report(self, b: Any) -> OrderRecord:
+        """OesTrdCnfmT（成交回报，可能早于对应的委托确认到达）"""
+        with self._lock:
+            key = (b.clEnvId, b.clSeqNo)
+            rec = self._open.get(key) or self._closed.get(key)
+            if rec is None:
+                rec = OrderRecord(key[0], key[1], _sym(b), b.mktId, b.ordBuySellType, b.ordType,
+                                  b.origOrdQty, b.origOrdPrice)
+                self._track(rec)
+            if b.clOrdId and not rec.cl_ord_id:
+                rec.cl_ord_id = b.clOrdId
+                self._by_cl_ord_id[b.clOrdId] = key
+            if b.cumQty > rec.cum_qty:
+                rec.cum_qty = b.cumQty
+                rec.cum_amt = b.cumAmt
+                rec.cum_fee = b.cumFee
+            self._set_status(rec, b.ordStatus)
+            return rec
+
+    def on_order_reject(self, b: Any) -> OrderRecord:
+        """OesOrdRejectT（OES 业务拒绝）"""
+        with self._lock:
+            rec = self._upsert(b)
+            rec.rej_reason = b.ordRejReason
+            self._set_status(rec, ORD_STATUS_INVALID_OES)
+            return rec
+
+    # ---------- 查询 ----------
+    def get(self, cl_seq_no: int, env_id: int = 0) -> Optional[OrderRecord]:
+        """按单号查询；归档委托返回一份解压出的副本"""
+        key = (env_id, cl_seq_no)
+        with self._lock:
+            rec = self._open.get(key) or self._closed.get(key)
+            if rec is not None:
+                return rec
+            row = self._archive_rows.get(key)
+            return None if row is None else OrderRecord.from_row(self._archive, row)
+
+    def get_by_cl_ord_id(self, cl_ord_id: int) -> Optional[OrderRecord]:
+        key = self._by_cl_ord_id.get(cl_ord_id)
+        return None if key is None else self.get(key[1], key[0])
+
+    def fill(self, cl_seq_no: int, env_id: int = 0) -> Optional[Tuple[int, int, int]]:
+        """(累计成交数量, 累计成交金额, 状态)，未知单号返回 None"""
+        rec = self.get(cl_seq_no, env_id)
+        return None if rec is None else (rec.cum_qty, rec.cum_amt, rec.status)
+
+    def open_orders(self, security_id: Optional[str] = None) -> List[OrderRecord]:
+        """未结委托（可按证券代码过滤）"""
+        with self._lock:
+            if security_id is None:
+                return list(self._open.values())
+            by_sym = self._open_by_sym.get(security_id)
+            return list(by_sym.values()) if by_sym else []
+
+    def has_open(self, security_id: str) -> bool:
+        return security_id in self._open_by_sym
+
+    def open_count(self, security_id: Optional[str] = None) -> int:
+        if security_id is None:
+            return len(self._open)
+        by_sym = self._open_by_sym.get(security_id)
+        return len(by_sym) if by_sym else 0
+
+    def open_securities(self) -> List[str]:
+        with self._lock:
+            return list(self._open_by_sym)
+
+    def closed_orders(self) -> List[OrderRecord]:
+        """最近的终结委托（不含归档），按终结先后排列"""
+        with self._lock:
+            return list(self._closed.values())
+
+    def iter_archive(self) -> Iterator[OrderRecord]:
+        """逐条解压归档委托"""
+        with self._lock:
+            buf = bytes(self._archive)
+        for offset in range(0, len(buf), _ARCHIVE_ROW.size):
+            yield OrderRecord.from_row(buf, offset)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open": len(self._open),
+                "closed": len(self._closed),
+                "archived": len(self._archive_rows),
+                "archive_bytes": len(self._archive),
+            }
+
+    def __len__(self) -> int:
+        return len(self._open) + len(self._closed) + len(self._archive_rows)
+
+    def __contains__(self, key: OrderKey) -> bool:
+        return key in self._open or key in self._closed or key in self._archive_rows
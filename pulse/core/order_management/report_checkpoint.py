@@ -0,0 +1,136 @@
+# core/order_management/report_checkpoint.py
+# -*- coding: utf-8 -*-
+"""
+report_checkpoint.py —— 回报断点（最后处理的 rptSeqNum）
+--------------------------------------------
+• 按订阅的客户端环境号记录最后处理的回报编号，重连 / 重启后从断点续传，不必重放全天回报
+• 回调线程里只更新内存中的整数；后台线程每 flush_interval 秒把变化写入 mmap 文件并刷盘
+• accept() 同时做去重：编号不大于断点的回报视为重复（重连后服务端补发的部分）
+• 文件头记录交易日，跨日自动清零（回报编号按交易日重新编号）；path 为空时只在内存中保存
+"""
+from __future__ import annotations
+import datetime
+import mmap
+import os
+import struct
+import threading
+from typing import Optional
+
+_MAGIC = b"PLSRPT01"
+_HEADER = struct.Struct("<8si4x")       # magic, 交易日 YYYYMMDD
+_ENV_SLOTS = 256                        # clEnvId 为 int8，按 env & 0xFF 存放
+_FILE_SIZE = _HEADER.size + _ENV_SLOTS * 8
+
+
+def _today() -> int:
+    d = datetime.date.today()
+    return d.year * 10000 + d.month * 100 + d.day
+
+
+class ReportCheckpoint:
+    """
+    回报断点
+
+        ckpt = ReportCheckpoint("~/.pulse/rpt_ckpt.dat")
+        spi = OesSpiLite(on_any=..., checkpoint=ckpt)      # 连接时按断点同步，回调中去重
+        ...
+        ckpt.close()                                       # 退出前落盘
+
+    - 只应由各环境号的回报回调线程调用 accept()（同一环境号单线程），读取不加锁；
+    - 进程崩溃时最多丢失最近 flush_interval 秒内的断点，重连后这部分回报会被重放一次。
+    """
+
+    def __init__(self, path: Optional[str] = None, trading_day: Optional[int] = None,
+                 flush_interval: float = 0.2) -> None:
+        """
+        Args:
+            path          : 断点文件路径（不存在时创建），None 表示不落盘
+            trading_day   : 交易日 YYYYMMDD，缺省为本地日期
+            flush_interval: 后台落盘间隔（秒）
+        """
+        self.path = os.path.expanduser(path) if path else None
+        self.trading_day = trading_day or _today()
+        self.flush_interval = flush_interval
+        self.duplicates = 0
+
+        self._applied = [0] * _ENV_SLOTS
+        self._dirty = False
+        self._lock = threading.Lock()           # 只在落盘方之间互斥
+        self._mm: Optional[mmap.mmap] = None
+        self._fd = -1
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if self.path:
+            self._fd, self._mm = self._open(self.path, self.trading_day)
+            self._applied = list(memoryview(self._mm)[_HEADER.size:].cast("q"))
+            self._thread = threading.Thread(target=self._run, name="ReportCheckpoint", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _open(path: str, trading_day: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            os.write(fd, _HEADER.pack(_MAGIC, trading_day) + bytes(_FILE_SIZE - _HEADER.size))
+            os.fsync(fd)
+        elif size != _FILE_SIZE:
+            os.close(fd)
+            raise ValueError(f"不是回报断点文件: {path}")
+        mm = mmap.mmap(fd, _FILE_SIZE)
+        magic, day = _HEADER.unpack_from(mm)
+        if magic != _MAGIC:
+            mm.close()
+            os.close(fd)
+            raise ValueError(f"不是回报断点文件: {path}")
+        if day != trading_day:
+            # 新的交易日：回报编号重新开始
+            mm[:] = _HEADER.pack(_MAGIC, trading_day) + bytes(_FILE_SIZE - _HEADER.size)
+            mm.flush()
+        return fd, mm
+
+    @property
+    def persistent(self) -> bool:
+        return self._mm is not None
+
+    # ---------- 回调线程 ----------
+    def last(self, env_id: int = 0) -> int:
+        """该环境号最后处理的回报编号，0 表示当日尚未处理过回报"""
+        return self._applied[env_id & 0xFF]
+
+    def accept(self, env_id: int, rpt_seq_num: int) -> bool:
+        """登记一条回报；编号不大于断点时返回 False（重复回报，不应再处理）"""
+        slot = env_id & 0xFF
+        if rpt_seq_num <= self._applied[slot]:
+            self.duplicates += 1
+            return False
+        self._applied[slot] = rpt_seq_num
+        self._dirty = True
+        return True
+
+    # ---------- 落盘 ----------
+    def flush(self) -> None:
+        """把变化写入文件（后台线程定期调用）"""
+        if self._mm is None or not self._dirty:
+            return
+        with self._lock:
+            self._dirty = False
+            struct.pack_into(f"<{_ENV_SLOTS}q", self._mm, _HEADER.size, *self._applied)
+            self._mm.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._mm is not None:
+            self._dirty = True
+            self.flush()
+            self._mm.close()
+            os.close(self._fd)
+            self._mm = None
@@ -3,14 +3,175 @@
 """
 clseqno_manager.py —— 线程安全的 clSeqNo 生成器
 --------------------------------------------
-• 初始值 = 默认委托通道的 lastOutMsgSeq + 1
-• 每调 get_next_seq() 自动自增，并保持与 API 同步
-• 提供 get_last_seq() 读取上一次发送的序号，供撤单时使用
+• ClSeqNoAllocator：按块分配、可崩溃恢复的 clSeqNo 分配器（多线程下单推荐）
+  - 每个线程从自己的号段中取号，号段内无锁、不调用 API
+  - 号段的上界（高水位）先写入 mmap 文件再发放，进程重启后从高水位之后继续，不会重复使用
+  - 按 clEnvId 分别计数；可用委托通道的 lastOutMsgSeq 兜底（文件丢失 / 其他客户端用过同一环境号）
+• ClSeqNoManager：原有的单计数器实现（全局锁 + 每单同步 API），保留兼容
+  - 初始值 = 默认委托通道的 lastOutMsgSeq + 1
+  - 每调 get_next_seq() 自动自增，并保持与 API 同步
+  - 提供 get_last_seq() 读取上一次发送的序号，供撤单时使用
 """
 from __future__ import annotations
+import mmap
+import os
+import struct
 import threading
-from typing import Optional, Any
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
+try:
+    import fcntl
+except ImportError:         # Windows 下只保证进程内互斥
+    fcntl = None
+
+_MAGIC = b"PLSSEQ01"
+_HEADER = struct.Struct("<8s8x")
+_ENV_SLOTS = 256            # clEnvId 为 int8，按 env & 0xFF 存放
+_FILE_SIZE = _HEADER.size + _ENV_SLOTS * 8
+_CL_SEQ_NO_MAX = 2**31 - 1  # clSeqNo 为 int32
+
+
+def _env_of(channel: Any) -> int:
+    return channel.pChannelCfg.contents.remoteCfg.clEnvId
+
+
+# ---------- 分块分配器 ----------
+class ClSeqNoAllocator:
+    """
+    分块分配的 clSeqNo 分配器
+
+        alloc = ClSeqNoAllocator("~/.pulse/clseqno.dat", api=oes_api, cl_env_id=1)
+        req.clSeqNo = alloc.next_seq()             # 每个线程各自的号段，号段内无锁
+        seqs = alloc.take(len(basket))              # 一篮子委托一次取连续的 n 个
+
+    - 不同线程的号段互不重叠，但发出顺序不保证全局递增（OES 只要求同一环境号下唯一）；
+    - 重启、线程退出时未用完的号段直接作废，最多浪费 block_size × 线程数 个序号；
+    - 同一文件可被多个进程共享（Linux 下按文件锁互斥分配号段）。
+    """
+
+    def __init__(self, path: str, api: Any = None, cl_env_id: int = 0, block_size: int = 1024) -> None:
+        """
+        Args:
+            path      : 高水位文件路径（不存在时创建）
+            api       : OesClientApi；提供时每分配一个号段同步一次 api.set_last_cl_seq_no，
+                        并在已连接时用默认委托通道的 lastOutMsgSeq 兜底
+            cl_env_id : next_seq() / take() 缺省使用的客户端环境号
+            block_size: 每个线程一次领取的序号个数
+        """
+        if block_size <= 0:
+            raise ValueError(f"block_size 必须大于 0: {block_size}")
+        self.path = os.path.expanduser(path)
+        self.api = api
+        self.cl_env_id = cl_env_id
+        self.block_size = block_size
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._floors: Dict[int, int] = {}
+        self._fd, self._mm = self._open(self.path)
+        self._marks = memoryview(self._mm)[_HEADER.size:].cast("q")
+
+        if api is not None:
+            channel = api.get_default_ord_channel()
+            if channel is not None:
+                self.sync_with_channel(channel)
+
+    @staticmethod
+    def _open(path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            os.write(fd, _HEADER.pack(_MAGIC) + bytes(_FILE_SIZE - _HEADER.size))
+            os.fsync(fd)
+        elif size != _FILE_SIZE:
+            os.close(fd)
+            raise ValueError(f"不是 clSeqNo 高水位文件: {path}")
+        mm = mmap.mmap(fd, _FILE_SIZE)
+        if _HEADER.unpack_from(mm)[0] != _MAGIC:
+            mm.close()
+            os.close(fd)
+            raise ValueError(f"不是 clSeqNo 高水位文件: {path}")
+        return fd, mm
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # ---------- 高水位 ----------
+    def high_water(self, cl_env_id: Optional[int] = None) -> int:
+        """已发放的最大序号（含其他线程尚未用完的号段）"""
+        env = self.cl_env_id if cl_env_id is None else cl_env_id
+        return max(self._marks[env & 0xFF], self._floors.get(env, 0))
+
+    def observe(self, cl_env_id: int, last_seq: int) -> None:
+        """登记一个已经使用过的序号（如服务端返回的最近流水号），之后分配的号段都在其之后"""
+        with self._lock:
+            if last_seq > self._floors.get(cl_env_id, 0):
+                self._floors[cl_env_id] = last_seq
+
+    def sync_with_channel(self, channel: Any) -> None:
+        """以委托通道的 lastOutMsgSeq 兜底（登录后由 API 维护为该环境号最近的委托流水号）"""
+        self.observe(_env_of(channel), int(getattr(channel, "lastOutMsgSeq", 0) or 0))
+
+    def _reserve(self, env: int, count: int) -> List[int]:
+        """领取 count 个连续序号，返回 [起始, 结束]（闭区间），高水位落盘后才返回"""
+        with self._lock, self._file_lock():
+            start = max(self._marks[env & 0xFF], self._floors.get(env, 0)) + 1
+            end = start + count - 1
+            if end > _CL_SEQ_NO_MAX:
+                raise OverflowError(f"clEnvId={env} 的 clSeqNo 已用尽: {end}")
+            self._marks[env & 0xFF] = end
+            self._mm.flush()
+        if self.api is not None:
+            self.api.set_last_cl_seq_no(cl_env_id=env, last_cl_seq_no=end)
+        return [start, end]
+
+    # ---------- 取号 ----------
+    def next_seq(self, cl_env_id: Optional[int] = None) -> int:
+        """当前线程取一个序号（号段用完时才加锁领取新号段）"""
+        env = self.cl_env_id if cl_env_id is None else cl_env_id
+        blocks = getattr(self._local, "blocks", None)
+        if blocks is None:
+            blocks = self._local.blocks = {}
+        block = blocks.get(env)
+        if block is None or block[0] > block[1]:
+            block = blocks[env] = self._reserve(env, self.block_size)
+        seq = block[0]
+        block[0] = seq + 1
+        return seq
+
+    def take(self, count: int, cl_env_id: Optional[int] = None) -> range:
+        """当前线程取 count 个连续序号（如一篮子批量委托）"""
+        if count <= 0:
+            return range(0)
+        env = self.cl_env_id if cl_env_id is None else cl_env_id
+        blocks = getattr(self._local, "blocks", None)
+        if blocks is None:
+            blocks = self._local.blocks = {}
+        block = blocks.get(env)
+        if block is None or block[1] - block[0] + 1 < count:
+            # 当前号段不够时剩余部分作废，领取足够大的新号段
+            block = blocks[env] = self._reserve(env, max(count, self.block_size))
+        start = block[0]
+        block[0] = start + count
+        return range(start, start + count)
+
+    def close(self) -> None:
+        self._marks.release()
+        self._mm.close()
+        os.close(self._fd)
+
+
+# ---------- 兼容的单计数器实现 ----------
 class ClSeqNoManager:
     def __init__(self, api: Any, start: Optional[int] = None) -> None:
         """
@@ -33,7 +194,7 @@ class ClSeqNoManager:
         self._last_sent: Optional[int] = None
 
         # 同步到 C API 内部计数（方便重连等场景）
-        self._api.set_last_cl_seq_no(self._seq)
+        self._api.set_last_cl_seq_no(last_cl_seq_no=self._seq - 1)
 
     def get_next_seq(self) -> int:
         """
@@ -44,8 +205,8 @@ class ClSeqNoManager:
             self._seq += 1
             # 记录本次发出的序号
             self._last_sent = seq
-            # 同步到底层
-            self._api.set_last_cl_seq_no(self._seq)
+            # 同步到底层（第一个位置参数是 cl_env_id，必须按关键字传入）
+            self._api.set_last_cl_seq_no(last_cl_seq_no=seq)
             return seq
 
     def get_last_seq(self) -> Optional[int]:
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+委托编码耗时对比：逐笔构造 OesOrdReqT（及 send_batch_orders 的逐笔 pointer()） vs OrderEncoder 模板写入
+
+    python pulse/scripts/bench_order_encode.py [-n 每轮笔数] [-r 轮数]
+
+只测量 Python 侧的编码开销，不调用 C 接口（不需要动态库和柜台连接），输出每笔的中位数 / 最小值（纳秒）。
+"""
+import argparse
+import statistics
+import sys
+import time
+from ctypes import POINTER, pointer
+from pathlib import Path
+
+PULSE_DIR = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(PULSE_DIR.parent), str(PULSE_DIR)]
+
+from vendor.trade_api import OesOrdReqT  # noqa: E402
+from vendor.trade_api.model import eOesBuySellTypeT, eOesOrdTypeT  # noqa: E402
+
+from pulse.api.trade.order_encoder import OrderEncoder  # noqa: E402
+
+_BUY = eOesBuySellTypeT.OES_BS_TYPE_BUY
+_LMT = eOesOrdTypeT.OES_ORD_TYPE_LMT
+
+
+def _symbols(n: int):
+    return [f"{600000 + i % 500:06d}" if i % 2 else f"{i % 500:06d}" for i in range(n)]
+
+
+def naive_single(orders):
+    for seq, sym, mkt, price, qty in orders:
+        req = OesOrdReqT()
+        req.clSeqNo = seq
+        req.mktId = mkt
+        req.ordType = _LMT
+        req.bsType = _BUY
+        req.securityId = sym.encode()
+        req.ordQty = qty
+        req.ordPrice = price
+
+
+def naive_batch(orders):
+    reqs = []
+    for seq, sym, mkt, price, qty in orders:
+        req = OesOrdReqT()
+        req.clSeqNo = seq
+        req.mktId = mkt
+        req.ordType = _LMT
+        req.bsType = _BUY
+        req.securityId = sym.encode()
+        req.ordQty = qty
+        req.ordPrice = price
+        reqs.append(req)
+    (POINTER(OesOrdReqT) * len(reqs))(*[pointer(req) for req in reqs])
+
+
+def encoder_single(enc: OrderEncoder):
+    slot = enc._single
+
+    def run(orders):
+        encode = enc.encode
+        for seq, sym, _, price, qty in orders:
+            encode(slot, sym, _BUY, price, qty, seq)
+    return run
+
+
+def encoder_batch(enc: OrderEncoder):
+    def run(orders):
+        add = enc.add
+        for seq, sym, _, price, qty in orders:
+            add(sym, _BUY, price, qty, seq)
+        # flush() 中除 C 调用之外的部分：取出缓存的指针数组视图并清空
+        enc._ptr_views.get(enc.count)
+        enc.clear()
+    return run
+
+
+def measure(func, orders, rounds: int):
+    per_order = []
+    for _ in range(rounds):
+        t0 = time.perf_counter_ns()
+        func(orders)
+        per_order.append((time.perf_counter_ns() - t0) / len(orders))
+    return statistics.median(per_order), min(per_order)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--orders", type=int, default=500, help="每轮委托笔数")
+    parser.add_argument("-r", "--rounds", type=int, default=200, help="轮数")
+    args = parser.parse_args()
+
+    syms = _symbols(args.orders)
+    orders = [(i + 1, s, 1 if s[0] == "6" else 2, 100000 + i, 100) for i, s in enumerate(syms)]
+    enc = OrderEncoder(api=None, capacity=args.orders)
+    for s in set(syms):
+        enc.template(s)
+
+    cases = {
+        "逐笔构造 (单笔)": naive_single,
+        "逐笔构造+pointer (批量)": naive_batch,
+        "OrderEncoder.encode": encoder_single(enc),
+        "OrderEncoder.add (批量)": encoder_batch(enc),
+    }
+    print(f"{'场景':<24}{'中位数(ns/笔)':>16}{'最小(ns/笔)':>14}")
+    for name, func in cases.items():
+        func(orders)        # 预热
+        med, best = measure(func, orders, args.rounds)
+        print(f"{name:<24}{med:>16.0f}{best:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
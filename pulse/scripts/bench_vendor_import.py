@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+vendor 包导入耗时对比：懒加载（默认） vs SPK_API_EAGER_LOAD=1
+
+    python pulse/scripts/bench_vendor_import.py [-n 重复次数]
+
+每次测量都在新的子进程中进行（没有 sys.modules 缓存），输出各场景的中位数 / 最小值（毫秒）
+及导入的 vendor 模块数。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PULSE_DIR = Path(__file__).resolve().parents[1]
+
+# 场景名 → 导入语句
+CASES = {
+    "quote 包": "import vendor.quote_api",
+    "trade 包": "import vendor.trade_api",
+    "quote 结构体": "from vendor.quote_api import MdsMktDataSnapshotT, MdsL2TradeT",
+    "trade 结构体": "from vendor.trade_api import OesOrdReqT, OesOrdCnfmT, OesTrdCnfmT",
+    "quote 全部 API": "from vendor.quote_api import MdsClientApi, MdsClientSpi",
+    "trade 全部 API": "from vendor.trade_api import OesClientApi, OesClientSpi",
+}
+
+_CHILD = """
+import sys, time, json
+sys.path.insert(0, {path!r})
+t0 = time.perf_counter()
+{stmt}
+cost = time.perf_counter() - t0
+print(json.dumps({{"ms": cost * 1000, "modules": sum(1 for m in sys.modules if m.startswith("vendor."))}}))
+"""
+
+
+def measure(stmt: str, eager: bool) -> dict:
+    env = dict(os.environ)
+    env.pop("SPK_API_EAGER_LOAD", None)
+    if eager:
+        env["SPK_API_EAGER_LOAD"] = "1"
+    code = _CHILD.format(path=str(PULSE_DIR), stmt=stmt)
+    out = subprocess.run([sys.executable, "-c", code], env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--repeat", type=int, default=10, help="每个场景的重复次数")
+    args = parser.parse_args()
+
+    print(f"{'场景':<16}{'模式':<8}{'中位数(ms)':>12}{'最小(ms)':>12}{'模块数':>8}")
+    for name, stmt in CASES.items():
+        for eager in (False, True):
+            runs = [measure(stmt, eager) for _ in range(args.repeat)]
+            ms = [r["ms"] for r in runs]
+            mode = "eager" if eager else "lazy"
+            print(f"{name:<16}{mode:<8}{statistics.median(ms):>12.2f}{min(ms):>12.2f}{runs[-1]['modules']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import math
+import os
 import random
+import sys
 from datetime import datetime
 from pathlib import Path
 
@@ -48,6 +50,71 @@ else:
     df_sector = pd.DataFrame(demo)
     sectors = sorted(df_sector["sector"].unique())
 
+# -----------------------------
+# 实盘下单（可选）
+# 设置环境变量 PULSE_OES_CONFIG 指向 OES 配置文件后，确认买入经 BasketEngine 整篮批量发送，
+# 持仓 / 资金取自回报维护的 AccountCache；未设置时仍为模拟成交和模拟持仓
+# -----------------------------
+OES_CONFIG = os.environ.get("PULSE_OES_CONFIG")
+CLSEQNO_FILE = os.environ.get("PULSE_CLSEQNO_FILE", "~/.pulse/clseqno.dat")
+RPT_CHECKPOINT_FILE = os.environ.get("PULSE_RPT_CHECKPOINT_FILE", "~/.pulse/rpt_checkpoint.dat")
+
+
+@st.cache_resource
+def _get_oes():
+    """启动 OES 客户端，创建篮子委托引擎和资金 / 持仓缓存（整个 streamlit 进程只创建一次）"""
+    root = Path(__file__).resolve().parents[2]
+    for p in (root, root / "pulse"):
+        if str(p) not in sys.path:
+            sys.path.insert(0, str(p))
+    from vendor.trade_api import OesClientApi
+    from pulse.api.trade.oes_spi_lite import OesSpiLite
+    from pulse.api.trade.basket_engine import BasketEngine
+    from pulse.core.data.bulk_query import BulkQuery
+    from pulse.core.order_management.account_cache import AccountCache
+    from pulse.core.order_management.report_checkpoint import ReportCheckpoint
+    from pulse.core.order_management.sequence import ClSeqNoAllocator
+
+    api = OesClientApi(OES_CONFIG)
+    engine = BasketEngine(api)
+    account = AccountCache()
+
+    def on_report(body):
+        engine.on_report(body)
+        account.on_report(body)
+
+    # 重启 / 重连后从回报断点续传
+    spi = OesSpiLite(on_any=on_report, checkpoint=ReportCheckpoint(RPT_CHECKPOINT_FILE))
+    if not api.register_spi(spi, add_default_channel=True) or not api.start():
+        raise RuntimeError(f"OES 客户端启动失败: {OES_CONFIG}")
+    # 登录后再创建，以委托通道的 lastOutMsgSeq 兜底
+    engine.allocator = ClSeqNoAllocator(CLSEQNO_FILE, api=api)
+    # 资金 / 持仓只在启动时批量查询一次，之后由回报维护；后台每分钟与柜台比对一次
+    bulk = BulkQuery(api)
+    account.bootstrap(bulk)
+    account.start_reconcile(bulk, interval=60)
+    return engine, account
+
+
+def _account_positions_df(account) -> pd.DataFrame:
+    """资金 / 持仓缓存 → 持仓表（价格单位换算为元）"""
+    info = df_sector.set_index("symbol")
+    rows = []
+    for p in account.snapshot().positions.values():
+        if not p.sum_hld:
+            continue
+        cost = p.cost_price / 10000
+        rows.append({
+            "symbol": p.symbol,
+            "名称": info["name"].get(p.symbol, "") if "name" in info else "",
+            "sector": info["sector"].get(p.symbol, ""),
+            "持仓": p.sum_hld,
+            "可卖": p.sell_avl_hld,
+            "成本价": cost,
+            "市值": p.sum_hld * cost,
+        })
+    return pd.DataFrame(rows, columns=["symbol", "名称", "sector", "持仓", "可卖", "成本价", "市值"])
+
 # -----------------------------
 # 页面
 # -----------------------------
@@ -205,7 +272,13 @@ def _generate_mock_positions() -> pd.DataFrame:
     return pd.DataFrame(positions)
 
 # 初始化持仓
-if "positions_df" not in st.session_state:
+if OES_CONFIG:
+    # 实盘：每次渲染都从回报维护的缓存读取（无锁、不查询柜台）
+    _account = _get_oes()[1]
+    st.session_state["positions_df"] = _account_positions_df(_account)
+    if _account.cash is not None:
+        st.session_state["cash"] = _account.cash.available / 10000
+elif "positions_df" not in st.session_state:
     st.session_state["positions_df"] = pd.DataFrame(columns=["symbol", "名称", "sector", "持仓", "成本价"])
 elif btn_refresh_pos:
     # 刷新持仓只更新市值等，不重新生成
@@ -663,7 +736,25 @@ with tab_buy:
                     buy_rows = st.session_state['buy_data']['buy_rows']
                     total_cost = st.session_state['buy_data']['total_cost']
 
-                    # ---------- 执行买入逻辑 ----------
+                    # ---------- 实盘：整篮一次性生成委托并按 500 笔原子批次发送 ----------
+                    if OES_CONFIG:
+                        basket = _get_oes()[0].submit(
+                            sector,
+                            buy_rows["symbol"].to_numpy(),
+                            buy_rows["价格"].to_numpy(dtype=float),
+                            buy_rows["数量"].to_numpy(dtype=int),
+                        )
+                        st.session_state.setdefault("baskets", []).insert(0, basket)
+                        if basket.send_errors:
+                            st.session_state["trade_success"] = (
+                                f"⚠️ {sector} 板块买入仅发送 {basket.sent}/{len(basket)} 笔，错误码 {basket.send_errors}")
+                        else:
+                            st.session_state["trade_success"] = f"✅ {sector} 板块买入已发送 {len(basket)} 笔委托"
+                        del st.session_state["show_buy_confirm"]
+                        del st.session_state["buy_data"]
+                        _do_rerun()
+
+                    # ---------- 模拟：执行买入逻辑 ----------
                     for _, r in buy_rows.iterrows():
                         sym = r["symbol"]
                         qty_val = int(r["数量"])
@@ -753,6 +844,14 @@ with tab_buy:
         st.write(styled_b, unsafe_allow_html=True)
         st.write(f"**预计投入:** {spent_buy:,.2f} 元    **余款:** {remain_buy:,.2f} 元")
 
+        # ---------------- 实盘篮子进度（由回报驱动） ----------------
+        if st.session_state.get("baskets"):
+            st.subheader("篮子进度")
+            if st.button("刷新进度", key="btn_refresh_basket"):
+                _do_rerun()
+            st.dataframe(pd.DataFrame([b.progress() for b in st.session_state["baskets"]]),
+                         use_container_width=True)
+
         # ---------------- 执行买入 ----------------
         if btn_execute:
             buy_rows = df_preview_buy[df_preview_buy["数量"] > 0]
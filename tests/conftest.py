@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+测试路径：仓库根目录（pulse.*）和 pulse/（vendor.* / core.*）
+
+仓库中未包含的 core.utils.logger / core.data.types 在导入失败时以最小实现代替，
+其余模块均使用仓库中的真实代码
+"""
+import importlib
+import logging
+import os
+import sys
+import types
+from dataclasses import dataclass
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for _path in (os.path.join(_ROOT, "pulse"), _ROOT):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+
+@dataclass
+class _MarketSnapshot:
+    symbol: str
+    last_price: float = 0.0
+    open_price: float = 0.0
+    high_price: float = 0.0
+    low_price: float = 0.0
+    bid_price: float = 0.0
+    ask_price: float = 0.0
+    bid_qty: int = 0
+    ask_qty: int = 0
+    volume: int = 0
+    turnover: float = 0.0
+    update_time: int = 0
+
+
+def _install(name: str, **attrs) -> None:
+    """name 无法导入时注册一个只含 attrs 的模块（父包缺失时一并注册为空包）"""
+    try:
+        importlib.import_module(name)
+        return
+    except ImportError:
+        pass
+    parent, _, _ = name.rpartition(".")
+    if parent and parent not in sys.modules:
+        try:
+            importlib.import_module(parent)
+        except ImportError:
+            package = types.ModuleType(parent)
+            package.__path__ = []
+            sys.modules[parent] = package
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+
+
+for _prefix in ("pulse.core", "core"):
+    _install(f"{_prefix}.utils.logger", get_logger=logging.getLogger)
+_install("pulse.core.data.types", MarketSnapshot=_MarketSnapshot)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+BasketEngine：构造、原子批次发送、回报驱动进度，以及与 RiskGate 的集成
+"""
+from types import SimpleNamespace as NS
+
+from pulse.api.trade.basket_engine import BasketEngine, infer_mkt_ids
+from pulse.api.trade.risk_gate import RISK_OK, RISK_SYMBOL_CAP, RiskGate
+
+ENV = 3
+ORD_STATUS_FILLED = 8
+ORD_STATUS_CANCELED = 6
+
+
+class _Api:
+    """记录每次 send_batch_orders 的 (clSeqNo, securityId, ordQty)；fail_at 为返回失败的调用序号"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.batches = []
+        self.last_seq = 100
+        self.channel = NS(pChannelCfg=NS(contents=NS(remoteCfg=NS(clEnvId=ENV))))
+
+    def get_default_ord_channel(self):
+        return self.channel
+
+    def get_next_cl_seq_no(self, cl_env_id=0):
+        return self.last_seq + 1
+
+    def set_last_cl_seq_no(self, cl_env_id=0, last_cl_seq_no=0):
+        self.last_seq = last_cl_seq_no
+        return last_cl_seq_no
+
+    def send_batch_orders(self, channel, reqs):
+        self.batches.append([(r.clSeqNo, r.securityId, r.ordQty) for r in reqs])
+        return -1 if len(self.batches) == self.fail_at else 0
+
+
+def _filled(seq, qty, price=10):
+    return NS(clEnvId=ENV, clSeqNo=seq, ordStatus=ORD_STATUS_FILLED, cumQty=qty, cumAmt=qty * price * 10000)
+
+
+def test_infer_mkt_ids_uses_shared_classifier():
+    assert infer_mkt_ids(["600000", "113050", "110059", "000001", "159915", "000001.SH"]).tolist() == [
+        1, 1, 1, 2, 2, 1]
+
+
+def test_build_strips_exchange_suffix():
+    eng = BasketEngine(_Api())
+    basket = eng.build("b", ["600000.SH", "SZ000001", "123001"], [10.0] * 3, [100, 0, 200])
+    assert basket.view["securityId"].tolist() == [b"600000", b"123001"]
+    assert basket.view["mktId"].tolist() == [1, 2]
+    assert basket.view["clSeqNo"].tolist() == [101, 102]
+
+
+def test_submit_chunks_and_progress():
+    api = _Api()
+    done = []
+    eng = BasketEngine(api, chunk_size=2, on_done=done.append)
+    basket = eng.submit("b", ["600000", "600036", "000001"], [10.0] * 3, [100, 200, 300])
+    assert [len(b) for b in api.batches] == [2, 1]
+    assert basket.progress()["sent"] == 3
+
+    eng.on_report(_filled(101, 100))
+    eng.on_report(_filled(102, 200))
+    eng.on_report(NS(clEnvId=ENV, clSeqNo=103, ordStatus=ORD_STATUS_CANCELED, cumQty=100, cumAmt=1000000))
+    assert basket.wait(0)
+    progress = basket.progress()
+    assert (progress["accepted"], progress["closed"], progress["filled_qty"]) == (3, 3, 400)
+    assert progress["filled_amt"] == 3100
+    assert done == [basket]
+    assert eng.active_baskets() == []
+
+
+def test_failed_chunk_closes_unsent_legs():
+    api = _Api(fail_at=2)
+    eng = BasketEngine(api, chunk_size=1)
+    basket = eng.submit("b", ["600000", "600036", "000001"], [10.0] * 3, [100] * 3)
+    assert basket.sent == 1
+    assert basket.send_errors == [-1]
+    assert basket.progress()["closed"] == 2
+    eng.on_report(_filled(101, 100))
+    assert basket.wait(0)
+
+
+def test_risk_rejected_legs_are_not_sent():
+    api = _Api()
+    gate = RiskGate(symbol_cap=15000)
+    eng = BasketEngine(api, risk_gate=gate)
+    basket = eng.submit("b", ["600000", "600000", "000001"], [10.0] * 3, [1000, 1000, 100])
+
+    assert basket.risk_codes.tolist() == [RISK_OK, RISK_SYMBOL_CAP, RISK_OK]
+    assert api.batches == [[(101, b"600000", 1000), (103, b"000001", 100)]]
+    progress = basket.progress()
+    assert (progress["risk_rejected"], progress["rejected"], progress["closed"]) == (1, 1, 1)
+
+    for seq, qty in ((101, 1000), (103, 100)):
+        report = _filled(seq, qty)
+        eng.on_report(report)
+        gate.on_report(report)
+    assert basket.wait(0)
+    assert gate.snapshot()["live_orders"] == 0
+    assert gate.exposure("600000") == 10000
+
+
+def test_risk_reservations_released_for_unsent_legs():
+    api = _Api(fail_at=2)
+    gate = RiskGate(symbol_cap=15000)
+    eng = BasketEngine(api, risk_gate=gate, chunk_size=1)
+    basket = eng.submit("b", ["600000", "000001", "600036"], [10.0] * 3, [1000, 100, 100])
+
+    assert basket.sent == 1
+    assert gate.snapshot()["live_orders"] == 1          # 第一片已发出，等待回报
+    assert gate.exposure("600000") == 10000
+    assert gate.exposure("000001") == gate.exposure("600036") == 0
+    eng.on_report(_filled(101, 1000))
+    assert basket.wait(0)
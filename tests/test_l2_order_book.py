@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+L2OrderBookEngine：按 (exchId, instrId) 分簿、深交所挂单 / 成交 / 撤单
+"""
+from types import SimpleNamespace as NS
+
+from vendor.quote_api import eMdsMsgTypeT
+
+from pulse.api.quote.l2_order_book import SIDE_ASK, SIDE_BID, L2OrderBookEngine
+
+SSE, SZSE = 1, 2
+_MSG_ORDER = int(eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER)
+_MSG_TRADE = int(eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE)
+
+
+def _order(exch_id, instr_id, seq, side, price, qty):
+    return NS(exchId=exch_id, instrId=instr_id, SecurityID=b"%06d" % instr_id, TransactTime=93000000,
+              ApplSeqNum=seq, Side=side, OrderType=b"2", SseOrderNo=0, Price=price, OrderQty=qty)
+
+
+def _trade(exch_id, instr_id, bid_seq, offer_seq, qty, exec_type=b"F"):
+    return NS(exchId=exch_id, instrId=instr_id, SecurityID=b"%06d" % instr_id, TransactTime=93000100,
+              ApplSeqNum=0, ExecType=exec_type, TradePrice=0, TradeQty=qty,
+              BidApplSeqNum=bid_seq, OfferApplSeqNum=offer_seq)
+
+
+def test_same_number_on_both_exchanges_uses_separate_books():
+    engine = L2OrderBookEngine(publish_interval=None)
+    engine.on_tick(_MSG_ORDER, _order(SZSE, 1, 1, b"1", 123400, 500))
+    engine.on_tick(_MSG_ORDER, _order(SSE, 1, 1, b"2", 30000000, 100))
+
+    assert set(engine.books) == {(SZSE, 1), (SSE, 1)}
+    sz = engine.snapshot("000001")
+    sh = engine.snapshot("000001.SH")
+    assert (sz.exch_id, sz.bid_px[0], sz.bid_qty[0], sz.ask_qty[0]) == (SZSE, 123400, 500, 0)
+    assert (sh.exch_id, sh.ask_px[0], sh.ask_qty[0], sh.bid_qty[0]) == (SSE, 30000000, 100, 0)
+    assert {(s.exch_id, s.instr_id) for s in engine.publish()} == {(SZSE, 1), (SSE, 1)}
+
+
+def test_symbol_filter_and_reset():
+    engine = L2OrderBookEngine(publish_interval=None, symbols=["000001"])
+    engine.on_tick(_MSG_ORDER, _order(SZSE, 1, 1, b"1", 123400, 500))
+    engine.on_tick(_MSG_ORDER, _order(SSE, 1, 1, b"1", 123400, 500))
+    assert list(engine.books) == [(SZSE, 1)]
+
+    engine.reset(["000001.SZ"])
+    assert engine.snapshot("000001").bid_qty[0] == 0
+
+
+def test_szse_trade_and_cancel():
+    engine = L2OrderBookEngine(publish_interval=None)
+    engine.on_tick(_MSG_ORDER, _order(SZSE, 1, 1, b"1", 123400, 500))
+    engine.on_tick(_MSG_ORDER, _order(SZSE, 1, 2, b"2", 123500, 300))
+    engine.on_tick(_MSG_TRADE, _trade(SZSE, 1, 1, 3, 200))
+    engine.on_tick(_MSG_TRADE, _trade(SZSE, 1, 0, 2, 300, exec_type=b"4"))
+
+    book = engine.books[(SZSE, 1)]
+    assert book.best_price(SIDE_BID) == 123400
+    assert book.best_price(SIDE_ASK) == 0
+    assert engine.snapshot("000001").bid_qty[0] == 300
+    assert (engine.order_count, engine.trade_count) == (2, 2)
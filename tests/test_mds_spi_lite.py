@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+MdsSpiLite：字段投影能在 MdsMsgDispatcher 中编译，逐笔经投影后交给使用方
+"""
+from vendor.quote_api import eMdsMsgTypeT
+from vendor.quote_api.c_api_wrapper.mds_msg_dispatcher import MdsMsgDispatcher
+from vendor.quote_api.model import MdsMktRspMsgBodyT
+
+from pulse.api.quote.l2_order_book import L2OrderBookEngine
+from pulse.api.quote.mds_spi_lite import MdsSpiLite
+
+
+def _dispatcher(**kwargs):
+    spi = MdsSpiLite("mds_client.conf", ["600000", "000001"], **kwargs)
+    return spi, MdsMsgDispatcher(spi, False)
+
+
+def _get_body(dispatcher, msg_id):
+    return dispatcher._callbacks[int(msg_id)][2]
+
+
+def test_projections_compile_without_tick_consumer():
+    spi, dispatcher = _dispatcher()
+    assert spi._tick_sink is None
+    assert int(eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE) not in spi.get_field_projections()
+    assert _get_body(dispatcher, eMdsMsgTypeT.MDS_MSGTYPE_INDEX_SNAPSHOT_FULL_REFRESH) is not None
+
+
+def test_tick_projections_compile_with_order_book():
+    spi, dispatcher = _dispatcher(order_book_engine=L2OrderBookEngine())
+    assert spi._tick_sink is not None
+
+    body = MdsMktRspMsgBodyT()
+    body.trade.exchId = 2
+    body.trade.instrId = 1
+    body.trade.SecurityID = b"000001"
+    body.trade.ApplSeqNum = 7
+    body.trade.ExecType = b"F"
+    body.trade.TradePrice = 123400
+    body.trade.TradeQty = 300
+    trade = _get_body(dispatcher, eMdsMsgTypeT.MDS_MSGTYPE_L2_TRADE)(body)
+    assert (trade.exchId, trade.instrId, trade.SecurityID) == (2, 1, b"000001")
+    assert (trade.ApplSeqNum, trade.ExecType, trade.TradePrice, trade.TradeQty) == (7, b"F", 123400, 300)
+
+    body = MdsMktRspMsgBodyT()
+    body.order.exchId = 1
+    body.order.instrId = 600000
+    body.order.SseOrderNo = 99
+    body.order.Side = b"1"
+    body.order.OrderQty = 500
+    for msg_id in (eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER, eMdsMsgTypeT.MDS_MSGTYPE_L2_SSE_ORDER):
+        order = _get_body(dispatcher, msg_id)(body)
+        assert (order.exchId, order.instrId, order.SseOrderNo, order.Side, order.OrderQty) == (
+            1, 600000, 99, b"1", 500)
+
+
+def test_projected_ticks_reach_order_book():
+    engine = L2OrderBookEngine(publish_interval=None)
+    spi, dispatcher = _dispatcher(order_book_engine=engine)
+
+    body = MdsMktRspMsgBodyT()
+    body.order.exchId = 2
+    body.order.instrId = 1
+    body.order.SecurityID = b"000001"
+    body.order.ApplSeqNum = 1
+    body.order.Side = b"1"
+    body.order.OrderType = b"2"
+    body.order.Price = 123400
+    body.order.OrderQty = 500
+    order = _get_body(dispatcher, eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER)(body)
+    spi._tick_sink(int(eMdsMsgTypeT.MDS_MSGTYPE_L2_ORDER), order)
+    assert engine.order_count == 1
+
+
+def test_index_snapshot_symbol_carries_exchange():
+    spi, dispatcher = _dispatcher()
+    body = MdsMktRspMsgBodyT()
+    body.mktDataSnapshot.head.exchId = 1
+    body.mktDataSnapshot.head.instrId = 1
+    body.mktDataSnapshot.index.SecurityID = b"000001"
+    body.mktDataSnapshot.index.TradePx = 30000000
+    projected = _get_body(dispatcher, eMdsMsgTypeT.MDS_MSGTYPE_INDEX_SNAPSHOT_FULL_REFRESH)(body)
+    spi.on_market_index_snapshot_full_refresh(None, None, projected, None)
+
+    snap, = spi.snapshot_bridge.get_batch_nowait()
+    assert (snap.symbol, snap.last_price) == ("000001.SH", 3000.0)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+OrderEncoder：按 (证券, 买卖方向) 缓存的模板前缀编码结果与逐字段赋值一致，模板覆盖后前缀随之更新
+"""
+from ctypes import addressof, sizeof, string_at
+
+from vendor.trade_api import OesOrdReqT
+from vendor.trade_api.model import eOesBuySellTypeT, eOesOrdTypeT
+
+from pulse.api.trade.order_encoder import OrderEncoder
+
+_BUY = eOesBuySellTypeT.OES_BS_TYPE_BUY
+_SELL = eOesBuySellTypeT.OES_BS_TYPE_SELL
+
+
+def _bytes(req):
+    return string_at(addressof(req), sizeof(OesOrdReqT))
+
+
+def _expected(mkt_id, security_id, bs_type, price, qty, seq, user_info=0, ord_type=eOesOrdTypeT.OES_ORD_TYPE_LMT):
+    req = OesOrdReqT()
+    req.clSeqNo = seq
+    req.mktId = mkt_id
+    req.ordType = ord_type
+    req.bsType = bs_type
+    req.securityId = security_id
+    req.ordQty = qty
+    req.ordPrice = price
+    req.userInfo.i64 = user_info
+    return _bytes(req)
+
+
+def test_encode_and_add_match_field_assignment():
+    enc = OrderEncoder(api=None, capacity=4)
+    for mkt_id, symbol, bs_type, price, qty, seq, user_info in (
+            (1, "600000", _BUY, 101000, 100, 1, 0),
+            (2, "000001.SZ", _SELL, 123400, 300, 2, 7),
+            (1, "600000", _SELL, 99000, 200, 3, 0),
+            (1, "600000", _BUY, 100000, 500, 4, 0)):
+        expected = _expected(mkt_id, symbol[:6].encode(), bs_type, price, qty, seq, user_info)
+        assert _bytes(enc.encode(OesOrdReqT(), symbol, bs_type, price, qty, seq, user_info)) == expected
+        assert _bytes(enc.pool[enc.add(symbol, bs_type, price, qty, seq, user_info)]) == expected
+    assert set(enc._prefixes["600000"]) == {_BUY, _SELL}
+
+
+def test_template_override_refreshes_prefix():
+    enc = OrderEncoder(api=None, capacity=1)
+    req = OesOrdReqT()
+    enc.encode(req, "600000", _BUY, 101000, 100, 1)
+    enc.template("600000", ord_type=eOesOrdTypeT.OES_ORD_TYPE_FAK)
+    enc.encode(req, "600000", _BUY, 101000, 100, 2)
+    assert _bytes(req) == _expected(1, b"600000", _BUY, 101000, 100, 2, ord_type=eOesOrdTypeT.OES_ORD_TYPE_FAK)
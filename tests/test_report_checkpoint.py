@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+ReportCheckpoint：回报去重、断点落盘与跨日清零
+"""
+import os
+
+import pytest
+
+from pulse.core.order_management.report_checkpoint import _FILE_SIZE, ReportCheckpoint
+
+DAY = 20260105
+
+
+def test_accept_drops_duplicates_per_env():
+    ckpt = ReportCheckpoint(trading_day=DAY)
+    assert not ckpt.persistent
+    assert [ckpt.accept(1, n) for n in (1, 2, 2, 1, 5, 3)] == [True, True, False, False, True, False]
+    assert ckpt.duplicates == 3
+    assert ckpt.last(1) == 5
+    assert ckpt.last(2) == 0
+    assert ckpt.accept(2, 1)
+
+
+def test_negative_env_id_slot():
+    ckpt = ReportCheckpoint(trading_day=DAY)
+    assert ckpt.accept(-1, 7)
+    assert ckpt.last(255) == 7
+    assert not ckpt.accept(-1, 7)
+
+
+def test_resume_from_file(tmp_path):
+    path = str(tmp_path / "ckpt" / "rpt.dat")
+    ckpt = ReportCheckpoint(path, trading_day=DAY, flush_interval=60)
+    ckpt.accept(0, 10)
+    ckpt.accept(3, 4)
+    ckpt.close()
+    assert os.path.getsize(path) == _FILE_SIZE
+
+    ckpt = ReportCheckpoint(path, trading_day=DAY, flush_interval=60)
+    try:
+        assert (ckpt.last(0), ckpt.last(3)) == (10, 4)
+        assert not ckpt.accept(0, 10)               # 重连后服务端补发的回报
+        assert ckpt.accept(0, 11)
+    finally:
+        ckpt.close()
+
+
+def test_background_flush(tmp_path):
+    path = str(tmp_path / "rpt.dat")
+    ckpt = ReportCheckpoint(path, trading_day=DAY, flush_interval=60)
+    try:
+        ckpt.accept(0, 42)
+        ckpt.flush()
+        reopened = ReportCheckpoint(path, trading_day=DAY, flush_interval=60)
+        assert reopened.last(0) == 42
+        reopened.close()
+    finally:
+        ckpt.close()
+
+
+def test_day_rollover_resets(tmp_path):
+    path = str(tmp_path / "rpt.dat")
+    ckpt = ReportCheckpoint(path, trading_day=DAY, flush_interval=60)
+    ckpt.accept(0, 100)
+    ckpt.close()
+
+    ckpt = ReportCheckpoint(path, trading_day=DAY + 1, flush_interval=60)
+    try:
+        assert ckpt.last(0) == 0
+        assert ckpt.accept(0, 1)                    # 新交易日回报编号从头开始
+    finally:
+        ckpt.close()
+
+    ckpt = ReportCheckpoint(path, trading_day=DAY + 1, flush_interval=60)
+    try:
+        assert ckpt.last(0) == 1
+    finally:
+        ckpt.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "rpt.dat"
+    path.write_bytes(b"x" * 10)
+    with pytest.raises(ValueError):
+        ReportCheckpoint(str(path), trading_day=DAY)
+    path.write_bytes(b"x" * _FILE_SIZE)
+    with pytest.raises(ValueError):
+        ReportCheckpoint(str(path), trading_day=DAY)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+RiskGate：单笔 / 篮子检查、额度占用与释放、令牌桶
+"""
+from types import SimpleNamespace as NS
+
+import numpy as np
+import pytest
+
+from pulse.api.trade import risk_gate as rg
+from pulse.api.trade.order_encoder import resolve_security
+from pulse.api.trade.risk_gate import (
+    RISK_CASH, RISK_HOLDING, RISK_NO_PRICE, RISK_OK, RISK_PRICE_BAND, RISK_QTY, RISK_RATE,
+    RISK_SECTOR_CAP, RISK_SYMBOL_CAP, RiskGate, RiskRejectedError, _group_cumsum,
+)
+
+BUY, SELL = 1, 2
+PX = 100000                     # 10 元
+
+
+def _order_report(seq, status, cum_qty=0, env=0):
+    return NS(clEnvId=env, clSeqNo=seq, ordStatus=status, cumQty=cum_qty)
+
+
+def _reject(seq, env=0):
+    return NS(clEnvId=env, clSeqNo=seq, ordRejReason=1)
+
+
+def _req(seq, symbol="600000", bs=BUY, price=PX, qty=100):
+    mkt_id, security_id = resolve_security(symbol)
+    return NS(clSeqNo=seq, mktId=mkt_id, securityId=security_id.encode(), bsType=bs, ordPrice=price, ordQty=qty)
+
+
+def _holding(symbol, qty):
+    mkt_id, security_id = resolve_security(symbol)
+    return NS(mktId=mkt_id, securityId=security_id.encode(), sellAvlHld=qty)
+
+
+class _Api:
+    """send_order / send_batch_orders 依次返回 rets 中的值"""
+
+    def __init__(self, *rets):
+        self.rets = list(rets)
+        self.sent = []
+        self.channel = NS(pChannelCfg=NS(contents=NS(remoteCfg=NS(clEnvId=0))))
+
+    def get_default_ord_channel(self):
+        return self.channel
+
+    def send_order(self, channel, req):
+        self.sent.append([req.clSeqNo])
+        return self.rets.pop(0)
+
+    def send_batch_orders(self, channel, reqs):
+        self.sent.append([r.clSeqNo for r in reqs])
+        return self.rets.pop(0)
+
+
+# —— 分组累计 ——
+def test_group_cumsum_keeps_order_within_groups():
+    keys = np.array([2, 1, 2, 1, 3])
+    values = np.array([10, 1, 20, 2, 5])
+    assert _group_cumsum(keys, values).tolist() == [10, 1, 30, 3, 5]
+
+
+# —— 单笔检查 ——
+def test_invalid_qty():
+    assert RiskGate().check("600000", BUY, PX, 0, 1) == RISK_QTY
+
+
+def test_price_band():
+    gate = RiskGate(price_band=0.02)
+    gate.set_last_price("600000", PX)
+    assert gate.check("600000", BUY, 103000, 100, 1) == RISK_PRICE_BAND
+    assert gate.check("600000", BUY, 102000, 100, 2) == RISK_OK
+    assert gate.check("600000", BUY, 0, 100, 3) == RISK_OK         # 市价单按最新价计算
+    assert gate.check("000001", BUY, PX, 100, 4) == RISK_OK         # 没有最新价时不检查
+
+
+def test_require_price():
+    gate = RiskGate(price_band=0.02, require_price=True)
+    assert gate.check("600000", BUY, PX, 100, 1) == RISK_NO_PRICE
+
+
+def test_symbol_and_sector_caps():
+    gate = RiskGate(symbol_cap=15000, sector_caps={"银行": 22000},
+                    sectors={"600000": "银行", "600036": "银行"})
+    assert gate.check("600000", BUY, PX, 1000, 1) == RISK_OK         # 10000 元
+    assert gate.check("600000", BUY, PX, 1000, 2) == RISK_SYMBOL_CAP
+    assert gate.check("600036", BUY, PX, 1000, 3) == RISK_OK
+    assert gate.check("600036", BUY, PX, 400, 4) == RISK_SECTOR_CAP
+    assert gate.exposure("600000") == 10000
+    assert gate.snapshot()["sector_exposure"] == {"银行": 20000}
+
+
+def test_cash_and_holding():
+    gate = RiskGate()
+    gate.on_report(NS(currentAvailableBal=15000 * 10000))
+    gate.on_report(_holding("600000", 500))
+    assert gate.check("600000", BUY, PX, 1000, 1) == RISK_OK
+    assert gate.check("600000", BUY, PX, 1000, 2) == RISK_CASH
+    assert gate.check("600000", SELL, PX, 300, 3) == RISK_OK
+    assert gate.check("600000", SELL, PX, 300, 4) == RISK_HOLDING
+    assert gate.check("000001", SELL, PX, 100, 5) == RISK_HOLDING    # 未出现在持仓回报中按 0 股
+
+
+def test_rate_limit_token_bucket(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rg.time, "monotonic", lambda: now[0])
+    gate = RiskGate(max_rate=2, burst=2)
+    assert [gate.check("600000", BUY, PX, 100, i) for i in range(3)] == [RISK_OK, RISK_OK, RISK_RATE]
+    now[0] += 0.5                                                   # 0.5 秒补充 1 个令牌
+    assert gate.check("600000", BUY, PX, 100, 3) == RISK_OK
+    assert gate.check("600000", BUY, PX, 100, 4) == RISK_RATE
+    now[0] += 10                                                    # 不超过桶容量
+    codes = gate.check_basket(["600000"] * 3, BUY, [PX] * 3, [100] * 3, range(5, 8))
+    assert codes.tolist() == [RISK_OK, RISK_OK, RISK_RATE]
+
+
+# —— 篮子检查 ——
+def test_check_basket_accumulates_in_order():
+    gate = RiskGate(symbol_cap=15000)
+    codes = gate.check_basket(
+        ["600000", "000001", "600000", "600000", "000001"], BUY,
+        [PX] * 5, [1000, 1000, 1000, 1000, 100], range(1, 6))
+    # 600000 第二笔累计 20000 元超限，之后同券各腿继续累计（偏保守）；其他证券互不影响
+    assert codes.tolist() == [RISK_OK, RISK_OK, RISK_SYMBOL_CAP, RISK_SYMBOL_CAP, RISK_OK]
+    assert gate.exposure("600000") == 10000
+    assert gate.exposure("000001") == 11000
+    assert gate.snapshot()["live_orders"] == 3
+
+
+def test_check_basket_cash_and_holding_order():
+    gate = RiskGate()
+    gate.on_report(NS(currentAvailableBal=25000 * 10000))
+    gate.on_report(_holding("000001", 300))
+    codes = gate.check_basket(
+        ["600000", "000001", "600036", "000001", "600016"], [BUY, SELL, BUY, SELL, BUY],
+        [PX] * 5, [1000, 200, 1000, 200, 1000], range(1, 6))
+    assert codes.tolist() == [RISK_OK, RISK_OK, RISK_OK, RISK_HOLDING, RISK_CASH]
+    assert gate.snapshot()["cash_available"] == 5000
+
+
+def test_check_basket_price_band_and_qty():
+    gate = RiskGate(price_band=0.02)
+    gate.update_prices(["600000", "000001"], [PX, PX])
+    codes = gate.check_basket(["600000", "000001", "600000"], BUY, [PX, 110000, PX], [100, 100, 0], range(3))
+    assert codes.tolist() == [RISK_OK, RISK_PRICE_BAND, RISK_QTY]
+
+
+# —— 占用与释放 ——
+def test_reservation_flow():
+    gate = RiskGate(symbol_cap=50000)
+    gate.on_report(NS(currentAvailableBal=100000 * 10000))
+    assert gate.check("600000", BUY, PX, 1000, 1) == RISK_OK
+    snap = gate.snapshot()
+    assert (snap["pending_cash"], snap["unsynced_cash"], snap["cash_available"]) == (10000, 0, 90000)
+
+    # 第一条委托回报：资金占用转为等待资金回报，重复回报不重复转移
+    gate.on_report(_order_report(1, 2))
+    gate.on_report(_order_report(1, 3))
+    snap = gate.snapshot()
+    assert (snap["pending_cash"], snap["unsynced_cash"], snap["cash_available"]) == (0, 10000, 90000)
+
+    # 资金变动回报以柜台为准
+    gate.on_report(NS(currentAvailableBal=90000 * 10000))
+    assert gate.snapshot()["unsynced_cash"] == 0
+    assert gate.snapshot()["cash_available"] == 90000
+
+    # 部分成交后撤单：释放未成交部分的上限额度
+    gate.on_report(_order_report(1, 6, cum_qty=400))
+    assert gate.exposure("600000") == 4000
+    assert gate.snapshot()["live_orders"] == 0
+
+
+def test_sell_reservation_flow():
+    gate = RiskGate()
+    gate.on_report(_holding("600000", 1000))
+    assert gate.check("600000", SELL, PX, 600, 1) == RISK_OK
+    gate.on_report(_order_report(1, 2))
+    assert gate.check("600000", SELL, PX, 500, 2) == RISK_HOLDING
+    gate.on_report(_holding("600000", 400))
+    assert gate.check("600000", SELL, PX, 400, 3) == RISK_OK
+
+
+def test_release_on_reject():
+    gate = RiskGate(symbol_cap=15000, sector_caps={"银行": 15000}, sectors={"600000": "银行"})
+    gate.on_report(NS(currentAvailableBal=100000 * 10000))
+    assert gate.check("600000", BUY, PX, 1000, 1) == RISK_OK
+    gate.on_report(_reject(1))
+    snap = gate.snapshot()
+    assert (snap["pending_cash"], snap["unsynced_cash"], snap["live_orders"]) == (0, 0, 0)
+    assert snap["sector_exposure"] == {"银行": 0}
+    assert gate.exposure("600000") == 0
+    assert gate.check("600000", BUY, PX, 1000, 2) == RISK_OK
+
+
+def test_release_ignores_other_env():
+    gate = RiskGate()
+    assert gate.check("600000", BUY, PX, 1000, 1, env_id=3) == RISK_OK
+    gate.on_report(_reject(1, env=0))
+    assert gate.exposure("600000") == 10000
+    gate.on_report(_reject(1, env=3))
+    assert gate.exposure("600000") == 0
+
+
+def test_send_order_rejects_and_releases_on_failed_send():
+    gate = RiskGate(symbol_cap=15000)
+    api = _Api(-1, 0)
+    assert gate.send_order(api, _req(1, qty=1000)) == -1
+    assert gate.exposure("600000") == 0
+    assert gate.send_order(api, _req(2, qty=1000)) == 0
+    with pytest.raises(RiskRejectedError) as exc:
+        gate.send_order(api, _req(3, qty=1000))
+    assert exc.value.reason == RISK_SYMBOL_CAP
+    assert api.sent == [[1], [2]]
+
+
+def test_send_batch_orders_sends_passed_and_releases_on_failure():
+    gate = RiskGate(symbol_cap=15000)
+    api = _Api(-5)
+    ret, codes = gate.send_batch_orders(api, [_req(1, qty=1000), _req(2, qty=1000), _req(3, "000001")])
+    assert ret == -5
+    assert codes.tolist() == [RISK_OK, RISK_SYMBOL_CAP, RISK_OK]
+    assert api.sent == [[1, 3]]
+    assert gate.snapshot()["live_orders"] == 0
+    assert gate.exposure("600000") == gate.exposure("000001") == 0
+
+
+def test_send_batch_orders_all_rejected():
+    gate = RiskGate()
+    ret, codes = gate.send_batch_orders(_Api(), [_req(1, qty=0)])
+    assert ret < 0
+    assert codes.tolist() == [RISK_QTY]
+
+
+def test_capacity_grows():
+    gate = RiskGate(capacity=2, symbol_cap=1000)
+    gate.set_sectors({f"60000{i}": "银行" for i in range(5)})
+    gate.set_sector_cap("券商", 1)
+    gate.set_symbol_cap("600004", None)
+    assert gate.check("600004", BUY, PX, 1000, 1) == RISK_OK
+    assert gate.check("600003", BUY, PX, 1000, 2) == RISK_SYMBOL_CAP
+
+
+# —— 沪深同号证券 ——
+def test_index_snapshot_does_not_overwrite_stock_price():
+    gate = RiskGate(price_band=0.02)
+    gate.on_snapshot(NS(symbol="000001", last_price=10.0))         # 平安银行
+    gate.on_snapshot(NS(symbol="000001.SH", last_price=3000.0))    # 上证指数（MdsSpiLite 推送时带后缀）
+    gate.on_snapshot(NS(symbol="10004567", last_price=0.5))        # 期权
+    assert gate.check("000001", BUY, PX, 100, 1) == RISK_OK
+    assert gate.check("000001", BUY, 103000, 100, 2) == RISK_PRICE_BAND
+    assert gate.snapshot()["symbols"] == 1
+
+
+def test_same_number_on_both_exchanges_kept_apart():
+    gate = RiskGate(symbol_cap=15000)
+    assert gate.check("000001.SH", BUY, PX, 1000, 1) == RISK_OK
+    assert gate.check("000001", BUY, PX, 1000, 2) == RISK_OK
+    assert gate.exposure("000001.SH") == gate.exposure("000001.SZ") == 10000
+
+    gate.on_report(_holding("000001", 500))
+    assert gate.check("000001.SH", SELL, PX, 100, 3) == RISK_HOLDING
+    assert gate.check("000001.SZ", SELL, PX, 500, 4) == RISK_OK
+
+
+def test_reqs_use_order_market():
+    gate = RiskGate(symbol_cap=15000)
+    reqs = [_req(1, "000001.SH", qty=1000), _req(2, "000001", qty=1000), _req(3, "SZ000001", qty=1000)]
+    ret, codes = gate.send_batch_orders(_Api(0), reqs)
+    assert ret == 0
+    assert codes.tolist() == [RISK_OK, RISK_OK, RISK_SYMBOL_CAP]
+    assert gate.exposure("000001.SH") == gate.exposure("000001") == 10000
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+vendor 懒加载：model 包的名称映射与子模块一致，按需导入时只加载用到的子模块，
+from ... import * 得到的名称与 SPK_API_EAGER_LOAD=1 时相同
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+_PULSE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pulse")
+_MODELS = ("vendor.quote_api.model", "vendor.trade_api.model")
+
+
+def _run(code: str, eager: bool = False):
+    env = dict(os.environ)
+    env.pop("SPK_API_EAGER_LOAD", None)
+    if eager:
+        env["SPK_API_EAGER_LOAD"] = "1"
+    out = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {_PULSE_DIR!r})\n{code}"],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+@pytest.mark.parametrize("package", _MODELS)
+def test_name_map_matches_submodules(package):
+    model = importlib.import_module(package)
+    for sub in model._SUBMODULES:
+        module = importlib.import_module(f"{package}.{sub}")
+        names = set(model._NAMES[sub])
+        assert all(getattr(module, name) is getattr(model, name) for name in names)
+        defined = {name for name, value in vars(module).items()
+                   if isinstance(value, type) and value.__module__ == module.__name__ and not name.startswith("_")}
+        assert defined <= names, f"{sub} 中新增的类未加入 _NAMES: {sorted(defined - names)}"
+
+
+def test_struct_import_loads_only_needed_submodules():
+    loaded = _run("from vendor.trade_api import OesOrdReqT\n"
+                  "import json; print(json.dumps(sorted(m for m in sys.modules if m.startswith('vendor.'))))")
+    assert "vendor.trade_api.model.oes_base_model" in loaded
+    assert "vendor.trade_api.model.oes_packets" not in loaded
+    assert "vendor.trade_api.oes_api" not in loaded
+
+
+@pytest.mark.parametrize("package", _MODELS)
+def test_star_import_matches_eager(package):
+    code = (f"from {package} import *\n"
+            "import json; print(json.dumps(sorted(k for k in globals() if not k.startswith('_'))))")
+    assert _run(code) == _run(code, eager=True)